@@ -0,0 +1,49 @@
+"""
+Storage backends for the SmartConnect database layer.
+
+Firestore is the default. The local backends implement the subset of the
+Firestore client API that db.py uses, so the app can run, be profiled and be
+load-tested without a Firebase project:
+
+- memory: documents kept in process memory (tests, benchmarks, demos)
+- sqlite: documents stored in a single SQLite file (single-site deployments)
+
+Select one with the SMARTCONNECT_BACKEND environment variable; the SQLite
+file location comes from SMARTCONNECT_SQLITE_PATH.
+"""
+import os
+
+from .base import LocalClient, ChangeType
+from .memory import MemoryClient
+from .sqlite import SQLiteClient
+
+BACKEND_ENV_VAR = 'SMARTCONNECT_BACKEND'
+SQLITE_PATH_ENV_VAR = 'SMARTCONNECT_SQLITE_PATH'
+DEFAULT_BACKEND = 'firestore'
+DEFAULT_SQLITE_PATH = 'smartconnect.db'
+LOCAL_BACKENDS = ('memory', 'sqlite')
+
+
+def get_backend_name() -> str:
+    """Name of the configured storage backend"""
+    return os.getenv(BACKEND_ENV_VAR, DEFAULT_BACKEND).strip().lower()
+
+
+def create_client(name: str, path: str = None) -> LocalClient:
+    """Create a client for one of the local backends"""
+    if name == 'memory':
+        return MemoryClient()
+    if name == 'sqlite':
+        return SQLiteClient(path or os.getenv(SQLITE_PATH_ENV_VAR, DEFAULT_SQLITE_PATH))
+    raise ValueError(f"Unknown storage backend: {name}")
+
+
+__all__ = [
+    'BACKEND_ENV_VAR',
+    'ChangeType',
+    'LocalClient',
+    'MemoryClient',
+    'SQLiteClient',
+    'create_client',
+    'get_backend_name',
+]
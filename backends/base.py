@@ -0,0 +1,686 @@
+"""
+Shared implementation of the local storage backends.
+
+LocalClient implements the subset of the Firestore client API used by db.py
+(collections, documents, queries, batches, bulk gets, aggregation queries and
+snapshot listeners) on top of a flat document store. Subclasses only provide
+the storage: reading one document, reading a collection and writing a set of
+document changes atomically.
+"""
+import copy
+import functools
+import threading
+import uuid
+from datetime import datetime
+from enum import Enum
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from google.api_core import exceptions as google_exceptions
+from google.cloud.firestore_v1 import transforms
+
+ASCENDING = 'ASCENDING'
+DESCENDING = 'DESCENDING'
+
+# Marker for a field that is not present in a document
+_MISSING = object()
+
+
+class ChangeType(Enum):
+    """Kind of document change reported to snapshot listeners"""
+    ADDED = 1
+    REMOVED = 2
+    MODIFIED = 3
+
+
+# ========== FIELD HELPERS ==========
+
+def get_field(data: Dict, field_path: str) -> Any:
+    """Read a dotted field path from a document, or _MISSING"""
+    value = data
+    for part in field_path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _set_field(data: Dict, field_path: str, value: Any):
+    """Write a dotted field path, creating intermediate maps"""
+    parts = field_path.split('.')
+    target = data
+    for part in parts[:-1]:
+        if not isinstance(target.get(part), dict):
+            target[part] = {}
+        target = target[part]
+    target[parts[-1]] = value
+
+
+def _delete_field(data: Dict, field_path: str):
+    """Remove a dotted field path if it exists"""
+    parts = field_path.split('.')
+    target = data
+    for part in parts[:-1]:
+        target = target.get(part)
+        if not isinstance(target, dict):
+            return
+    target.pop(parts[-1], None)
+
+
+def _resolve(value: Any, current: Any) -> Any:
+    """Apply a transform or sentinel against the current field value"""
+    if isinstance(value, transforms.Increment):
+        is_number = isinstance(current, (int, float)) and not isinstance(current, bool)
+        return (current if is_number else 0) + value.value
+    if isinstance(value, transforms.ArrayUnion):
+        base = list(current) if isinstance(current, list) else []
+        return base + [item for item in value.values if item not in base]
+    if isinstance(value, transforms.ArrayRemove):
+        base = current if isinstance(current, list) else []
+        return [item for item in base if item not in value.values]
+    if value is transforms.SERVER_TIMESTAMP:
+        return datetime.now()
+    if isinstance(value, dict):
+        return {key: _resolve(item, _MISSING) for key, item in value.items()}
+    return copy.deepcopy(value)
+
+
+def _merge_into(target: Dict, data: Dict, merge: bool):
+    """Copy set() data into target, merging nested maps when merge is set"""
+    for key, value in data.items():
+        if value is transforms.DELETE_FIELD:
+            target.pop(key, None)
+        elif merge and isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge_into(target[key], value, merge)
+        elif isinstance(value, dict):
+            target[key] = {}
+            _merge_into(target[key], value, merge)
+        else:
+            target[key] = _resolve(value, target.get(key, _MISSING))
+
+
+def _type_rank(value: Any) -> int:
+    """Position of a value's type in Firestore's cross-type ordering"""
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, datetime):
+        return 3
+    if isinstance(value, str):
+        return 4
+    if isinstance(value, bytes):
+        return 5
+    if isinstance(value, list):
+        return 8
+    return 9
+
+
+def compare_values(left: Any, right: Any) -> int:
+    """Compare two field values the way Firestore orders them"""
+    left_rank, right_rank = _type_rank(left), _type_rank(right)
+    if left_rank != right_rank:
+        return -1 if left_rank < right_rank else 1
+    if left_rank == 9:
+        left, right = str(left), str(right)
+    try:
+        return (left > right) - (left < right)
+    except TypeError:
+        return 0
+
+
+def _equals(left: Any, right: Any) -> bool:
+    return _type_rank(left) == _type_rank(right) and left == right
+
+
+def matches_filter(data: Dict, field_path: str, op: str, value: Any) -> bool:
+    """Check one where() clause against a document"""
+    current = get_field(data, field_path)
+    if current is _MISSING:
+        return False
+    if op == '==':
+        return _equals(current, value)
+    if op == '!=':
+        return not _equals(current, value)
+    if op == 'in':
+        return any(_equals(current, item) for item in value)
+    if op == 'not-in':
+        return not any(_equals(current, item) for item in value)
+    if op == 'array_contains':
+        return isinstance(current, list) and any(_equals(item, value) for item in current)
+    if op == 'array_contains_any':
+        return isinstance(current, list) and any(_equals(item, other) for item in current for other in value)
+    if _type_rank(current) != _type_rank(value):
+        return False
+    result = compare_values(current, value)
+    if op == '<':
+        return result < 0
+    if op == '<=':
+        return result <= 0
+    if op == '>':
+        return result > 0
+    if op == '>=':
+        return result >= 0
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+
+# ========== SNAPSHOTS AND RESULTS ==========
+
+class DocumentSnapshot:
+    """Read-only view of a document at the time it was read"""
+
+    def __init__(self, reference: 'DocumentReference', data: Optional[Dict], read_time: datetime = None):
+        self.reference = reference
+        self._data = data
+        self.read_time = read_time or datetime.now()
+
+    @property
+    def id(self) -> str:
+        return self.reference.id
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[Dict]:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path: str) -> Any:
+        if self._data is None:
+            return None
+        value = get_field(self._data, field_path)
+        if value is _MISSING:
+            raise KeyError(field_path)
+        return copy.deepcopy(value)
+
+
+class DocumentChange:
+    """One change delivered to a snapshot listener"""
+
+    def __init__(self, change_type: ChangeType, document: DocumentSnapshot, old_index: int = -1, new_index: int = -1):
+        self.type = change_type
+        self.document = document
+        self.old_index = old_index
+        self.new_index = new_index
+
+
+class AggregationResult:
+    """Value of one aggregation in an aggregation query"""
+
+    def __init__(self, alias: str, value: Any, read_time: datetime = None):
+        self.alias = alias
+        self.value = value
+        self.read_time = read_time or datetime.now()
+
+
+class WriteResult:
+    """Result of one committed write"""
+
+    def __init__(self, update_time: datetime):
+        self.update_time = update_time
+
+
+class Watch:
+    """Handle for an active snapshot listener"""
+
+    def __init__(self, client: 'LocalClient', query: 'Query', callback: Callable):
+        self._client = client
+        self.query = query
+        self.callback = callback
+
+    def unsubscribe(self):
+        self._client._remove_watch(self)
+
+
+# ========== QUERIES ==========
+
+class Query:
+    """Filtered, ordered view of one collection"""
+
+    def __init__(self, client: 'LocalClient', path: str, filters: Tuple = (), orders: Tuple = (),
+                 limit: int = None, offset: int = 0, cursor: Tuple = None):
+        self._client = client
+        self._path = path
+        self._filters = filters
+        self._orders = orders
+        self._limit = limit
+        self._offset = offset
+        self._cursor = cursor
+
+    def _copy(self, **changes) -> 'Query':
+        state = {
+            'filters': self._filters,
+            'orders': self._orders,
+            'limit': self._limit,
+            'offset': self._offset,
+            'cursor': self._cursor
+        }
+        state.update(changes)
+        return Query(self._client, self._path, **state)
+
+    def where(self, field_path: str = None, op_string: str = None, value: Any = None, *, filter=None) -> 'Query':
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = ASCENDING) -> 'Query':
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count: int) -> 'Query':
+        return self._copy(limit=count)
+
+    def offset(self, num_to_skip: int) -> 'Query':
+        return self._copy(offset=num_to_skip)
+
+    def start_after(self, document_fields_or_snapshot) -> 'Query':
+        return self._copy(cursor=self._cursor_values(document_fields_or_snapshot))
+
+    def _cursor_values(self, document_fields_or_snapshot) -> Tuple[List, Optional[str]]:
+        """Turn a snapshot, field dict or value list into cursor values"""
+        if isinstance(document_fields_or_snapshot, DocumentSnapshot):
+            data = document_fields_or_snapshot._data or {}
+            values = [get_field(data, field) for field, _ in self._orders]
+            return values, document_fields_or_snapshot.id
+        if isinstance(document_fields_or_snapshot, dict):
+            return [get_field(document_fields_or_snapshot, field) for field, _ in self._orders], None
+        return list(document_fields_or_snapshot), None
+
+    def _compare(self, left: Tuple[str, Dict], right: Tuple[str, Dict]) -> int:
+        """Order two (id, data) pairs by the order_by clauses, then by ID"""
+        direction = ASCENDING
+        for field, direction in self._orders:
+            result = compare_values(get_field(left[1], field), get_field(right[1], field))
+            if result:
+                return -result if direction == DESCENDING else result
+        result = (left[0] > right[0]) - (left[0] < right[0])
+        return -result if direction == DESCENDING else result
+
+    def _after_cursor(self, doc_id: str, data: Dict) -> bool:
+        values, cursor_id = self._cursor
+        direction = ASCENDING
+        for (field, direction), value in zip(self._orders, values):
+            result = compare_values(get_field(data, field), value)
+            if result:
+                return (result > 0) != (direction == DESCENDING)
+        if cursor_id is None or doc_id == cursor_id:
+            return False
+        return (doc_id > cursor_id) != (direction == DESCENDING)
+
+    def _execute(self) -> List[Tuple[str, Dict]]:
+        """Run the query against the store and return (id, data) pairs"""
+        with self._client._lock:
+            documents = self._client._read_collection(self._path, self._filters)
+
+        results = [
+            (doc_id, data) for doc_id, data in documents
+            if all(matches_filter(data, *clause) for clause in self._filters)
+        ]
+        # Documents without an order_by field are left out, as in Firestore
+        for field, _ in self._orders:
+            results = [item for item in results if get_field(item[1], field) is not _MISSING]
+        results.sort(key=functools.cmp_to_key(self._compare))
+
+        if self._cursor is not None:
+            results = [item for item in results if self._after_cursor(*item)]
+        if self._offset:
+            results = results[self._offset:]
+        if self._limit is not None:
+            results = results[:self._limit]
+        return results
+
+    def stream(self, transaction=None) -> Iterator[DocumentSnapshot]:
+        read_time = datetime.now()
+        for doc_id, data in self._execute():
+            yield DocumentSnapshot(self._client._document_ref(self._path, doc_id), data, read_time)
+
+    def get(self, transaction=None) -> List[DocumentSnapshot]:
+        return list(self.stream(transaction))
+
+    def count(self, alias: str = None) -> 'AggregationQuery':
+        return AggregationQuery(self).count(alias)
+
+    def sum(self, field_ref: str, alias: str = None) -> 'AggregationQuery':
+        return AggregationQuery(self).sum(field_ref, alias)
+
+    def avg(self, field_ref: str, alias: str = None) -> 'AggregationQuery':
+        return AggregationQuery(self).avg(field_ref, alias)
+
+    def on_snapshot(self, callback: Callable) -> Watch:
+        return self._client._add_watch(self, callback)
+
+
+class AggregationQuery:
+    """count/sum/avg computed over the results of a query"""
+
+    def __init__(self, query: Query):
+        self._query = query
+        self._aggregations = []
+
+    def _add(self, kind: str, field_ref: Optional[str], alias: Optional[str]) -> 'AggregationQuery':
+        self._aggregations.append((kind, field_ref, alias or f'field_{len(self._aggregations) + 1}'))
+        return self
+
+    def count(self, alias: str = None) -> 'AggregationQuery':
+        return self._add('count', None, alias)
+
+    def sum(self, field_ref: str, alias: str = None) -> 'AggregationQuery':
+        return self._add('sum', field_ref, alias)
+
+    def avg(self, field_ref: str, alias: str = None) -> 'AggregationQuery':
+        return self._add('avg', field_ref, alias)
+
+    def get(self, transaction=None, **kwargs) -> List[List[AggregationResult]]:
+        documents = [data for _, data in self._query._execute()]
+        read_time = datetime.now()
+        results = []
+        for kind, field_ref, alias in self._aggregations:
+            if kind == 'count':
+                value = len(documents)
+            else:
+                numbers = [get_field(data, field_ref) for data in documents]
+                numbers = [n for n in numbers if isinstance(n, (int, float)) and not isinstance(n, bool)]
+                if kind == 'sum':
+                    value = sum(numbers)
+                else:
+                    value = sum(numbers) / len(numbers) if numbers else None
+            results.append(AggregationResult(alias, value, read_time))
+        return [results]
+
+    def stream(self, transaction=None, **kwargs) -> Iterator[List[AggregationResult]]:
+        yield from self.get(transaction)
+
+
+# ========== REFERENCES ==========
+
+class CollectionReference(Query):
+    """A collection, which is also the unfiltered query over it"""
+
+    def __init__(self, client: 'LocalClient', path: str):
+        super().__init__(client, path)
+
+    @property
+    def id(self) -> str:
+        return self._path.rsplit('/', 1)[-1]
+
+    @property
+    def parent(self) -> Optional['DocumentReference']:
+        if '/' not in self._path:
+            return None
+        parent_path, doc_id = self._path.rsplit('/', 1)[0].rsplit('/', 1)
+        return self._client._document_ref(parent_path, doc_id)
+
+    def document(self, document_id: str = None) -> 'DocumentReference':
+        return self._client._document_ref(self._path, document_id or uuid.uuid4().hex[:20])
+
+    def add(self, document_data: Dict, document_id: str = None) -> Tuple[datetime, 'DocumentReference']:
+        doc_ref = self.document(document_id)
+        result = doc_ref.create(document_data)
+        return result.update_time, doc_ref
+
+    def list_documents(self) -> List['DocumentReference']:
+        with self._client._lock:
+            documents = self._client._read_collection(self._path, ())
+        return [self.document(doc_id) for doc_id, _ in documents]
+
+
+class DocumentReference:
+    """Reference to a single document"""
+
+    def __init__(self, client: 'LocalClient', collection_path: str, document_id: str):
+        self._client = client
+        self._collection_path = collection_path
+        self.id = document_id
+
+    @property
+    def path(self) -> str:
+        return f'{self._collection_path}/{self.id}'
+
+    @property
+    def parent(self) -> CollectionReference:
+        return CollectionReference(self._client, self._collection_path)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, DocumentReference) and other._client is self._client and other.path == self.path
+
+    def __hash__(self) -> int:
+        return hash(self.path)
+
+    def collection(self, collection_id: str) -> CollectionReference:
+        return CollectionReference(self._client, f'{self.path}/{collection_id}')
+
+    def get(self, field_paths=None, transaction=None) -> DocumentSnapshot:
+        with self._client._lock:
+            data = self._client._read_document(self._collection_path, self.id)
+        return DocumentSnapshot(self, data)
+
+    def create(self, document_data: Dict) -> WriteResult:
+        return self._client._commit([('create', self, document_data, False)])[0]
+
+    def set(self, document_data: Dict, merge: bool = False) -> WriteResult:
+        return self._client._commit([('set', self, document_data, merge)])[0]
+
+    def update(self, field_updates: Dict) -> WriteResult:
+        return self._client._commit([('update', self, field_updates, False)])[0]
+
+    def delete(self) -> WriteResult:
+        return self._client._commit([('delete', self, None, False)])[0]
+
+
+# ========== BATCHES ==========
+
+class WriteBatch:
+    """Writes that are committed together, all or nothing"""
+
+    def __init__(self, client: 'LocalClient'):
+        self._client = client
+        self._writes = []
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+    def create(self, reference: DocumentReference, document_data: Dict):
+        self._writes.append(('create', reference, document_data, False))
+
+    def set(self, reference: DocumentReference, document_data: Dict, merge: bool = False):
+        self._writes.append(('set', reference, document_data, merge))
+
+    def update(self, reference: DocumentReference, field_updates: Dict):
+        self._writes.append(('update', reference, field_updates, False))
+
+    def delete(self, reference: DocumentReference):
+        self._writes.append(('delete', reference, None, False))
+
+    def commit(self) -> List[WriteResult]:
+        writes, self._writes = self._writes, []
+        return self._client._commit(writes)
+
+    def __enter__(self) -> 'WriteBatch':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+
+
+class Transaction(WriteBatch):
+    """Writes staged by a transaction and committed by LocalClient.run_transaction.
+
+    The client lock is held for the whole transaction, so reads made through
+    it cannot be invalidated by other writers before the commit.
+    """
+
+    def get(self, ref_or_query) -> Iterator[DocumentSnapshot]:
+        if isinstance(ref_or_query, DocumentReference):
+            yield ref_or_query.get(transaction=self)
+        else:
+            yield from ref_or_query.stream(transaction=self)
+
+    def get_all(self, references) -> Iterator[DocumentSnapshot]:
+        return self._client.get_all(references, transaction=self)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Committed by run_transaction, not by the context manager
+        pass
+
+
+# ========== CLIENT ==========
+
+class LocalClient:
+    """Firestore-compatible client over a local document store.
+
+    Subclasses implement _read_document, _read_collection and _write_documents.
+    All storage access happens under self._lock, so a commit is atomic with
+    respect to other readers and writers in the process.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._watches = []
+
+    # Storage hooks
+
+    def _read_document(self, collection_path: str, document_id: str) -> Optional[Dict]:
+        """Return the stored data of one document, or None"""
+        raise NotImplementedError
+
+    def _read_collection(self, collection_path: str, filters: Tuple) -> List[Tuple[str, Dict]]:
+        """Return (id, data) pairs of a collection.
+
+        filters are the query's where() clauses; a store may use them to skip
+        documents early, but every result is checked against them again.
+        """
+        raise NotImplementedError
+
+    def _write_documents(self, changes: List[Tuple[str, str, Optional[Dict]]]):
+        """Atomically store (collection_path, id, data) changes; None data deletes"""
+        raise NotImplementedError
+
+    def close(self):
+        """Release the store"""
+
+    # Public API
+
+    def collection(self, *collection_path: str) -> CollectionReference:
+        return CollectionReference(self, '/'.join(collection_path))
+
+    def document(self, *document_path: str) -> DocumentReference:
+        collection_path, document_id = '/'.join(document_path).rsplit('/', 1)
+        return self._document_ref(collection_path, document_id)
+
+    def batch(self) -> WriteBatch:
+        return WriteBatch(self)
+
+    def transaction(self) -> Transaction:
+        return Transaction(self)
+
+    def run_transaction(self, func: Callable, *args, **kwargs) -> Any:
+        """Call func(transaction, *args, **kwargs) and commit its writes atomically.
+
+        Stands in for firestore.transactional: nothing is written if func raises.
+        """
+        with self._lock:
+            transaction = self.transaction()
+            result = func(transaction, *args, **kwargs)
+            transaction.commit()
+        return result
+
+    def get_all(self, references, field_paths=None, transaction=None) -> Iterator[DocumentSnapshot]:
+        references = list(references)
+        # Like Firestore, which rejects a batch get of no documents
+        if not references:
+            raise ValueError("get_all needs at least one document reference")
+        with self._lock:
+            snapshots = [
+                DocumentSnapshot(ref, self._read_document(ref._collection_path, ref.id))
+                for ref in dict.fromkeys(references)
+            ]
+        return iter(snapshots)
+
+    # Internals
+
+    def _document_ref(self, collection_path: str, document_id: str) -> DocumentReference:
+        return DocumentReference(self, collection_path, document_id)
+
+    def _apply_write(self, kind: str, reference: DocumentReference, current: Optional[Dict],
+                     data: Optional[Dict], merge: bool) -> Optional[Dict]:
+        """Compute the new document data for one write"""
+        if kind == 'delete':
+            return None
+        if kind == 'create':
+            if current is not None:
+                raise google_exceptions.AlreadyExists(f"Document already exists: {reference.path}")
+            result = {}
+            _merge_into(result, data, False)
+            return result
+        if kind == 'set':
+            result = copy.deepcopy(current) if merge and current is not None else {}
+            _merge_into(result, data, merge)
+            return result
+        if current is None:
+            raise google_exceptions.NotFound(f"No document to update: {reference.path}")
+        result = copy.deepcopy(current)
+        for field_path, value in data.items():
+            if value is transforms.DELETE_FIELD:
+                _delete_field(result, field_path)
+            else:
+                existing = get_field(result, field_path)
+                _set_field(result, field_path, _resolve(value, existing))
+        return result
+
+    def _commit(self, writes: List[Tuple]) -> List[WriteResult]:
+        """Apply writes atomically and notify snapshot listeners"""
+        with self._lock:
+            before, after = {}, {}
+            for kind, reference, data, merge in writes:
+                key = (reference._collection_path, reference.id)
+                if key not in before:
+                    before[key] = self._read_document(*key)
+                current = after[key] if key in after else before[key]
+                after[key] = self._apply_write(kind, reference, current, data, merge)
+
+            self._write_documents([(path, doc_id, data) for (path, doc_id), data in after.items()])
+            watches = list(self._watches)
+
+        update_time = datetime.now()
+        self._notify(watches, before, after)
+        return [WriteResult(update_time) for _ in writes]
+
+    def _add_watch(self, query: Query, callback: Callable) -> Watch:
+        watch = Watch(self, query, callback)
+        with self._lock:
+            self._watches.append(watch)
+            documents = query.get()
+        changes = [DocumentChange(ChangeType.ADDED, doc, -1, index) for index, doc in enumerate(documents)]
+        callback(documents, changes, datetime.now())
+        return watch
+
+    def _remove_watch(self, watch: Watch):
+        with self._lock:
+            if watch in self._watches:
+                self._watches.remove(watch)
+
+    def _notify(self, watches: List[Watch], before: Dict, after: Dict):
+        """Deliver document changes to the listeners whose query they affect"""
+        read_time = datetime.now()
+        for watch in watches:
+            query = watch.query
+            changes = []
+            for (path, doc_id), new_data in after.items():
+                if path != query._path:
+                    continue
+                old_data = before[(path, doc_id)]
+                was_match = old_data is not None and all(matches_filter(old_data, *c) for c in query._filters)
+                is_match = new_data is not None and all(matches_filter(new_data, *c) for c in query._filters)
+                doc_ref = self._document_ref(path, doc_id)
+                if is_match and not was_match:
+                    changes.append(DocumentChange(ChangeType.ADDED, DocumentSnapshot(doc_ref, new_data, read_time)))
+                elif was_match and not is_match:
+                    changes.append(DocumentChange(ChangeType.REMOVED, DocumentSnapshot(doc_ref, old_data, read_time)))
+                elif is_match and old_data != new_data:
+                    changes.append(DocumentChange(ChangeType.MODIFIED, DocumentSnapshot(doc_ref, new_data, read_time)))
+            if changes:
+                try:
+                    watch.callback(query.get(), changes, read_time)
+                except Exception as e:
+                    print(f"Snapshot listener error: {e}")
@@ -0,0 +1,33 @@
+"""
+In-memory storage backend.
+
+Documents live in plain dictionaries for the lifetime of the process, which
+makes it the backend of choice for tests, benchmarks and demos.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from .base import LocalClient
+
+
+class MemoryClient(LocalClient):
+    """Firestore-compatible client that keeps every document in memory"""
+
+    def __init__(self):
+        super().__init__()
+        # collection path -> {document id -> data}
+        self._collections = {}
+
+    def _read_document(self, collection_path: str, document_id: str) -> Optional[Dict]:
+        # Stored dicts are replaced on every write, never mutated, so they
+        # can be handed out without copying
+        return self._collections.get(collection_path, {}).get(document_id)
+
+    def _read_collection(self, collection_path: str, filters: Tuple) -> List[Tuple[str, Dict]]:
+        return list(self._collections.get(collection_path, {}).items())
+
+    def _write_documents(self, changes: List[Tuple[str, str, Optional[Dict]]]):
+        for collection_path, document_id, data in changes:
+            if data is None:
+                self._collections.get(collection_path, {}).pop(document_id, None)
+            else:
+                self._collections.setdefault(collection_path, {})[document_id] = data
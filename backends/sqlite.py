@@ -0,0 +1,89 @@
+"""
+SQLite storage backend.
+
+Each document is one row holding its data as JSON, keyed by collection path
+and document ID. Equality filters are pushed down to SQLite with json_extract
+so that lookups such as login by username don't decode the whole collection.
+"""
+import json
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .base import LocalClient
+
+
+def _encode(value: Any) -> Any:
+    """JSON fallback for values Firestore stores natively"""
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError(f"Cannot store value of type {type(value).__name__}")
+
+
+def _decode(data: Dict) -> Any:
+    if len(data) == 1 and '__datetime__' in data:
+        return datetime.fromisoformat(data['__datetime__'])
+    return data
+
+
+def _json_path(field_path: str) -> str:
+    """Turn a dotted field path into a quoted SQLite JSON path"""
+    return '$' + ''.join('."{}"'.format(part.replace('"', '\\"')) for part in field_path.split('.'))
+
+
+class SQLiteClient(LocalClient):
+    """Firestore-compatible client that stores documents in a SQLite file"""
+
+    def __init__(self, path: str = 'smartconnect.db'):
+        super().__init__()
+        self.path = path
+        # Access is serialised by the client lock, so the connection can be
+        # shared with listener and UI threads
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS documents ('
+            ' collection TEXT NOT NULL,'
+            ' id TEXT NOT NULL,'
+            ' data TEXT NOT NULL,'
+            ' PRIMARY KEY (collection, id)'
+            ') WITHOUT ROWID'
+        )
+        self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _read_document(self, collection_path: str, document_id: str) -> Optional[Dict]:
+        row = self._connection.execute(
+            'SELECT data FROM documents WHERE collection = ? AND id = ?',
+            (collection_path, document_id)
+        ).fetchone()
+        return json.loads(row[0], object_hook=_decode) if row else None
+
+    def _read_collection(self, collection_path: str, filters: Tuple) -> List[Tuple[str, Dict]]:
+        sql = 'SELECT id, data FROM documents WHERE collection = ?'
+        params = [collection_path]
+        for field_path, op, value in filters:
+            # Only plain scalars compare the same way in SQLite and Firestore
+            if op == '==' and isinstance(value, (str, int, float)):
+                sql += ' AND json_extract(data, ?) = ?'
+                params.extend([_json_path(field_path), value])
+        rows = self._connection.execute(sql, params).fetchall()
+        return [(doc_id, json.loads(data, object_hook=_decode)) for doc_id, data in rows]
+
+    def _write_documents(self, changes: List[Tuple[str, str, Optional[Dict]]]):
+        with self._connection:
+            for collection_path, document_id, data in changes:
+                if data is None:
+                    self._connection.execute(
+                        'DELETE FROM documents WHERE collection = ? AND id = ?',
+                        (collection_path, document_id)
+                    )
+                else:
+                    self._connection.execute(
+                        'INSERT OR REPLACE INTO documents (collection, id, data) VALUES (?, ?, ?)',
+                        (collection_path, document_id, json.dumps(data, default=_encode))
+                    )
@@ -0,0 +1,442 @@
+"""Bounded in-memory cache used by the database layer.
+
+Entries expire after a TTL measured on the monotonic clock, the least
+recently used entries are evicted once the entry or weight bound is
+reached, and every entry carries tags so that a write can drop all results
+derived from a collection without scanning the whole cache.
+
+The cache is shared by every session of the app, so all of its state is
+guarded by a lock, and get_or_load coalesces concurrent misses for the same
+key into a single call of the loader. Entries stored with a stale_ttl keep
+being served after they expire (stale-while-revalidate) while one
+background thread reloads them; subscribers of the key are told when the
+reload brings different data.
+
+An optional backing store (see disk_cache.DiskCache) acts as a second tier
+for loads made with persist=True: a miss is first looked up there, and
+every result loaded is written back, so a restarted app can serve the last
+known data right away and revalidate it in the background. Invalidations
+reach it through a background thread, batched, so a write never waits for
+the disk; until they are done, the invalidated tags are not read from it.
+"""
+
+import atexit
+import threading
+import time
+import weakref
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+def default_weight(value) -> int:
+    """Number of records in a cached result, as a rough memory measure"""
+    try:
+        return max(1, len(value))
+    except TypeError:
+        return 1
+
+
+class _Entry:
+    __slots__ = ('value', 'expires_at', 'stale_until', 'tags', 'weight')
+
+    def __init__(self, value, expires_at, stale_until, tags, weight):
+        self.value = value
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+        self.tags = tags
+        self.weight = weight
+
+
+class _Flight:
+    """A load in progress, shared by every caller that missed the same key"""
+
+    def __init__(self, versions):
+        self.versions = versions
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class TTLCache:
+    """LRU cache with per-entry TTLs and tag-based invalidation"""
+
+    def __init__(self, max_entries: int = 256, max_weight: int = None, default_ttl: float = 300,
+                 weigher: Callable[[Any], int] = default_weight, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.max_weight = max_weight
+        self.default_ttl = default_ttl
+        self.weigher = weigher
+        self.clock = clock
+
+        self._entries = OrderedDict()
+        self._tags = defaultdict(set)
+        self._weight = 0
+        self._lock = threading.RLock()
+        # Loads in progress, and a counter per tag (plus one for clear())
+        # that tells a load whether it raced with an invalidation
+        self._flights = {}
+        self._tag_versions = defaultdict(int)
+        self._epoch = 0
+        # key -> weak references to the callbacks subscribed to it
+        self._subscribers = defaultdict(list)
+        # Optional second tier with get/set/delete/invalidate/clear
+        self.backing = None
+        # Tags waiting to be invalidated in the backing store, and those
+        # being invalidated by the background thread right now
+        self._backing_queued = set()
+        self._backing_flushing = set()
+        self._backing_flush_lock = threading.Lock()
+        self._backing_wake = threading.Event()
+        self._backing_thread = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.disk_hits = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str, default=None):
+        """Cached value for key, or default if it is missing or expired"""
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None or entry.expires_at <= self.clock():
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def _lookup(self, key: str) -> Optional[_Entry]:
+        """Entry for key, dropping it once it can no longer be served at all"""
+        entry = self._entries.get(key)
+        if entry is not None and entry.stale_until <= self.clock():
+            self._remove(key)
+            self.expirations += 1
+            return None
+        return entry
+
+    def set(self, key: str, value: Any, ttl: float = None, tags: Iterable[str] = (), stale_ttl: float = None):
+        """Store a value, evicting least recently used entries past the bounds.
+
+        With stale_ttl, get_or_load keeps serving the value for that long
+        after it expires while it is reloaded in the background.
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        weight = self.weigher(value)
+        with self._lock:
+            self._remove(key)
+            expires_at = self.clock() + ttl
+            entry = _Entry(value, expires_at, expires_at + (stale_ttl or 0), frozenset(tags), weight)
+            self._entries[key] = entry
+            self._weight += weight
+            for tag in entry.tags:
+                self._tags[tag].add(key)
+
+            while len(self._entries) > 1 and (
+                    len(self._entries) > self.max_entries or
+                    (self.max_weight is not None and self._weight > self.max_weight)):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], ttl: float = None, tags: Iterable[str] = (),
+                    stale_ttl: float = None, persist: bool = False):
+        """Cached value for key, or the result of loader() stored under it.
+
+        Concurrent misses for the same key share one call of the loader: the
+        first caller runs it and the others wait for its result (or error).
+        A result is returned but not stored if None, or if one of its tags
+        was invalidated while it was loading, so a write that races with the
+        load is never masked by the data read before it.
+
+        An expired entry stored with a stale_ttl is returned as is, and a
+        single background reload is started for it.
+
+        With persist, a miss is looked up in the backing store before the
+        loader runs (its age counting against ttl and stale_ttl), and loaded
+        results are written to it.
+        """
+        tags = frozenset(tags)
+        checked_backing = not persist or self.backing is None
+        while True:
+            with self._lock:
+                entry = self._lookup(key)
+                if entry is not None and entry.expires_at > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.value
+
+                flight = self._flights.get(key)
+                if entry is not None:
+                    # Stale but still servable: revalidate in the background
+                    self.stale_hits += 1
+                    if flight is None:
+                        flight = _Flight(self._versions(tags))
+                        self._flights[key] = flight
+                        self.refreshes += 1
+                        threading.Thread(
+                            target=self._run_flight,
+                            args=(key, flight, loader, ttl, tags, stale_ttl),
+                            kwargs={'previous': entry.value, 'persist': persist},
+                            daemon=True
+                        ).start()
+                    return entry.value
+
+                if checked_backing or flight is not None:
+                    self.misses += 1
+                    if flight is None:
+                        flight = _Flight(self._versions(tags))
+                        self._flights[key] = flight
+                        leader = True
+                    else:
+                        self.coalesced += 1
+                        leader = False
+                    break
+                versions = self._versions(tags)
+                # Rows of a tag not yet invalidated on disk are out of date
+                invalidating = bool(tags & (self._backing_queued | self._backing_flushing))
+
+            # Read the backing store outside the lock, then serve what it
+            # seeded (fresh or stale) on the next pass
+            checked_backing = True
+            if not invalidating:
+                self._seed_from_backing(key, ttl, tags, stale_ttl, versions)
+
+        if not leader:
+            return flight.wait()
+        return self._run_flight(key, flight, loader, ttl, tags, stale_ttl, persist=persist)
+
+    def _seed_from_backing(self, key, ttl, tags, stale_ttl, versions):
+        try:
+            stored = self.backing.get(key)
+        except Exception as e:
+            print(f"Cache backing read error for {key}: {e}")
+            return
+        if stored is None:
+            return
+
+        value, stored_at = stored
+        ttl = self.default_ttl if ttl is None else ttl
+        remaining = ttl - max(0.0, time.time() - stored_at)
+        if value is None or remaining + (stale_ttl or 0) <= 0:
+            return
+        with self._lock:
+            # Skip it if a load or an invalidation got there first
+            if key in self._entries or self._versions(tags) != versions:
+                return
+            self.set(key, value, remaining, tags, stale_ttl)
+            self.disk_hits += 1
+
+    def _run_flight(self, key, flight, loader, ttl, tags, stale_ttl, previous=None, persist=False):
+        """Run a load for the callers sharing `flight` and store its result"""
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.error = e
+            flight.done.set()
+            if previous is None:
+                raise
+            # A failed background refresh keeps serving the stale value
+            print(f"Cache refresh error for {key}: {e}")
+            return previous
+
+        with self._lock:
+            stored = value is not None and self._versions(tags) == flight.versions
+            if stored:
+                self.set(key, value, ttl, tags, stale_ttl)
+            self._flights.pop(key, None)
+        flight.value = value
+        flight.done.set()
+
+        if stored and persist and self.backing is not None:
+            self._write_backing(key, value, tags, flight.versions)
+        if previous is not None and value is not None and value != previous:
+            self._notify(key, value)
+        return value
+
+    def _write_backing(self, key, value, tags, versions):
+        try:
+            self.backing.set(key, value, tags)
+            with self._lock:
+                invalidated = self._versions(tags) != versions
+            if invalidated:
+                # An invalidation raced with the write: don't keep the old data
+                self.backing.delete(key)
+        except Exception as e:
+            print(f"Cache backing write error for {key}: {e}")
+
+    # ========== SUBSCRIPTIONS ==========
+
+    def subscribe(self, key: str, callback: Callable[[str, Any], None]) -> Callable[[], None]:
+        """Call callback(key, value) when a background refresh changes key.
+
+        Only a weak reference to the callback is kept, so subscribing does
+        not keep a closed screen alive; the caller must hold on to it.
+        Returns a function that unsubscribes.
+        """
+        if hasattr(callback, '__self__') and hasattr(callback, '__func__'):
+            ref = weakref.WeakMethod(callback)
+        else:
+            ref = weakref.ref(callback)
+        with self._lock:
+            self._subscribers[key].append(ref)
+
+        def unsubscribe():
+            with self._lock:
+                refs = self._subscribers.get(key, [])
+                if ref in refs:
+                    refs.remove(ref)
+        return unsubscribe
+
+    def _notify(self, key: str, value: Any):
+        with self._lock:
+            refs = self._subscribers.get(key, [])
+            callbacks = [callback for callback in (ref() for ref in refs) if callback is not None]
+            # Drop subscribers that have been garbage collected
+            refs[:] = [ref for ref in refs if ref() is not None]
+        for callback in callbacks:
+            try:
+                callback(key, value)
+            except Exception as e:
+                print(f"Cache subscriber error for {key}: {e}")
+
+    def _versions(self, tags):
+        return self._epoch, tuple(sorted((tag, self._tag_versions[tag]) for tag in tags))
+
+    def delete(self, key: str):
+        with self._lock:
+            self._remove(key)
+
+    def values(self, tag: str) -> list:
+        """Values of the servable entries carrying tag (stale ones included)"""
+        with self._lock:
+            entries = [self._lookup(key) for key in list(self._tags.get(tag, ()))]
+            return [entry.value for entry in entries if entry is not None]
+
+    def patch(self, tag: str, func: Callable[[str, Any], Any]):
+        """Replace the value of every entry carrying tag by func(key, value).
+
+        Expiry is left as is, so the patched values are reloaded as usual;
+        nothing is written to the backing store.
+        """
+        with self._lock:
+            for key in list(self._tags.get(tag, ())):
+                entry = self._entries[key]
+                value = func(key, entry.value)
+                weight = self.weigher(value)
+                self._weight += weight - entry.weight
+                entry.value, entry.weight = value, weight
+
+    def invalidate(self, *tags: str) -> int:
+        """Drop every entry carrying any of the tags; returns how many were dropped"""
+        removed = 0
+        with self._lock:
+            for tag in tags:
+                self._tag_versions[tag] += 1
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    removed += 1
+            if self.backing is not None and tags:
+                self._backing_queued.update(tags)
+                self._ensure_backing_worker()
+        if self.backing is not None and tags:
+            self._backing_wake.set()
+        return removed
+
+    def flush_backing(self) -> bool:
+        """Invalidate the queued tags in the backing store now; returns False if that failed"""
+        with self._backing_flush_lock:
+            with self._lock:
+                tags, self._backing_queued = self._backing_queued, set()
+                self._backing_flushing = tags
+                backing = self.backing
+            try:
+                if tags and backing is not None:
+                    backing.invalidate(*sorted(tags))
+                return True
+            except Exception as e:
+                print(f"Cache backing invalidate error: {e}")
+                # Retried with the next flush; reads of these tags skip the disk until then
+                with self._lock:
+                    self._backing_queued.update(tags)
+                return False
+            finally:
+                with self._lock:
+                    self._backing_flushing = set()
+
+    def _ensure_backing_worker(self):
+        """Start the thread writing invalidations to the backing store (called under the lock)"""
+        if self._backing_thread is not None and self._backing_thread.is_alive():
+            return
+        if self._backing_thread is None:
+            atexit.register(self.flush_backing)
+        self._backing_thread = threading.Thread(target=self._run_backing_worker,
+                                                name='cache-backing', daemon=True)
+        self._backing_thread.start()
+
+    def _run_backing_worker(self):
+        while True:
+            self._backing_wake.wait()
+            self._backing_wake.clear()
+            self.flush_backing()
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._tags.clear()
+            self._weight = 0
+            # Clearing the backing store covers the queued invalidations
+            self._backing_queued.clear()
+        self._call_backing('clear')
+
+    def _call_backing(self, method: str, *args):
+        if self.backing is None:
+            return
+        try:
+            getattr(self.backing, method)(*args)
+        except Exception as e:
+            print(f"Cache backing {method} error: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'coalesced': self.coalesced,
+                'stale_hits': self.stale_hits,
+                'refreshes': self.refreshes,
+                'disk_hits': self.disk_hits,
+                'entries': len(self._entries),
+                'weight': self._weight
+            }
+
+    def _remove(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self._weight -= entry.weight
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+        return entry
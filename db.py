@@ -1,49 +1,231 @@
 """
 SmartConnect Manager - Firebase Database Layer
 Using Firebase Firestore as the backend database
+(or a local memory/SQLite backend, see backends/)
 """
 import os
 import firebase_admin
 from firebase_admin import credentials, firestore, auth
+from google.api_core import exceptions as google_exceptions
 from datetime import datetime, date, timedelta
+import atexit
+import collections
 import hashlib
+import threading
 import uuid
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
+from urllib.parse import quote
 import json
 
-# Initialize Firebase
-try:
-    if not firebase_admin._apps:
-        # Look for Service.json file in the current directory or specified path
-        service_account_path = os.getenv("FIREBASE_SERVICE_ACCOUNT_PATH", "Service.json")
+import backends
+from cache import TTLCache
+from disk_cache import DiskCache, default_cache_path
+from outbox import Outbox, WriteConflict, default_outbox_path
+from search_index import MissionSearchIndex
+
+# Storage backend selected by SMARTCONNECT_BACKEND (see backends/)
+STORAGE_BACKEND = backends.get_backend_name()
+
+def create_client():
+    """Create the storage client: a local backend, or Firestore (None if it cannot be initialized).
+
+    Called on first use of DatabaseManager.db rather than at import, so that
+    importing this module does no credential loading or network setup.
+    """
+    if STORAGE_BACKEND in backends.LOCAL_BACKENDS:
+        client = backends.create_client(STORAGE_BACKEND)
+        print(f"Using local {STORAGE_BACKEND} storage backend")
+        return client
+
+    # Initialize Firebase
+    try:
+        if not firebase_admin._apps:
+            # Look for Service.json file in the current directory or specified path
+            service_account_path = os.getenv("FIREBASE_SERVICE_ACCOUNT_PATH", "Service.json")
         
-        if os.path.exists(service_account_path):
-            # Use the Service.json file
-            cred = credentials.Certificate(service_account_path)
-            print(f"Using Firebase credentials from: {service_account_path}")
+            if os.path.exists(service_account_path):
+                # Use the Service.json file
+                cred = credentials.Certificate(service_account_path)
+                print(f"Using Firebase credentials from: {service_account_path}")
 
         
-        firebase_admin.initialize_app(cred)
-        print("Firebase initialized successfully")
+            firebase_admin.initialize_app(cred)
+            print("Firebase initialized successfully")
     
-    # Initialize Firestore client
-    db_client = firestore.client()
-    print("Firestore client initialized successfully")
+        # Initialize Firestore client
+        client = firestore.client()
+        print("Firestore client initialized successfully")
+        return client
     
-except Exception as e:
-    print(f"Firebase initialization error: {e}")
-    print("Please ensure:")
-    print("1. Service.json file exists in the project root directory, OR")
-    print("2. Set FIREBASE_SERVICE_ACCOUNT_PATH environment variable to the correct path, OR") 
-    print("3. Set all required Firebase environment variables")
-    db_client = None
+    except Exception as e:
+        print(f"Firebase initialization error: {e}")
+        print("Please ensure:")
+        print("1. Service.json file exists in the project root directory, OR")
+        print("2. Set FIREBASE_SERVICE_ACCOUNT_PATH environment variable to the correct path, OR") 
+        print("3. Set all required Firebase environment variables")
+        return None
+
+# Initial high-water mark of the delta sync: every stamped document is past it
+SYNC_EPOCH = datetime(1970, 1, 1)
+
+# Errors meaning the database could not be reached, as opposed to a write it
+# rejected; writes failing with them are queued when the outbox is enabled
+OFFLINE_ERRORS = (
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.RetryError,
+    ConnectionError,
+    TimeoutError
+)
+
+class ActivityLogger:
+    """Queues activity log entries and writes them in batches off the caller's thread.
+
+    Entries are flushed when batch_size of them are waiting or every
+    flush_interval seconds, and once more at interpreter exit. In synchronous
+    mode each entry is written before log() returns (used by tests).
+    """
+
+    # Firestore accepts at most 500 writes per batch
+    MAX_BATCH_WRITES = 500
+    THREAD_NAME = 'activity-logger'
+    ERROR_MESSAGE = "Log activity error"
+
+    def __init__(self, manager, batch_size: int = 20, flush_interval: float = 2.0, synchronous: bool = False):
+        self._manager = manager
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.synchronous = synchronous
+
+        self._pending = collections.deque()
+        self._lock = threading.Lock()        # guards _pending and _thread
+        self._flush_lock = threading.Lock()  # one writer at a time
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = None
+        self._atexit_registered = False
+
+    @property
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def log(self, record: Dict) -> bool:
+        """Queue one activity log document"""
+        with self._lock:
+            self._pending.append(record)
+            waiting = len(self._pending)
+
+        if self.synchronous or self._closed:
+            return self.flush()
+
+        self._ensure_worker()
+        if waiting >= self.batch_size:
+            self._wake.set()
+        return True
+
+    def flush(self) -> bool:
+        """Write every queued entry now; returns False if a write failed"""
+        with self._flush_lock:
+            with self._lock:
+                entries = list(self._pending)
+                self._pending.clear()
+            if not entries:
+                return True
+
+            written = 0
+            try:
+                client = self._manager.db
+                if not client:
+                    raise RuntimeError("no database client")
+
+                for start in range(0, len(entries), self.MAX_BATCH_WRITES):
+                    chunk = entries[start:start + self.MAX_BATCH_WRITES]
+                    self._write(client, chunk)
+                    written += len(chunk)
+                return True
+            except Exception as e:
+                print(f"{self.ERROR_MESSAGE}: {e}")
+                # Keep what was not written for the next flush, in order
+                with self._lock:
+                    self._pending.extendleft(reversed(entries[written:]))
+                return False
+
+    def _write(self, client, chunk: List):
+        """Write queued entries, at most MAX_BATCH_WRITES of them"""
+        logs_ref = client.collection(self._manager.ACTIVITY_LOGS_COLLECTION)
+        batch = client.batch()
+        for record in chunk:
+            batch.set(logs_ref.document(), record)
+        batch.commit()
+
+    def close(self, timeout: float = 5):
+        """Stop the background thread and write what is left"""
+        self._closed = True
+        self._wake.set()
+        thread = self._thread
+        if thread and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout)
+        self.flush()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name=self.THREAD_NAME, daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.close)
+                self._atexit_registered = True
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+
+class LastLoginWriter(ActivityLogger):
+    """Writes the last login time of users off the login thread.
+
+    Queued and flushed like activity log entries; only the latest login of
+    each user in a flush is written, and users deleted since are skipped.
+    """
+
+    THREAD_NAME = 'last-login'
+    ERROR_MESSAGE = "Update last login error"
+
+    def record(self, user_id: str, update: Dict) -> bool:
+        """Queue a last login update of a user"""
+        return self.log((user_id, update))
+
+    def _write(self, client, chunk: List):
+        users_ref = client.collection(self._manager.USERS_COLLECTION)
+        for user_id, update in dict(chunk).items():
+            try:
+                users_ref.document(user_id).update(update)
+            except google_exceptions.NotFound:
+                pass
+
 
 class DatabaseManager:
-    def __init__(self):
-        self.db = db_client
+    def __init__(self, client=None):
+        # Firestore client, or a local backend client (see backends/). The
+        # default client is created on first use of self.db
+        self._client = client
+        self._client_created = client is not None
+        self._client_lock = threading.Lock()
+        # Set once initialize_default_data has run (see ensure_default_data)
+        self._default_data_ready = False
+        # Also look users up by query when their username is not indexed yet.
+        # Only needed for a database with users created before the usernames
+        # index until `python db.py backfill-usernames` has been run on it
+        self.LEGACY_USERNAME_LOOKUP = os.getenv("SMARTCONNECT_LEGACY_USERNAMES", "").lower() in ("1", "true", "yes")
         
         # Collection names
         self.USERS_COLLECTION = 'users'
+        # usernames/{username} -> {'user_id': ...}, kept in step with the users
+        self.USERNAMES_COLLECTION = 'usernames'
         self.VEHICLES_COLLECTION = 'vehicles'
         self.TOOLS_COLLECTION = 'tools'
         self.MISSIONS_COLLECTION = 'missions'
@@ -54,45 +236,734 @@ class DatabaseManager:
         self.MISSION_REPORTS_COLLECTION = 'mission_reports'
         self.NOTIFICATIONS_COLLECTION = 'notifications'
         self.MISSION_LOGS_COLLECTION='mission_logs'
+        self.METADATA_COLLECTION = 'metadata'
+        self.REFERENCE_DATA_DOCUMENT = 'reference_data'
+        self.STATS_COLLECTION = 'stats'
+        self.DASHBOARD_STATS_DOCUMENT = 'dashboard'
+
+        # Statuses tracked by the statistics document
+        self.MISSION_STATUSES = ['PENDING', 'IN_PROGRESS', 'COMPLETED', 'CANCELLED']
+        self.VEHICLE_STATUSES = ['AVAILABLE', 'IN_USE', 'MAINTENANCE', 'OUT_OF_SERVICE']
 
         # Caching
-        self._cache = {}
-        self._cache_expiry = {}
         # Default cache duration: 5 minutes
         self.CACHE_DURATION = 300
-    
+        # Bounds of the result cache: number of entries, and total number of
+        # records across all cached results
+        self.CACHE_MAX_ENTRIES = 256
+        self.CACHE_MAX_RECORDS = 50000
+        # Expired full-collection results are still served for this long
+        # while they are reloaded in the background (stale-while-revalidate)
+        self.CACHE_STALE_DURATION = 24 * 3600
+        self._cache = TTLCache(
+            max_entries=self.CACHE_MAX_ENTRIES,
+            max_weight=self.CACHE_MAX_RECORDS,
+            default_ttl=self.CACHE_DURATION
+        )
+        # Format of the results kept by the on-disk cache tier (see
+        # enable_disk_cache); bump it when the shape of cached data changes
+        self.DISK_CACHE_VERSION = 1
+
+        # Maximum number of document references sent in one bulk get
+        self.BULK_FETCH_CHUNK_SIZE = 100
+
+        # Reference data (departments) is cached apart from the TTL cache and
+        # only reloaded when its version in the metadata document changes
+        self._reference_data = {}
+        self._reference_versions = {}
+        self._reference_checked_at = {}
+        # Serializes reloads, so concurrent sessions share one fetch
+        self._reference_lock = threading.RLock()
+        # How often (seconds) the reference data version is re-checked
+        self.REFERENCE_CHECK_INTERVAL = 600
+
+        # Optional real-time mirror of the core collections, kept up to date
+        # by snapshot listeners (see enable_mirror)
+        self.MIRRORED_COLLECTIONS = {
+            self.USERS_COLLECTION: 'employees',
+            self.VEHICLES_COLLECTION: 'vehicles',
+            self.TOOLS_COLLECTION: 'tools',
+            self.MISSIONS_COLLECTION: 'missions'
+        }
+        self._mirror = {}
+        self._mirror_ready = {}
+        self._mirror_watches = {}
+        self._mirror_lock = threading.RLock()
+
+        # Delta sync (see enable_delta_sync): the polling alternative to the
+        # snapshot listeners. Every write to a mirrored collection stamps
+        # SYNC_FIELD with the server time, and every delete leaves a tombstone
+        self.SYNC_FIELD = 'sync_at'
+        self.TOMBSTONES_COLLECTION = 'tombstones'
+        # Seconds between two pulls of the changed documents
+        self.SYNC_INTERVAL = 60
+        # Tombstones expire after this long (Firestore TTL policy on
+        # expire_at), so an older saved mirror is pulled again in full
+        self.TOMBSTONE_RETENTION = timedelta(days=30)
+        # collection -> {'documents': mark, 'tombstones': mark, 'pulled_at': time}
+        self._sync_marks = {}
+        self._sync_enabled = False
+        # Collections written locally since their last pull, and pulled since
+        # they were last saved to disk
+        self._sync_dirty = set()
+        self._sync_unsaved = set()
+        self._sync_lock = threading.RLock()
+        self._sync_wake = threading.Event()
+        self._sync_thread = None
+
+        # Inverted index behind search_missions. Built on first search, then
+        # kept up to date by the mission write paths and the mirror
+        self.mission_index = MissionSearchIndex()
+        self._mission_index_built_at = None
+        # Without the mirror, rebuild after this many seconds so missions
+        # written by other clients show up in search
+        self.SEARCH_INDEX_MAX_AGE = 600
+
+        # Activity log entries and last login times are written by background
+        # threads; SMARTCONNECT_SYNC_ACTIVITY_LOG=1 writes them before
+        # log_activity and login return
+        synchronous_writes = os.getenv("SMARTCONNECT_SYNC_ACTIVITY_LOG", "").lower() in ("1", "true", "yes")
+        self.activity_logger = ActivityLogger(self, synchronous=synchronous_writes)
+        self.last_login_writer = LastLoginWriter(self, synchronous=synchronous_writes)
+
+        # Offline outbox (see enable_outbox): writes that cannot reach the
+        # database are queued on disk and replayed in order in the background
+        self.outbox = None
+        self.OUTBOX_BATCH_SIZE = 100
+        # Seconds between replay attempts, doubled after each failed attempt
+        self.OUTBOX_RETRY_INTERVAL = 5
+        self.OUTBOX_MAX_RETRY_INTERVAL = 60
+        # Field holding the version of the documents queued writes modify
+        self.OUTBOX_VERSION_FIELDS = {
+            self.MISSIONS_COLLECTION: 'updated_at',
+            self.VEHICLES_COLLECTION: 'last_updated'
+        }
+        self._outbox_lock = threading.Lock()  # one replay at a time
+        self._outbox_wake = threading.Event()
+        self._outbox_thread = None
+        self._outbox_thread_lock = threading.Lock()
+
+    # ========== STORAGE CLIENT ==========
+
+    @property
+    def db(self):
+        """The storage client, created on first use (None if it could not be)"""
+        if not self._client_created:
+            with self._client_lock:
+                if not self._client_created:
+                    self._client = create_client()
+                    self._client_created = True
+        return self._client
+
+    @db.setter
+    def db(self, client):
+        self._client = client
+        self._client_created = True
+
     # ========== CACHING UTILITIES ==========
 
     def _get_cached(self, key: str) -> Optional[Any]:
         """Get data from cache if it exists and hasn't expired"""
-        if key in self._cache and key in self._cache_expiry:
-            if datetime.now() < self._cache_expiry[key]:
-                # print(f"Cache hit for {key}")
-                return self._cache[key]
+        return self._cache.get(key)
+
+    def _set_cached(self, key: str, data: Any, duration: int = None, tags: List[str] = None):
+        """Set data in cache with expiry.
+
+        Tags name the data the result was built from (e.g. 'missions',
+        'employees'); they default to the part of the key before the first
+        underscore.
+        """
+        if tags is None:
+            tags = [key.split('_', 1)[0]]
+        self._cache.set(key, data, duration, tags)
+
+    def _get_or_load(self, key: str, loader, duration: int = None, tags: List[str] = None,
+                     stale: bool = False) -> Any:
+        """Cached result for key, loading it once however many threads miss at the same time.
+
+        The loader must raise on failure so that errors are never cached.
+        With stale=True an expired result is returned immediately and
+        reloaded in the background; see subscribe(). Such results are also
+        kept in the on-disk tier when it is enabled.
+        """
+        if tags is None:
+            tags = [key.split('_', 1)[0]]
+        stale_ttl = self.CACHE_STALE_DURATION if stale else None
+        return self._cache.get_or_load(key, loader, duration, tags, stale_ttl, persist=stale)
+
+    def subscribe(self, key: str, callback):
+        """Call callback(key, value) when a background reload changes a cached result.
+
+        Only a weak reference is kept, so the subscriber (e.g. a view) must
+        hold on to the callback. Returns a function that unsubscribes.
+        """
+        return self._cache.subscribe(key, callback)
+
+    def _invalidate_cache(self, *tags: str):
+        """Invalidate every cached result tagged with any of the tags"""
+        self._cache.invalidate(*tags)
+        if self._sync_enabled:
+            # A local write: pull it into the mirror on the next read
+            self._sync_dirty.update(collection_name for collection_name, tag in self.MIRRORED_COLLECTIONS.items()
+                                    if tag in tags)
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def get_cache_stats(self) -> Dict[str, int]:
+        """Hit, miss, eviction and expiration counters of the result cache"""
+        return self._cache.stats()
+
+    def enable_disk_cache(self, path: str = None) -> bool:
+        """Keep the collection results in a SQLite file as well (default: app data directory).
+
+        On the next launch they are served from it at once, as stale
+        results, and reloaded in the background.
+        """
+        try:
+            if self._cache.backing is None:
+                self._cache.backing = DiskCache(path or default_cache_path(), self.DISK_CACHE_VERSION)
+            return True
+        except Exception as e:
+            print(f"Enable disk cache error: {e}")
+            return False
+
+    def disable_disk_cache(self):
+        # Write the queued invalidations before the file is closed
+        self._cache.flush_backing()
+        backing, self._cache.backing = self._cache.backing, None
+        if backing is not None:
+            backing.close()
+
+    # ========== REAL-TIME MIRROR ==========
+
+    def enable_mirror(self, timeout: float = 10) -> bool:
+        """Attach snapshot listeners that keep an in-memory copy of the core collections.
+
+        Waits up to `timeout` seconds for the initial sync; reads fall back to
+        Firestore for any collection that has not synced yet.
+        """
+        try:
+            if not self.db:
+                return False
+
+            for collection_name in self.MIRRORED_COLLECTIONS:
+                if collection_name in self._mirror_watches:
+                    continue
+                with self._mirror_lock:
+                    self._mirror[collection_name] = {}
+                    self._mirror_ready[collection_name] = threading.Event()
+                self._mirror_watches[collection_name] = self.db.collection(collection_name).on_snapshot(
+                    lambda docs, changes, read_time, name=collection_name: self._on_mirror_snapshot(name, changes)
+                )
+
+            return all(event.wait(timeout) for event in list(self._mirror_ready.values()))
+        except Exception as e:
+            print(f"Enable mirror error: {e}")
+            return False
+
+    def disable_mirror(self):
+        """Detach the snapshot listeners and drop the mirror"""
+        for watch in self._mirror_watches.values():
+            try:
+                watch.unsubscribe()
+            except Exception as e:
+                print(f"Disable mirror error: {e}")
+        self._mirror_watches = {}
+        self._sync_enabled = False
+        self._sync_wake.set()
+        with self._mirror_lock:
+            self._mirror = {}
+            self._mirror_ready = {}
+
+    def _on_mirror_snapshot(self, collection_name: str, changes):
+        """Apply document-level changes from a snapshot listener to the mirror"""
+        changed, removed = {}, []
+        for change in changes:
+            doc = change.document
+            if change.type.name == 'REMOVED':
+                removed.append(doc.id)
             else:
-                # print(f"Cache expired for {key}")
-                del self._cache[key]
-                del self._cache_expiry[key]
+                doc_data = self.to_dict(doc)
+                if doc_data:
+                    changed[doc.id] = doc_data
+        self._apply_mirror_changes(collection_name, changed, removed)
+
+    def _apply_mirror_changes(self, collection_name: str, changed: Dict[str, Dict], removed, replace: bool = False):
+        """Merge changed and removed documents into the mirror (or replace its content)"""
+        with self._mirror_lock:
+            documents = self._mirror.get(collection_name)
+            if documents is None:
+                return
+            if replace:
+                removed = [doc_id for doc_id in documents if doc_id not in changed]
+            removed = [doc_id for doc_id in removed if documents.pop(doc_id, None) is not None]
+            # Documents pulled again without a change are not changes
+            changed = {doc_id: data for doc_id, data in changed.items() if documents.get(doc_id) != data}
+            documents.update(changed)
+            ready = self._mirror_ready[collection_name]
+
+        if changed or removed:
+            # Results derived from this collection are stale now
+            self._cache.invalidate(self.MIRRORED_COLLECTIONS[collection_name])
+            self._index_mirror_changes(collection_name, changed, removed)
+        ready.set()
+
+    def _mirror_synced(self, collection_name: str) -> bool:
+        ready = self._mirror_ready.get(collection_name)
+        return ready is not None and ready.is_set()
+
+    def _mirror_documents(self, collection_name: str) -> Optional[Dict[str, Dict]]:
+        """Copy of a mirrored collection keyed by ID, or None until it has synced"""
+        if collection_name in self._sync_dirty:
+            # Pull our own writes before serving the collection
+            self.sync_collection(collection_name)
+        with self._mirror_lock:
+            ready = self._mirror_ready.get(collection_name)
+            if ready is None or not ready.is_set():
+                return None
+            return {doc_id: dict(doc_data) for doc_id, doc_data in self._mirror[collection_name].items()}
+
+    # ========== DELTA SYNC ==========
+
+    def enable_delta_sync(self) -> bool:
+        """Keep the mirror up to date by pulling only the documents changed since the last pull.
+
+        The first pull of a collection downloads it whole; later pulls (every
+        SYNC_INTERVAL seconds, or on the next read after a local write) only
+        fetch the documents whose SYNC_FIELD is at or past the collection's
+        high-water mark, and the tombstones of the documents deleted since.
+        With the on-disk cache enabled, the mirror and its marks are saved
+        there so the next launch starts from them instead of a full pull.
+        Not used together with the snapshot listeners of enable_mirror.
+        """
+        try:
+            if not self.db or self._mirror_watches:
+                return False
+
+            with self._mirror_lock:
+                for collection_name in self.MIRRORED_COLLECTIONS:
+                    self._mirror.setdefault(collection_name, {})
+                    self._mirror_ready.setdefault(collection_name, threading.Event())
+            self._load_sync_state()
+            self._sync_enabled = True
+
+            synced = self.sync_collections()
+            if self._sync_thread is None or not self._sync_thread.is_alive():
+                self._sync_wake.clear()
+                self._sync_thread = threading.Thread(target=self._run_sync, name='delta-sync', daemon=True)
+                self._sync_thread.start()
+            return synced
+        except Exception as e:
+            print(f"Enable delta sync error: {e}")
+            return False
+
+    def sync_collections(self) -> bool:
+        """Pull the changes of every mirrored collection; returns False if a pull failed"""
+        results = [self.sync_collection(collection_name) for collection_name in self.MIRRORED_COLLECTIONS]
+        return all(results)
+
+    def sync_collection(self, collection_name: str) -> bool:
+        """Pull the documents of a collection changed (or deleted) since its high-water marks"""
+        try:
+            with self._sync_lock:
+                self._sync_dirty.discard(collection_name)
+                marks = self._sync_marks.get(collection_name)
+                full = marks is None
+                marks = dict(marks or {})
+
+                # Tombstones first: a document deleted after this query is
+                # either absent from the documents pulled below, or its
+                # tombstone is at or past the new mark
+                removed, marks['tombstones'] = self._pull_tombstones(collection_name, marks.get('tombstones'), full)
+
+                query = self.db.collection(collection_name)
+                if not full:
+                    query = query.where(self.SYNC_FIELD, '>=', marks.get('documents') or SYNC_EPOCH)
+                changed = {}
+                for doc in query.stream():
+                    doc_data = self.to_dict(doc)
+                    if doc_data:
+                        changed[doc.id] = doc_data
+                        marks['documents'] = self._later(marks.get('documents'), doc_data.get(self.SYNC_FIELD))
+
+                marks['pulled_at'] = datetime.now()
+                self._apply_mirror_changes(collection_name, changed, removed, replace=full)
+                self._sync_marks[collection_name] = marks
+                self._sync_unsaved.add(collection_name)
+            return True
+        except Exception as e:
+            print(f"Sync {collection_name} error: {e}")
+            return False
+
+    def _pull_tombstones(self, collection_name: str, mark, full: bool) -> Tuple[List[str], Any]:
+        """IDs of the documents deleted at or after mark, and the new mark.
+
+        Before a full pull only the latest tombstone is read, for its mark.
+        """
+        query = self.db.collection(self.TOMBSTONES_COLLECTION).where('collection', '==', collection_name)
+        if full:
+            latest = list(query.order_by(self.SYNC_FIELD, direction=firestore.Query.DESCENDING).limit(1).stream())
+            return [], (latest[0].to_dict() or {}).get(self.SYNC_FIELD) if latest else None
+
+        removed = []
+        for doc in query.where(self.SYNC_FIELD, '>=', mark or SYNC_EPOCH).stream():
+            tombstone = doc.to_dict() or {}
+            removed.append(tombstone.get('doc_id'))
+            mark = self._later(mark, tombstone.get(self.SYNC_FIELD))
+        return removed, mark
+
+    def _later(self, mark, value):
+        if value is None or (mark is not None and mark >= value):
+            return mark
+        return value
+
+    def _stamped(self, data: Dict) -> Dict:
+        """Copy of write data carrying the sync field, set by the server on commit"""
+        return {**data, self.SYNC_FIELD: firestore.SERVER_TIMESTAMP}
+
+    def _stage_tombstone(self, writer, collection_name: str, doc_id: str):
+        """Record the deletion of a document in the same batch or transaction"""
+        tombstone_ref = self.db.collection(self.TOMBSTONES_COLLECTION).document(f"{collection_name}-{doc_id}")
+        writer.set(tombstone_ref, {
+            'collection': collection_name,
+            'doc_id': doc_id,
+            self.SYNC_FIELD: firestore.SERVER_TIMESTAMP,
+            'expire_at': datetime.now() + self.TOMBSTONE_RETENTION
+        })
+
+    def _run_sync(self):
+        while self._sync_enabled:
+            if not self._sync_wake.wait(self.SYNC_INTERVAL):
+                self.sync_collections()
+            self._sync_wake.clear()
+            self._save_sync_state()
+
+    def _load_sync_state(self):
+        """Start the mirror from the state saved by a previous run, if recent enough"""
+        backing = self._cache.backing
+        if backing is None:
+            return
+        for collection_name in self.MIRRORED_COLLECTIONS:
+            try:
+                stored = backing.get(f"sync_{collection_name}")
+            except Exception as e:
+                print(f"Load sync state error: {e}")
+                return
+            if stored is None:
+                continue
+            state = stored[0]
+            if datetime.now() - state['marks']['pulled_at'] >= self.TOMBSTONE_RETENTION:
+                continue
+            self._sync_marks[collection_name] = state['marks']
+            self._apply_mirror_changes(collection_name, state['documents'], [], replace=True)
+
+    def _save_sync_state(self):
+        backing = self._cache.backing
+        if backing is None:
+            return
+        for collection_name in list(self._sync_unsaved):
+            self._sync_unsaved.discard(collection_name)
+            with self._sync_lock:
+                marks = self._sync_marks.get(collection_name)
+                with self._mirror_lock:
+                    documents = dict(self._mirror.get(collection_name) or {})
+            if marks is None:
+                continue
+            try:
+                backing.set(f"sync_{collection_name}", {'marks': marks, 'documents': documents})
+            except Exception as e:
+                print(f"Save sync state error: {e}")
+
+    # ========== OFFLINE OUTBOX ==========
+
+    def enable_outbox(self, path: str = None) -> bool:
+        """Queue writes that cannot reach the database in a file (default: app data directory).
+
+        Queued writes are applied to the cached data straight away and
+        replayed in order by a background thread once the database can be
+        reached again, including writes left over from a previous run.
+        """
+        try:
+            if self.outbox is None:
+                self.outbox = Outbox(path or default_outbox_path())
+            if len(self.outbox):
+                self._outbox_wake.set()
+                self._ensure_outbox_worker()
+            return True
+        except Exception as e:
+            print(f"Enable outbox error: {e}")
+            return False
+
+    def get_outbox_status(self) -> Dict[str, Any]:
+        """Number of writes waiting to be replayed, and the writes rejected as conflicts"""
+        if self.outbox is None:
+            return {'pending': 0, 'conflicts': []}
+        return {'pending': len(self.outbox), 'conflicts': self.outbox.conflicts()}
+
+    def _write_or_queue(self, operation: str, args: Dict, collection_name: str = None, doc_id: str = None) -> bool:
+        """Run the write `_<operation>(**args)`, or queue it if the database cannot be reached.
+
+        Once a write is queued, later ones queue behind it so that they are
+        applied in the order they were made.
+        """
+        handler = getattr(self, '_' + operation)
+        if self.outbox is None:
+            return handler(**args)
+        if not len(self.outbox):
+            try:
+                return handler(**args)
+            except OFFLINE_ERRORS as e:
+                print(f"Database unreachable, queueing {operation}: {e}")
+
+        document = f"{collection_name}/{doc_id}" if collection_name else None
+        base = self._cached_version(collection_name, doc_id) if collection_name else None
+        self.outbox.put(operation, args, document, args.get('at'), base)
+        self._apply_queued(operation, args)
+        self._ensure_outbox_worker()
+        return True
+
+    def _check_version(self, found: Optional[str], expected: Optional[str], version: str):
+        """Raise WriteConflict if a replayed write's document changed since it was queued.
+
+        Finding the write's own version means it was already applied (its
+        first attempt failed after reaching the database).
+        """
+        if expected is not None and found not in (expected, version):
+            raise WriteConflict(f"document changed since the write was queued ({expected} -> {found})")
+
+    def _cached_version(self, collection_name: str, doc_id: str) -> Optional[str]:
+        """Version of a document as last seen in the mirror or the cached results"""
+        field = self.OUTBOX_VERSION_FIELDS.get(collection_name)
+        if field is None:
+            return None
+        with self._mirror_lock:
+            documents = self._mirror.get(collection_name)
+            if documents and doc_id in documents:
+                return documents[doc_id].get(field)
+        for value in self._cache.values(self.MIRRORED_COLLECTIONS.get(collection_name, collection_name)):
+            for record in value if isinstance(value, list) else ():
+                if isinstance(record, dict) and record.get('id') == doc_id:
+                    return record.get(field)
         return None
 
-    def _set_cached(self, key: str, data: Any, duration: int = None):
-        """Set data in cache with expiry"""
-        if duration is None:
-            duration = self.CACHE_DURATION
-
-        self._cache[key] = data
-        self._cache_expiry[key] = datetime.now() + timedelta(seconds=duration)
-        # print(f"Cache set for {key}")
-
-    def _invalidate_cache(self, key_prefix: str):
-        """Invalidate all cache keys starting with key_prefix"""
-        keys_to_remove = [k for k in self._cache.keys() if k.startswith(key_prefix)]
-        for k in keys_to_remove:
-            if k in self._cache:
-                del self._cache[k]
-            if k in self._cache_expiry:
-                del self._cache_expiry[k]
-        # print(f"Cache invalidated for prefix {key_prefix}")
+    def _apply_queued(self, operation: str, args: Dict):
+        """Show a queued write in the cached data until it is replayed"""
+        if operation == 'update_vehicle_status':
+            fields = self._vehicle_status_fields(args['status'], args.get('location'), args.get('at'))
+            self._patch_cached_records('vehicles', args['vehicle_id'], fields)
+        elif operation == 'update_mission_status':
+            fields = self._mission_status_fields(args['status'], args.get('notes'), args.get('at'))
+            self._patch_cached_records('missions', args['mission_id'], fields)
+            self._index_mission(args['mission_id'], fields)
+
+    def _patch_cached_records(self, tag: str, record_id: str, fields: Dict):
+        """Update one record in every cached list tagged with tag"""
+        def patch(key, value):
+            if not isinstance(value, list):
+                return value
+            records = []
+            for record in value:
+                if isinstance(record, dict) and record.get('id') == record_id:
+                    record = {**record, **fields}
+                    # Lists of one status (missions_status_<STATUS>) lose the record
+                    if key.startswith('missions_status_') and record.get('status') != key[len('missions_status_'):]:
+                        continue
+                records.append(record)
+            return records
+
+        self._cache.patch(tag, patch)
+
+    def flush_outbox(self) -> bool:
+        """Replay the queued writes in order; returns True once none are left"""
+        if self.outbox is None:
+            return True
+        with self._outbox_lock:
+            while True:
+                entries = self.outbox.peek(self.OUTBOX_BATCH_SIZE)
+                if not entries:
+                    return True
+                try:
+                    self._replay(entries)
+                except OFFLINE_ERRORS as e:
+                    print(f"Outbox replay postponed: {e}")
+                    return False
+
+    def _replay(self, entries: List[Dict]):
+        """Apply queued writes, removing each from the outbox once it is written.
+
+        Consecutive mission log entries are written in a single batch. A
+        write whose document changed or disappeared in the meantime is moved
+        to the conflicts and its optimistic changes are dropped.
+        """
+        index = 0
+        while index < len(entries):
+            entry = entries[index]
+            if entry['operation'] == 'add_mission_log':
+                run = [entry]
+                while (index + len(run) < len(entries) and len(run) < ActivityLogger.MAX_BATCH_WRITES and
+                       entries[index + len(run)]['operation'] == 'add_mission_log'):
+                    run.append(entries[index + len(run)])
+                batch = self.db.batch()
+                for log_entry in run:
+                    self._stage_mission_log(batch, **log_entry['args'])
+                batch.commit()
+                self.outbox.remove(log_entry['seq'] for log_entry in run)
+                index += len(run)
+                continue
+
+            args = dict(entry['args'])
+            if entry['base'] is not None:
+                args['expected'] = entry['base']
+            try:
+                reason = None if getattr(self, '_' + entry['operation'])(**args) else "document not found"
+            except OFFLINE_ERRORS:
+                raise
+            except Exception as e:
+                reason = str(e)
+
+            if reason is None:
+                self.outbox.remove([entry['seq']])
+            else:
+                print(f"Outbox conflict for {entry['operation']} on {entry['document']}: {reason}")
+                self.outbox.reject(entry, reason)
+                self._invalidate_cache(*self._outbox_tags(entry))
+                if entry['operation'] == 'update_mission_status':
+                    # Rebuilt from the database on the next search
+                    self._mission_index_built_at = None
+            index += 1
+
+    def _outbox_tags(self, entry: Dict) -> List[str]:
+        collection_name = (entry['document'] or '').split('/', 1)[0]
+        return [self.MIRRORED_COLLECTIONS.get(collection_name, collection_name), 'dashboard']
+
+    def _ensure_outbox_worker(self):
+        with self._outbox_thread_lock:
+            if self._outbox_thread is not None:
+                return
+            self._outbox_thread = threading.Thread(target=self._run_outbox, name='outbox', daemon=True)
+            self._outbox_thread.start()
+
+    def _run_outbox(self):
+        delay = self.OUTBOX_RETRY_INTERVAL
+        while True:
+            # Stops once the outbox is empty; the next queued write starts a new worker
+            with self._outbox_thread_lock:
+                if self.outbox is None or not len(self.outbox):
+                    self._outbox_thread = None
+                    return
+            self._outbox_wake.wait(delay)
+            self._outbox_wake.clear()
+            if self.flush_outbox():
+                delay = self.OUTBOX_RETRY_INTERVAL
+            else:
+                delay = min(delay * 2, self.OUTBOX_MAX_RETRY_INTERVAL)
+
+    # ========== MISSION LOGS ==========
+
+    def add_mission_log(self, mission_id: str, action: str, user_name: str, notes: str = None) -> bool:
+        """Add a log entry to a mission (queued while offline, see enable_outbox)"""
+        try:
+            if not self.db:
+                return False
+
+            args = {'mission_id': mission_id, 'action': action, 'user_name': user_name, 'notes': notes,
+                    'at': datetime.now().isoformat(), 'log_id': self.generate_id()}
+            return self._write_or_queue('add_mission_log', args)
+        except Exception as e:
+            print(f"Add mission log error: {e}")
+            return False
+
+    def _add_mission_log(self, mission_id: str, action: str, user_name: str, notes: str = None, at: str = None,
+                         log_id: str = None) -> bool:
+        batch = self.db.batch()
+        self._stage_mission_log(batch, mission_id, action, user_name, notes, at, log_id)
+        batch.commit()
+        return True
+
+    def _stage_mission_log(self, writer, mission_id: str, action: str, user_name: str, notes: str = None,
+                           at: str = None, log_id: str = None):
+        """Add a log entry to a write batch; the same log_id is only written once"""
+        log_data = {
+            'action': action,
+            'user_name': user_name,
+            'created_at': at or datetime.now().isoformat()
+        }
+        if notes:
+            log_data['notes'] = notes
+
+        # Add the log to the 'mission_logs' subcollection of the mission
+        logs_ref = self.db.collection(self.MISSIONS_COLLECTION).document(mission_id).collection(self.MISSION_LOGS_COLLECTION)
+        writer.set(logs_ref.document(log_id) if log_id else logs_ref.document(), log_data)
+
+    def pending_mission_logs(self, mission_id: str) -> List[Dict]:
+        """Queued log entries of a mission, newest first"""
+        if self.outbox is None:
+            return []
+        logs = []
+        for entry in self.outbox.pending('add_mission_log'):
+            args = entry['args']
+            if args['mission_id'] != mission_id:
+                continue
+            log_data = {'id': args.get('log_id'), 'action': args['action'], 'user_name': args['user_name'],
+                        'created_at': args.get('at'), 'pending': True}
+            if args.get('notes'):
+                log_data['notes'] = args['notes']
+            logs.append(log_data)
+        return logs[::-1]
+
+    # ========== MISSION SEARCH INDEX ==========
+
+    def get_mission_index(self) -> Optional[MissionSearchIndex]:
+        """The mission search index, (re)built from the database if needed"""
+        try:
+            if not self.db:
+                return None
+
+            built_at = self._mission_index_built_at
+            live = self._mirror_synced(self.MISSIONS_COLLECTION) and self._mirror_synced(self.USERS_COLLECTION)
+            if built_at is not None and (live or datetime.now() - built_at < timedelta(seconds=self.SEARCH_INDEX_MAX_AGE)):
+                return self.mission_index
+
+            mirrored = self._mirror_documents(self.MISSIONS_COLLECTION)
+            if mirrored is not None:
+                missions = mirrored.values()
+            else:
+                missions = [self.to_dict(doc) for doc in self.db.collection(self.MISSIONS_COLLECTION).stream()]
+            names = {employee['id']: employee.get('name') for employee in self.get_all_employees()}
+
+            self.mission_index.build((mission for mission in missions if mission), names)
+            self._mission_index_built_at = datetime.now()
+            return self.mission_index
+        except Exception as e:
+            print(f"Build mission index error: {e}")
+            return None
+
+    def _index_mission(self, mission_id: str, fields: Dict = None, removed: bool = False, full: bool = False):
+        """Apply a mission write to the search index once it has been built"""
+        if self._mission_index_built_at is None:
+            return
+        if removed:
+            self.mission_index.remove(mission_id)
+        elif full:
+            self.mission_index.add({**fields, 'id': mission_id})
+        else:
+            self.mission_index.update(mission_id, fields)
+
+    def _index_mirror_changes(self, collection_name: str, changed: Dict[str, Dict], removed):
+        """Apply mirrored mission and user changes to the search index"""
+        if self._mission_index_built_at is None:
+            return
+        if collection_name == self.MISSIONS_COLLECTION:
+            for doc_id in removed:
+                self.mission_index.remove(doc_id)
+            for mission in changed.values():
+                self.mission_index.add(mission)
+        elif collection_name == self.USERS_COLLECTION:
+            for doc_id in removed:
+                self.mission_index.set_name(doc_id, None)
+            for doc_id, user_data in changed.items():
+                self.mission_index.set_name(doc_id, user_data.get('full_name'))
 
     # ========== UTILITY FUNCTIONS ==========
     
@@ -111,7 +982,40 @@ class DatabaseManager:
             data['id'] = doc_snapshot.id
             return data
         return None
-    
+
+    def _run_transaction(self, func, *args):
+        """Run func(transaction, *args) in a transaction and return its result.
+
+        Firestore retries the function on contention; local backends hold
+        their store lock for the duration instead.
+        """
+        if isinstance(self.db, backends.LocalClient):
+            return self.db.run_transaction(func, *args)
+        return firestore.transactional(func)(self.db.transaction(), *args)
+
+    def get_documents_by_ids(self, collection_name: str, doc_ids) -> Dict[str, Dict]:
+        """Fetch many documents of one collection in bulk, keyed by document ID"""
+        # Drop empty and duplicate IDs while keeping the original order
+        unique_ids = [str(doc_id) for doc_id in dict.fromkeys(doc_ids) if doc_id]
+        documents = {}
+        if not self.db or not unique_ids:
+            return documents
+
+        mirrored = self._mirror_documents(collection_name)
+        if mirrored is not None:
+            return {doc_id: mirrored[doc_id] for doc_id in unique_ids if doc_id in mirrored}
+
+        collection_ref = self.db.collection(collection_name)
+        for start in range(0, len(unique_ids), self.BULK_FETCH_CHUNK_SIZE):
+            chunk = unique_ids[start:start + self.BULK_FETCH_CHUNK_SIZE]
+            doc_refs = [collection_ref.document(doc_id) for doc_id in chunk]
+            for doc in self.db.get_all(doc_refs):
+                doc_data = self.to_dict(doc)
+                if doc_data:
+                    documents[doc.id] = doc_data
+
+        return documents
+
     # ========== AUTHENTICATION ==========
     
     def login(self, username: str, password: str) -> Optional[Dict]:
@@ -122,25 +1026,110 @@ class DatabaseManager:
                 
             hashed_password = self.hash_password(password)
             
-            # Query users collection
-            users_ref = self.db.collection(self.USERS_COLLECTION)
-            query = users_ref.where('username', '==', username).where('password', '==', hashed_password).where('active', '==', True).limit(1)
-            
-            results = query.stream()
-            for doc in results:
-                user_data = self.to_dict(doc)
-                if user_data:
-                    # Update last login
-                    self.db.collection(self.USERS_COLLECTION).document(doc.id).update({
-                        'last_login': datetime.now().isoformat()
-                    })
-                    return user_data
+            # Direct lookup through the usernames index
+            user_data = self._find_user_by_username(username)
+            if user_data and user_data.get('password') == hashed_password and user_data.get('active') is True:
+                # Update last login, without waiting for the write
+                self._record_last_login(user_data['id'])
+                return user_data
             
             return None
         except Exception as e:
             print(f"Login error: {e}")
             return None
 
+    # ========== USERNAMES INDEX ==========
+
+    def _username_ref(self, username: str):
+        """Document of a username in the usernames index"""
+        # Document IDs cannot contain '/' nor be '.' or '..'
+        return self.db.collection(self.USERNAMES_COLLECTION).document(quote(username, safe='').replace('.', '%2E'))
+
+    def _find_user_by_username(self, username: str) -> Optional[Dict]:
+        """The user with a username, read through the usernames index"""
+        index_doc = self._username_ref(username).get()
+        if index_doc.exists:
+            user_id = (index_doc.to_dict() or {}).get('user_id')
+            user_data = self.to_dict(self.db.collection(self.USERS_COLLECTION).document(user_id).get()) if user_id else None
+            return user_data if user_data and user_data.get('username') == username else None
+
+        if not self.LEGACY_USERNAME_LOOKUP:
+            return None
+        # Not indexed yet; backfill_username_index() adds them
+        for doc in self.db.collection(self.USERS_COLLECTION).where('username', '==', username).limit(1).stream():
+            return self.to_dict(doc)
+        return None
+
+    def _legacy_username_owner(self, transaction, username: str) -> Optional[str]:
+        """ID of a user holding a username that is not indexed yet, read in a transaction"""
+        if not self.LEGACY_USERNAME_LOOKUP:
+            return None
+        query = self.db.collection(self.USERS_COLLECTION).where('username', '==', username).limit(1)
+        for doc in query.stream(transaction=transaction):
+            return doc.id
+        return None
+
+    def _index_username(self, username: str, user_id: str) -> bool:
+        """Add a username to the index unless it is already there"""
+        index_ref = self._username_ref(username)
+
+        def index(transaction):
+            if index_ref.get(transaction=transaction).exists:
+                return False
+            transaction.set(index_ref, {'user_id': user_id})
+            return True
+
+        try:
+            return self._run_transaction(index)
+        except Exception as e:
+            print(f"Index username error: {e}")
+            return False
+
+    def backfill_username_index(self) -> Optional[int]:
+        """Index the usernames of the users created before the index; returns how many were added (None on failure).
+
+        When two legacy users share a username, the first one keeps it.
+        """
+        try:
+            if not self.db:
+                return None
+
+            added = 0
+            for doc in self.db.collection(self.USERS_COLLECTION).stream():
+                username = (doc.to_dict() or {}).get('username')
+                if username and self._index_username(username, doc.id):
+                    added += 1
+            return added
+        except Exception as e:
+            print(f"Backfill username index error: {e}")
+            return None
+
+    def _record_last_login(self, user_id: str):
+        """Queue the last login time of a user for the background writer"""
+        self.last_login_writer.record(user_id, self._stamped({'last_login': datetime.now().isoformat()}))
+
+    def get_session_user(self, user_id: str):
+        """Current profile of a user resuming a saved session.
+
+        Returns the user while the account is active, False once it has been
+        deleted or deactivated, and None if the database could not be reached.
+        """
+        try:
+            if not self.db:
+                return None
+
+            user_data = self.to_dict(self.db.collection(self.USERS_COLLECTION).document(user_id).get())
+            if not user_data or not user_data.get('active', False):
+                return False
+            return user_data
+        except Exception as e:
+            print(f"Get session user error: {e}")
+            return None
+
+    def prefetch_dashboard(self):
+        """Load the dashboard statistics into the cache ahead of the dashboard"""
+        self.get_dashboard_stats()
+
     def create_user(self, username: str, full_name: str, password: str, role: str, department_id: int, active: bool = True) -> bool:
         """Create new user"""
         try:
@@ -153,25 +1142,40 @@ class DatabaseManager:
                 'password': self.hash_password(password),
                 'role': role,
                 'department_id': department_id,
-                'active': active,
+                'active': bool(active),
                 'mission_status': 'AVAILABLE',
                 'created_at': datetime.now().isoformat(),
                 'updated_at': datetime.now().isoformat(),
                 'last_login': None
             }
             
-            # Check if username already exists
-            existing_user = self.db.collection(self.USERS_COLLECTION).where('username', '==', username).limit(1).stream()
-            if any(existing_user):
-                return False
-            
-            # Add user to Firestore
-            doc_ref = self.db.collection(self.USERS_COLLECTION).add(user_data)
+            doc_ref = self.db.collection(self.USERS_COLLECTION).document()
+            index_ref = self._username_ref(username)
+
+            def create(transaction):
+                # Check if username already exists; claiming its index
+                # document in the same transaction makes it unique
+                if index_ref.get(transaction=transaction).exists:
+                    return False
+                legacy_owner = self._legacy_username_owner(transaction, username)
+                if legacy_owner:
+                    transaction.set(index_ref, {'user_id': legacy_owner})
+                    return False
 
-            if doc_ref:
-                self._invalidate_cache('employees') # Invalidate cache
+                # Add user to Firestore together with the statistics update
+                transaction.set(doc_ref, self._stamped(user_data))
+                transaction.set(index_ref, {'user_id': doc_ref.id})
+                self._stage_stats(transaction, {
+                    'employees.total': 1,
+                    'employees.active': 1 if active else 0
+                })
                 return True
-            return False
+
+            if not self._run_transaction(create):
+                return False
+
+            self._invalidate_cache('employees', 'dashboard') # Invalidate cache
+            return True
         except Exception as e:
             print(f"Create user error: {e}")
             return False
@@ -180,47 +1184,44 @@ class DatabaseManager:
     
     def get_all_employees(self) -> List[Dict]:
         """Get all employees with department info"""
-        cache_key = 'employees_all'
-        cached = self._get_cached(cache_key)
-        if cached is not None:
-            return cached
-
         try:
             if not self.db:
                 return []
-                
-            employees = []
-            users_ref = self.db.collection(self.USERS_COLLECTION)
-            
-            # Get all users
-            for doc in users_ref.stream():
-                user_data = self.to_dict(doc)
-                if user_data:
-                    # Get department info
-                    department_name = 'Unknown'
-                    if user_data.get('department_id'):
-                        dept_doc = self.db.collection(self.DEPARTMENTS_COLLECTION).document(str(user_data['department_id'])).get()
-                        if dept_doc.exists:
-                            dept_data = dept_doc.to_dict()
-                            department_name = dept_data.get('name', 'Unknown')
-                    
-                    employees.append({
-                        'id': user_data['id'],
-                        'name': user_data['full_name'],
-                        'username': user_data['username'],
-                        'role': user_data['role'],
-                        'department': department_name,
-                        'status': 'ACTIVE' if user_data['active'] else 'INACTIVE',
-                        'mission_status': user_data.get('mission_status', 'AVAILABLE'),
-                        'last_login': user_data.get('last_login'),
-                        'created_at': user_data.get('created_at')
-                    })
-            
-            self._set_cached(cache_key, employees)
-            return employees
+
+            return self._get_or_load('employees_all', self._load_all_employees, stale=True)
         except Exception as e:
             print(f"Get employees error: {e}")
             return []
+
+    def _load_all_employees(self) -> List[Dict]:
+        """Read every user and shape them for the employee screens"""
+        employees = []
+
+        # Departments are resolved from the reference data map
+        department_map = self.get_department_map()
+
+        mirrored = self._mirror_documents(self.USERS_COLLECTION)
+        if mirrored is not None:
+            users = mirrored.values()
+        else:
+            users = (self.to_dict(doc) for doc in self.db.collection(self.USERS_COLLECTION).stream())
+        
+        # Get all users
+        for user_data in users:
+            if user_data:
+                employees.append({
+                    'id': user_data['id'],
+                    'name': user_data['full_name'],
+                    'username': user_data['username'],
+                    'role': user_data['role'],
+                    'department': self.get_department_name(user_data.get('department_id'), department_map),
+                    'status': 'ACTIVE' if user_data['active'] else 'INACTIVE',
+                    'mission_status': user_data.get('mission_status', 'AVAILABLE'),
+                    'last_login': user_data.get('last_login'),
+                    'created_at': user_data.get('created_at')
+                })
+        
+        return employees
     
     def get_employee_by_id(self, employee_id: str) -> Optional[Dict]:
         """Get employee by ID"""
@@ -243,12 +1244,57 @@ class DatabaseManager:
                 
             if 'password' in update_data:
                 update_data['password'] = self.hash_password(update_data['password'])
+            # Stored as a bool so active users can be counted server-side
+            if 'active' in update_data:
+                update_data['active'] = bool(update_data['active'])
             
             update_data['updated_at'] = datetime.now().isoformat()
-            
-            self.db.collection(self.USERS_COLLECTION).document(employee_id).update(update_data)
+
+            doc_ref = self.db.collection(self.USERS_COLLECTION).document(employee_id)
+
+            def update(transaction):
+                current = doc_ref.get(transaction=transaction)
+                if not current.exists:
+                    return False
+                current_data = current.to_dict() or {}
+
+                # A rename moves the user's entry in the usernames index
+                old_username = current_data.get('username')
+                new_username = update_data.get('username', old_username)
+                renamed = bool(new_username) and new_username != old_username
+                if renamed:
+                    new_ref = self._username_ref(new_username)
+                    taken = new_ref.get(transaction=transaction)
+                    if taken.exists and (taken.to_dict() or {}).get('user_id') != employee_id:
+                        return False
+                    if self._legacy_username_owner(transaction, new_username) not in (None, employee_id):
+                        return False
+                    old_ref = self._username_ref(old_username) if old_username else None
+                    old_index = old_ref.get(transaction=transaction) if old_ref else None
+
+                transaction.update(doc_ref, self._stamped(update_data))
+                if renamed:
+                    transaction.set(new_ref, {'user_id': employee_id})
+                    if old_index is not None and old_index.exists and \
+                            (old_index.to_dict() or {}).get('user_id') == employee_id:
+                        transaction.delete(old_ref)
+
+                # Only a change of the active flag moves the statistics
+                if 'active' in update_data:
+                    was_active = bool(current_data.get('active'))
+                    self._stage_stats(transaction, {
+                        'employees.active': int(bool(update_data['active'])) - int(was_active)
+                    })
+                return True
+
+            if not self._run_transaction(update):
+                return False
 
             self._invalidate_cache('employees') # Invalidate cache
+            if 'active' in update_data:
+                self._invalidate_cache('dashboard')
+            if 'full_name' in update_data and self._mission_index_built_at is not None:
+                self.mission_index.set_name(employee_id, update_data['full_name'])
             return True
         except Exception as e:
             print(f"Update employee error: {e}")
@@ -258,25 +1304,25 @@ class DatabaseManager:
     
     def get_all_vehicles(self) -> List[Dict]:
         """Get all vehicles"""
-        cache_key = 'vehicles_all'
-        cached = self._get_cached(cache_key)
-        if cached is not None:
-            return cached
-
         try:
             if not self.db:
                 return []
-                
-            vehicles = []
-            vehicles_ref = self.db.collection(self.VEHICLES_COLLECTION)
-            
-            for doc in vehicles_ref.stream():
-                vehicle_data = self.to_dict(doc)
-                if vehicle_data:
-                    vehicles.append(vehicle_data)
-            
-            self._set_cached(cache_key, vehicles)
-            return vehicles
+
+            mirrored = self._mirror_documents(self.VEHICLES_COLLECTION)
+            if mirrored is not None:
+                return list(mirrored.values())
+
+            def load():
+                vehicles = []
+                vehicles_ref = self.db.collection(self.VEHICLES_COLLECTION)
+
+                for doc in vehicles_ref.stream():
+                    vehicle_data = self.to_dict(doc)
+                    if vehicle_data:
+                        vehicles.append(vehicle_data)
+                return vehicles
+
+            return self._get_or_load('vehicles_all', load, stale=True)
         except Exception as e:
             print(f"Get vehicles error: {e}")
             return []
@@ -318,61 +1364,92 @@ class DatabaseManager:
                     print(f"Vehicle with plate number {vehicle_data['plate_number']} already exists")
                     return False
             
-            doc_ref = self.db.collection(self.VEHICLES_COLLECTION).add(vehicle_data)
+            doc_ref = self.db.collection(self.VEHICLES_COLLECTION).document()
+            batch = self.db.batch()
+            batch.set(doc_ref, self._stamped(vehicle_data))
+            self._commit_with_stats(batch, {
+                'vehicles.total': 1,
+                **self._status_deltas('vehicles', self.VEHICLE_STATUSES, new_status=vehicle_data.get('status'))
+            })
 
-            if doc_ref:
-                self._invalidate_cache('vehicles')
-                return True
-            return False
+            self._invalidate_cache('vehicles')
+            return True
         except Exception as e:
             print(f"Create vehicle error: {e}")
             return False
     
     def update_vehicle_status(self, vehicle_id: str, status: str, location: str = None) -> bool:
-        """Update vehicle status and location"""
+        """Update vehicle status and location (queued while offline, see enable_outbox)"""
         try:
             if not self.db:
                 return False
-                
-            update_data = {
-                'status': status,
-                'last_updated': datetime.now().isoformat()
-            }
-            
-            if location:
-                update_data['location'] = location
-            
-            self.db.collection(self.VEHICLES_COLLECTION).document(vehicle_id).update(update_data)
 
-            self._invalidate_cache('vehicles')
-            return True
+            args = {'vehicle_id': vehicle_id, 'status': status, 'location': location, 'at': datetime.now().isoformat()}
+            return self._write_or_queue('update_vehicle_status', args, self.VEHICLES_COLLECTION, vehicle_id)
         except Exception as e:
             print(f"Update vehicle status error: {e}")
             return False
+
+    def _vehicle_status_fields(self, status: str, location: str = None, at: str = None) -> Dict:
+        update_data = {
+            'status': status,
+            'last_updated': at or datetime.now().isoformat()
+        }
+
+        if location:
+            update_data['location'] = location
+        return update_data
+
+    def _update_vehicle_status(self, vehicle_id: str, status: str, location: str = None, at: str = None,
+                               expected: str = None) -> bool:
+        """Write a vehicle status update; raises on failure"""
+        update_data = self._vehicle_status_fields(status, location, at)
+
+        doc_ref = self.db.collection(self.VEHICLES_COLLECTION).document(vehicle_id)
+
+        def update(transaction):
+            # The status the deltas start from is read in the transaction, so
+            # concurrent updates cannot both move the counters from it
+            current = doc_ref.get(transaction=transaction)
+            if not current.exists:
+                return False
+            current_data = current.to_dict() or {}
+            self._check_version(current_data.get('last_updated'), expected, update_data['last_updated'])
+            old_status = current_data.get('status')
+
+            transaction.update(doc_ref, self._stamped(update_data))
+            self._stage_stats(transaction, self._status_deltas('vehicles', self.VEHICLE_STATUSES, old_status, status))
+            return True
+
+        if not self._run_transaction(update):
+            return False
+
+        self._invalidate_cache('vehicles', 'dashboard')
+        return True
     
     # ========== EQUIPMENT/TOOLS MANAGEMENT ==========
     
     def get_all_tools(self) -> List[Dict]:
         """Get all tools/equipment"""
-        cache_key = 'tools_all'
-        cached = self._get_cached(cache_key)
-        if cached is not None:
-            return cached
-
         try:
             if not self.db:
                 return []
-                
-            tools = []
-            tools_ref = self.db.collection(self.TOOLS_COLLECTION)
-            
-            for doc in tools_ref.stream():
-                tool_data = self.to_dict(doc)
-                if tool_data:
-                    tools.append(tool_data)
-            
-            self._set_cached(cache_key, tools)
-            return tools
+
+            mirrored = self._mirror_documents(self.TOOLS_COLLECTION)
+            if mirrored is not None:
+                return list(mirrored.values())
+
+            def load():
+                tools = []
+                tools_ref = self.db.collection(self.TOOLS_COLLECTION)
+
+                for doc in tools_ref.stream():
+                    tool_data = self.to_dict(doc)
+                    if tool_data:
+                        tools.append(tool_data)
+                return tools
+
+            return self._get_or_load('tools_all', load, stale=True)
         except Exception as e:
             print(f"Get tools error: {e}")
             return []
@@ -417,44 +1494,80 @@ class DatabaseManager:
                     print(f"Tool with serial number {tool_data['serial_number']} already exists")
                     return False
             
-            doc_ref = self.db.collection(self.TOOLS_COLLECTION).add(tool_data)
+            doc_ref = self.db.collection(self.TOOLS_COLLECTION).document()
+            batch = self.db.batch()
+            batch.set(doc_ref, self._stamped(tool_data))
+            self._commit_with_stats(batch, {
+                'tools.total_quantity': tool_data.get('total_quantity', 0),
+                'tools.available_quantity': tool_data.get('available_quantity', 0)
+            })
 
-            if doc_ref:
-                self._invalidate_cache('tools')
-                return True
-            return False
+            self._invalidate_cache('tools')
+            return True
         except Exception as e:
             print(f"Create tool error: {e}")
             return False
     
     def update_tool_quantity(self, tool_id: str, used_quantity: int, operation: str = 'assign') -> bool:
         """Update tool quantity (assign/return)"""
-        try:
-            if not self.db:
-                return False
-                
-            # Get current tool info
-            tool_doc = self.db.collection(self.TOOLS_COLLECTION).document(tool_id).get()
-            
-            if not tool_doc.exists:
-                return False
-            
+        delta = -used_quantity if operation == 'assign' else used_quantity
+        return self.adjust_tool_quantities({tool_id: delta})
+
+    def _stage_tool_adjustments(self, transaction, adjustments: Dict[str, int], skip_missing: bool = False) -> int:
+        """Read tools inside a transaction and stage their new available quantities.
+
+        Raises ValueError when a tool would go below zero, or is missing unless
+        skip_missing is set; returned stock is capped at the tool's total
+        quantity. Returns the net change in available quantity across all tools.
+        """
+        adjustments = {tool_id: delta for tool_id, delta in adjustments.items() if delta}
+        # Nothing to read: Firestore rejects a batch get of no documents
+        if not adjustments:
+            return 0
+
+        tools_ref = self.db.collection(self.TOOLS_COLLECTION)
+        tool_docs = {doc.id: doc for doc in transaction.get_all([tools_ref.document(tool_id) for tool_id in adjustments])}
+
+        updates = {}
+        for tool_id, delta in adjustments.items():
+            tool_doc = tool_docs.get(tool_id)
+            if tool_doc is None or not tool_doc.exists:
+                if skip_missing:
+                    continue
+                raise ValueError(f"Tool {tool_id} not found")
+
             tool_data = tool_doc.to_dict()
             current_available = tool_data.get('available_quantity', 0)
-            
-            if operation == 'assign':
-                new_available = current_available - used_quantity
-                if new_available < 0:
-                    return False  # Not enough tools available
-            else:  # return
-                new_available = min(current_available + used_quantity, tool_data.get('total_quantity', 0))
-            
-            self.db.collection(self.TOOLS_COLLECTION).document(tool_id).update({
+            new_available = current_available + delta
+            if new_available < 0:
+                raise ValueError(f"Not enough units of tool {tool_id} available ({current_available} left)")
+            updates[tool_id] = (current_available, min(new_available, tool_data.get('total_quantity', 0)))
+
+        # All reads happen before the first write, as Firestore transactions require
+        for tool_id, (current_available, new_available) in updates.items():
+            transaction.update(tools_ref.document(tool_id), self._stamped({
                 'available_quantity': new_available,
                 'last_updated': datetime.now().isoformat()
-            })
-            
-            self._invalidate_cache('tools')
+            }))
+        return sum(new - current for current, new in updates.values())
+
+    def adjust_tool_quantities(self, adjustments: Dict[str, int]) -> bool:
+        """Change the available quantity of many tools in one transaction.
+
+        adjustments maps tool IDs to deltas: negative to assign, positive to return.
+        Nothing is written if any tool lacks the requested stock.
+        """
+        try:
+            if not self.db:
+                return False
+
+            def apply(transaction):
+                available_delta = self._stage_tool_adjustments(transaction, adjustments)
+                self._stage_stats(transaction, {'tools.available_quantity': available_delta})
+
+            self._run_transaction(apply)
+
+            self._invalidate_cache('tools', 'dashboard')
             return True
         except Exception as e:
             print(f"Update tool quantity error: {e}")
@@ -463,55 +1576,91 @@ class DatabaseManager:
     # ========== MISSION/PROJECT MANAGEMENT ==========
     
     def create_mission(self, mission_data: Dict) -> bool:
-        """Create new mission"""
+        """Create new mission and assign its team, vehicle and tools in one transaction"""
         try:
             if not self.db:
                 return False
                 
             mission_data['created_at'] = datetime.now().isoformat()
             mission_data['updated_at'] = datetime.now().isoformat()
-            
-            doc_ref, doc_id = self.db.collection(self.MISSIONS_COLLECTION).add(mission_data)
-            
-            if doc_ref:
-                mission_id = doc_id.id
-
-                # Assign Team (Personnel)
-                assigned_team = mission_data.get('assigned_team', [])
-                # Also include assigned_person_id if present and not in team
-                if mission_data.get('assigned_person_id') and mission_data.get('assigned_person_id') not in assigned_team:
-                    assigned_team.append(mission_data.get('assigned_person_id'))
-                # Also include team_leader_id if present and not in team
-                if mission_data.get('team_leader_id') and mission_data.get('team_leader_id') not in assigned_team:
-                    assigned_team.append(mission_data.get('team_leader_id'))
 
-                if assigned_team:
-                    assign_personnel_to_mission(mission_id, assigned_team)
+            # Assign Team (Personnel), including the assignee and team leader
+            assigned_team = self._mission_team(mission_data)
+            if assigned_team:
+                mission_data['personnel_ids'] = assigned_team
+
+            vehicle_id = mission_data.get('vehicle_id')
+            # Default quantity 1 for now
+            tool_quantities = {tool_id: 1 for tool_id in mission_data.get('required_tools', [])}
+
+            users_ref = self.db.collection(self.USERS_COLLECTION)
+            vehicles_ref = self.db.collection(self.VEHICLES_COLLECTION)
+            doc_ref = self.db.collection(self.MISSIONS_COLLECTION).document()
+            mission_id = doc_ref.id
+
+            def create(transaction):
+                # Firestore transactions need every read before the first write
+                team_docs = self._get_existing(transaction, [users_ref.document(person_id) for person_id in assigned_team])
+                vehicle_docs = self._get_existing(transaction, [vehicles_ref.document(vehicle_id)] if vehicle_id else [])
+                stats_deltas = {
+                    'missions.total': 1,
+                    **self._status_deltas('missions', self.MISSION_STATUSES, new_status=mission_data.get('status')),
+                    'tools.available_quantity': self._stage_tool_adjustments(
+                        transaction, {tool_id: -quantity for tool_id, quantity in tool_quantities.items()})
+                }
+
+                transaction.set(doc_ref, self._stamped(mission_data))
+
+                for team_doc in team_docs:
+                    transaction.update(team_doc.reference, self._stamped({'mission_status': 'IN_MISSION'}))
 
                 # Assign Vehicle
-                vehicle_id = mission_data.get('vehicle_id')
-                if vehicle_id:
-                    assign_vehicle_to_mission(mission_id, vehicle_id)
+                for vehicle_doc in vehicle_docs:
+                    transaction.set(self.db.collection(self.VEHICLE_ASSIGNMENTS_COLLECTION).document(), {
+                        'mission_id': mission_id,
+                        'vehicle_id': vehicle_doc.id,
+                        'status': 'ASSIGNED',
+                        'assigned_at': datetime.now().isoformat()
+                    })
+                    transaction.update(vehicle_doc.reference, self._stamped({
+                        'status': 'IN_USE',
+                        'last_updated': datetime.now().isoformat()
+                    }))
+                    self._add_deltas(stats_deltas, self._status_deltas(
+                        'vehicles', self.VEHICLE_STATUSES, (vehicle_doc.to_dict() or {}).get('status'), 'IN_USE'))
 
                 # Assign Tools
-                required_tools = mission_data.get('required_tools', [])
-                if required_tools:
-                    for tool_id in required_tools:
-                        assign_tool_to_mission(mission_id, tool_id, 1) # Default quantity 1 for now
+                for tool_id, quantity in tool_quantities.items():
+                    transaction.set(self.db.collection(self.TOOL_ASSIGNMENTS_COLLECTION).document(), {
+                        'mission_id': mission_id,
+                        'tool_id': tool_id,
+                        'quantity': quantity,
+                        'status': 'ASSIGNED',
+                        'assigned_at': datetime.now().isoformat()
+                    })
 
                 # Create activity log
-                self.log_activity('mission_created', {
+                self._stage_activity(transaction, 'mission_created', {
                     'mission_id': mission_id,
                     'title': mission_data['title'],
                     'assigned_to': mission_data.get('assigned_person_id')
                 })
-                
-                self._invalidate_cache('missions')
-                return True
-            return False
+                if assigned_team:
+                    self._stage_activity(transaction, 'personnel_assigned', {
+                        'mission_id': mission_id,
+                        'personnel_count': len(assigned_team)
+                    })
+                self._stage_stats(transaction, stats_deltas)
+
+            self._run_transaction(create)
+
+            self._invalidate_mission_resources()
+            self._index_mission(mission_id, mission_data, full=True)
+            return True
         except Exception as e:
             print(f"Create mission error: {e}")
-            return False    
+            return False
+
     def get_missions_by_user(self, user_id: str) -> List[Dict]:
         """Get missions assigned to specific user"""
         try:
@@ -533,106 +1682,188 @@ class DatabaseManager:
             return []
     
     def update_mission_status(self, mission_id: str, status: str, notes: str = None) -> bool:
-        """Update mission status"""
+        """Update mission status, releasing its resources in the same transaction on completion.
+
+        Queued while offline, see enable_outbox.
+        """
         try:
             if not self.db:
                 return False
-                
-            update_data = {
-                'status': status,
-                'updated_at': datetime.now().isoformat()
-            }
-            
-            if notes:
-                update_data['notes'] = notes
-            
-            if status == 'COMPLETED':
-                update_data['completed_at'] = datetime.now().isoformat()
+
+            args = {'mission_id': mission_id, 'status': status, 'notes': notes, 'at': datetime.now().isoformat()}
+            return self._write_or_queue('update_mission_status', args, self.MISSIONS_COLLECTION, mission_id)
+        except Exception as e:
+            print(f"Update mission status error: {e}")
+            return False
+
+    def _mission_status_fields(self, status: str, notes: str = None, at: str = None) -> Dict:
+        update_data = {
+            'status': status,
+            'updated_at': at or datetime.now().isoformat()
+        }
+
+        if notes:
+            update_data['notes'] = notes
+        return update_data
+
+    def _update_mission_status(self, mission_id: str, status: str, notes: str = None, at: str = None,
+                               expected: str = None) -> bool:
+        """Write a mission status update; raises on failure"""
+        update_data = self._mission_status_fields(status, notes, at)
+
+        doc_ref = self.db.collection(self.MISSIONS_COLLECTION).document(mission_id)
+
+        def update(transaction):
+            current = doc_ref.get(transaction=transaction)
+            if not current.exists:
+                return False
+            mission_data = current.to_dict() or {}
+            self._check_version(mission_data.get('updated_at'), expected, update_data['updated_at'])
+            old_status = mission_data.get('status')
+
+            stats_deltas = {}
+            if status == 'COMPLETED' and old_status != 'COMPLETED':
+                update_data['completed_at'] = update_data['updated_at']
 
                 # Release resources
-                self._release_mission_resources(mission_id)
-            
-            self.db.collection(self.MISSIONS_COLLECTION).document(mission_id).update(update_data)
-            
+                stats_deltas = self._stage_mission_release(transaction, doc_ref, mission_data)
+
+            transaction.update(doc_ref, self._stamped(update_data))
+            self._add_deltas(stats_deltas, self._status_deltas('missions', self.MISSION_STATUSES, old_status, status))
+
             # Log activity
-            self.log_activity('mission_status_updated', {
+            self._stage_activity(transaction, 'mission_status_updated', {
                 'mission_id': mission_id,
                 'new_status': status,
                 'notes': notes
             })
-            
-            self._invalidate_cache('missions')
+            self._stage_stats(transaction, stats_deltas)
             return True
-        except Exception as e:
-            print(f"Update mission status error: {e}")
+
+        if not self._run_transaction(update):
             return False
 
-    def _release_mission_resources(self, mission_id: str):
-        """Release all resources assigned to a mission"""
-        try:
-            # Release Vehicles
-            # Check vehicle assignments or direct mission link
-            mission_doc = self.db.collection(self.MISSIONS_COLLECTION).document(mission_id).get()
-            if mission_doc.exists:
-                mission_data = mission_doc.to_dict()
-                vehicle_id = mission_data.get('vehicle_id')
-                if vehicle_id:
-                     self.update_vehicle_status(vehicle_id, 'AVAILABLE')
-
-                # Also check vehicle assignments collection if used
-                vehicle_assignments = self.db.collection(self.VEHICLE_ASSIGNMENTS_COLLECTION).where('mission_id', '==', mission_id).stream()
-                for doc in vehicle_assignments:
-                    data = doc.to_dict()
-                    if data.get('vehicle_id'):
-                        self.update_vehicle_status(data['vehicle_id'], 'AVAILABLE')
-
-            # Release Personnel
-            # Check mission for assigned team
-            if mission_data:
-                assigned_team = mission_data.get('assigned_team', [])
-                if mission_data.get('assigned_person_id'):
-                    assigned_team.append(mission_data.get('assigned_person_id'))
-                if mission_data.get('team_leader_id'):
-                    assigned_team.append(mission_data.get('team_leader_id'))
-
-                # Unique IDs
-                assigned_team = list(set(assigned_team))
-
-                for person_id in assigned_team:
-                     self.db.collection(self.USERS_COLLECTION).document(person_id).update({'mission_status': 'AVAILABLE'})
-
-            # Release Tools
-            tool_assignments = self.db.collection(self.TOOL_ASSIGNMENTS_COLLECTION).where('mission_id', '==', mission_id).stream()
-            for doc in tool_assignments:
-                data = doc.to_dict()
-                tool_id = data.get('tool_id')
-                quantity = data.get('quantity', 0)
-                if tool_id and quantity > 0:
-                    self.update_tool_quantity(tool_id, quantity, 'return')
+        self._invalidate_mission_resources()
+        self._index_mission(mission_id, update_data)
+        return True
 
-        except Exception as e:
-            print(f"Release resources error: {e}")
+    # ========== MISSION LIFECYCLE HELPERS ==========
+
+    def _mission_team(self, mission_data: Dict) -> List[str]:
+        """IDs of everyone on a mission, including the assignee and team leader"""
+        team = list(mission_data.get('assigned_team') or [])
+        for person_id in (mission_data.get('assigned_person_id'), mission_data.get('team_leader_id')):
+            if person_id and person_id not in team:
+                team.append(person_id)
+        return team
+
+    def _get_existing(self, transaction, doc_refs: List) -> List:
+        """Read documents inside a transaction, keeping those that exist.
+
+        Firestore rejects a batch get of no documents, so none is sent for an
+        empty list.
+        """
+        if not doc_refs:
+            return []
+        return [doc for doc in transaction.get_all(doc_refs) if doc.exists]
+
+    def _add_deltas(self, totals: Dict[str, int], deltas: Dict[str, int]) -> Dict[str, int]:
+        """Accumulate statistics deltas into totals"""
+        for path, delta in deltas.items():
+            totals[path] = totals.get(path, 0) + delta
+        return totals
+
+    def _stage_mission_release(self, transaction, mission_ref, mission_data: Dict) -> Dict[str, int]:
+        """Stage the release of a mission's team, vehicles and tools.
+
+        Does all of its reads before its first write, so it must run before
+        anything else is written in the transaction. Assignments are marked
+        RETURNED so the same resources are never released twice. Returns the
+        statistics deltas of the release.
+        """
+        mission_id = mission_ref.id
+        users_ref = self.db.collection(self.USERS_COLLECTION)
+        vehicles_ref = self.db.collection(self.VEHICLES_COLLECTION)
+
+        def open_assignments(collection_name):
+            query = self.db.collection(collection_name).where('mission_id', '==', mission_id)
+            return [doc for doc in transaction.get(query) if (doc.to_dict() or {}).get('status', 'ASSIGNED') == 'ASSIGNED']
+
+        vehicle_assignments = open_assignments(self.VEHICLE_ASSIGNMENTS_COLLECTION)
+        tool_assignments = open_assignments(self.TOOL_ASSIGNMENTS_COLLECTION)
+
+        # Check vehicle assignments and the direct mission link
+        vehicle_ids = [mission_data.get('vehicle_id')] + [doc.to_dict().get('vehicle_id') for doc in vehicle_assignments]
+        vehicle_refs = [vehicles_ref.document(vehicle_id) for vehicle_id in dict.fromkeys(vehicle_ids) if vehicle_id]
+        vehicle_docs = self._get_existing(transaction, vehicle_refs)
+
+        team_refs = [users_ref.document(person_id) for person_id in self._mission_team(mission_data)]
+        team_docs = self._get_existing(transaction, team_refs)
+
+        returned_quantities = {}
+        for doc in tool_assignments:
+            data = doc.to_dict()
+            tool_id = data.get('tool_id')
+            quantity = data.get('quantity', 0)
+            if tool_id and quantity > 0:
+                returned_quantities[tool_id] = returned_quantities.get(tool_id, 0) + quantity
+
+        # Tool reads happen here, before the first write
+        stats_deltas = {
+            'tools.available_quantity': self._stage_tool_adjustments(transaction, returned_quantities, skip_missing=True)
+        }
+
+        for vehicle_doc in vehicle_docs:
+            transaction.update(vehicle_doc.reference, self._stamped({
+                'status': 'AVAILABLE',
+                'last_updated': datetime.now().isoformat()
+            }))
+            self._add_deltas(stats_deltas, self._status_deltas(
+                'vehicles', self.VEHICLE_STATUSES, (vehicle_doc.to_dict() or {}).get('status'), 'AVAILABLE'))
+
+        for team_doc in team_docs:
+            transaction.update(team_doc.reference, self._stamped({'mission_status': 'AVAILABLE'}))
+
+        for assignment_doc in vehicle_assignments + tool_assignments:
+            transaction.update(assignment_doc.reference, {
+                'status': 'RETURNED',
+                'returned_at': datetime.now().isoformat()
+            })
+
+        return stats_deltas
+
+    def _invalidate_mission_resources(self):
+        """Drop cached data touched by a mission lifecycle transition"""
+        self._invalidate_cache('missions', 'employees', 'vehicles', 'tools', 'dashboard')
     
     # ========== ACTIVITY LOGGING ==========
     
     def log_activity(self, activity_type: str, activity_data: Dict, user_id: str = None) -> bool:
-        """Log system activity"""
+        """Log system activity (queued and written in the background)"""
         try:
             if not self.db:
                 return False
                 
-            log_data = {
-                'activity_type': activity_type,
-                'activity_data': activity_data,
-                'user_id': user_id,
-                'timestamp': datetime.now().isoformat()
-            }
+            log_data = self._activity_record(activity_type, activity_data, user_id)
             
-            doc_ref = self.db.collection(self.ACTIVITY_LOGS_COLLECTION).add(log_data)
-            return bool(doc_ref)
+            return self.activity_logger.log(log_data)
         except Exception as e:
             print(f"Log activity error: {e}")
             return False
+
+    def _activity_record(self, activity_type: str, activity_data: Dict, user_id: str = None) -> Dict:
+        """Build an activity log document"""
+        return {
+            'activity_type': activity_type,
+            'activity_data': activity_data,
+            'user_id': user_id,
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def _stage_activity(self, writer, activity_type: str, activity_data: Dict, user_id: str = None):
+        """Add an activity log entry to a write batch or transaction"""
+        log_ref = self.db.collection(self.ACTIVITY_LOGS_COLLECTION).document()
+        writer.set(log_ref, self._activity_record(activity_type, activity_data, user_id))
     
     def get_recent_activities(self, limit: int = 10) -> List[Dict]:
         """Get recent activities"""
@@ -640,6 +1871,9 @@ class DatabaseManager:
             if not self.db:
                 return []
                 
+            # Make entries still waiting in the queue visible
+            self.activity_logger.flush()
+
             activities = []
             activities_ref = self.db.collection(self.ACTIVITY_LOGS_COLLECTION).order_by('timestamp', direction=firestore.Query.DESCENDING).limit(limit)
             
@@ -661,66 +1895,204 @@ class DatabaseManager:
             return []
     
     # ========== REPORTS AND ANALYTICS ==========
+
+    def _aggregate(self, query, sum_fields: List[str] = None) -> Dict[str, Any]:
+        """Count the documents matching a query and sum numeric fields server-side.
+
+        Backends without aggregation support fall back to streaming the query.
+        """
+        sum_fields = sum_fields or []
+        try:
+            aggregation_query = query.count(alias='count')
+            for field in sum_fields:
+                aggregation_query = aggregation_query.sum(field, alias=field)
+
+            results = {}
+            for result_set in aggregation_query.get():
+                for result in result_set:
+                    results[result.alias] = result.value
+            return {
+                'count': int(results.get('count') or 0),
+                **{field: results.get(field) or 0 for field in sum_fields}
+            }
+        except (AttributeError, NotImplementedError, google_exceptions.MethodNotImplemented) as e:
+            print(f"Aggregation not supported, counting client-side: {e}")
+
+        results = {'count': 0, **{field: 0 for field in sum_fields}}
+        for doc in query.stream():
+            doc_data = doc.to_dict() or {}
+            results['count'] += 1
+            for field in sum_fields:
+                results[field] += doc_data.get(field, 0) or 0
+        return results
+
+    def _count(self, query) -> int:
+        """Count the documents matching a query"""
+        return self._aggregate(query)['count']
+
+    def _count_active_users(self) -> int:
+        """Count the users with a truthy `active` field.
+
+        The app stores a bool, counted server-side; older users may hold
+        other values (1, "true", ...), which are read and checked here. Users
+        without the field are inactive.
+        """
+        users_ref = self.db.collection(self.USERS_COLLECTION)
+        legacy_users = users_ref.where('active', 'not-in', [True, False]).stream()
+        return self._count(users_ref.where('active', '==', True)) + \
+            sum(1 for doc in legacy_users if (doc.to_dict() or {}).get('active'))
+
+    def get_mission_status_counts(self) -> Dict[str, int]:
+        """Count missions in total and per status"""
+        missions_ref = self.db.collection(self.MISSIONS_COLLECTION)
+        return {
+            'total': self._count(missions_ref),
+            **{status.lower(): self._count(missions_ref.where('status', '==', status))
+               for status in self.MISSION_STATUSES}
+        }
+
+    # ========== STATISTICS DOCUMENT ==========
+
+    def _status_deltas(self, section: str, statuses: List[str], old_status: str = None, new_status: str = None) -> Dict[str, int]:
+        """Build the per-status counter deltas for a status transition"""
+        if old_status == new_status:
+            return {}
+        deltas = {}
+        if old_status in statuses:
+            deltas[f'{section}.{old_status}'] = -1
+        if new_status in statuses:
+            deltas[f'{section}.{new_status}'] = 1
+        return deltas
+
+    def _stats_changes(self, deltas: Dict[str, int]) -> Dict[str, Dict]:
+        """Turn dotted counter deltas into a nested Increment payload"""
+        changes = {}
+        for path, delta in deltas.items():
+            if not delta:
+                continue
+            section, field = path.split('.', 1)
+            changes.setdefault(section, {})[field] = firestore.Increment(delta)
+        return changes
+
+    def _stage_stats(self, writer, deltas: Dict[str, int]) -> bool:
+        """Add the statistics deltas to a write batch or transaction"""
+        changes = self._stats_changes(deltas)
+        if not changes:
+            return False
+        changes['updated_at'] = datetime.now().isoformat()
+        stats_ref = self.db.collection(self.STATS_COLLECTION).document(self.DASHBOARD_STATS_DOCUMENT)
+        writer.set(stats_ref, changes, merge=True)
+        return True
+
+    def _commit_with_stats(self, batch, deltas: Dict[str, int]):
+        """Add the statistics deltas to a write batch and commit it"""
+        staged = self._stage_stats(batch, deltas)
+        batch.commit()
+        if staged:
+            self._invalidate_cache('dashboard')
+
+    def compute_stats(self) -> Dict[str, Dict]:
+        """Compute the statistics document from scratch with aggregation queries"""
+        users_ref = self.db.collection(self.USERS_COLLECTION)
+        vehicles_ref = self.db.collection(self.VEHICLES_COLLECTION)
+        mission_counts = self.get_mission_status_counts()
+        tool_sums = self._aggregate(self.db.collection(self.TOOLS_COLLECTION), ['total_quantity', 'available_quantity'])
+
+        return {
+            'employees': {
+                'total': self._count(users_ref),
+                'active': self._count_active_users()
+            },
+            'missions': {
+                'total': mission_counts['total'],
+                **{status: mission_counts[status.lower()] for status in self.MISSION_STATUSES}
+            },
+            'vehicles': {
+                'total': self._count(vehicles_ref),
+                **{status: self._count(vehicles_ref.where('status', '==', status)) for status in self.VEHICLE_STATUSES}
+            },
+            'tools': {
+                'total_quantity': tool_sums['total_quantity'],
+                'available_quantity': tool_sums['available_quantity']
+            }
+        }
+
+    def rebuild_stats(self) -> Optional[Dict[str, Dict]]:
+        """Recompute the statistics document and overwrite the stored one"""
+        try:
+            if not self.db:
+                return None
+
+            stats = self.compute_stats()
+            stats['updated_at'] = datetime.now().isoformat()
+            self.db.collection(self.STATS_COLLECTION).document(self.DASHBOARD_STATS_DOCUMENT).set(stats)
+
+            self._invalidate_cache('dashboard')
+            return stats
+        except Exception as e:
+            print(f"Rebuild stats error: {e}")
+            return None
+
+    def get_stats_document(self) -> Dict[str, Dict]:
+        """Read the statistics document, building it on first use"""
+        doc = self.db.collection(self.STATS_COLLECTION).document(self.DASHBOARD_STATS_DOCUMENT).get()
+        if doc.exists:
+            return doc.to_dict() or {}
+        return self.rebuild_stats() or {}
     
     def get_dashboard_stats(self) -> Dict:
         """Get dashboard statistics"""
-        # Could cache this too, but maybe shorter duration
-        cache_key = 'dashboard_stats'
-        cached = self._get_cached(cache_key)
-        if cached is not None:
-            return cached
-
         try:
             if not self.db:
                 return self._get_empty_stats()
-            
-            # Get employee stats
-            employees = list(self.db.collection(self.USERS_COLLECTION).stream())
-            total_employees = len(employees)
-            active_employees = len([emp for emp in employees if emp.to_dict().get('active', False)])
-            
-            # Get mission stats
-            missions = list(self.db.collection(self.MISSIONS_COLLECTION).stream())
-            total_missions = len(missions)
-            active_missions = len([m for m in missions if m.to_dict().get('status') in ['PENDING', 'IN_PROGRESS']])
-            completed_missions = len([m for m in missions if m.to_dict().get('status') == 'COMPLETED'])
-            
-            # Get vehicle stats
-            vehicles = list(self.db.collection(self.VEHICLES_COLLECTION).stream())
-            total_vehicles = len(vehicles)
-            available_vehicles = len([v for v in vehicles if v.to_dict().get('status') == 'AVAILABLE'])
-            in_use_vehicles = len([v for v in vehicles if v.to_dict().get('status') == 'IN_USE'])
-            
-            # Get tool stats
-            tools = list(self.db.collection(self.TOOLS_COLLECTION).stream())
-            total_tools = sum([t.to_dict().get('total_quantity', 0) for t in tools])
-            available_tools = sum([t.to_dict().get('available_quantity', 0) for t in tools])
-            in_use_tools = total_tools - available_tools
-            
-            stats = {
-                "employees": {
-                    "total": total_employees,
-                    "active": active_employees,
-                    "on_leave": total_employees - active_employees
-                },
-                "projects": {
-                    "total": total_missions,
-                    "active": active_missions,
-                    "completed": completed_missions
-                },
-                "vehicles": {
-                    "total": total_vehicles,
-                    "available": available_vehicles,
-                    "in_use": in_use_vehicles
-                },
-                "equipment": {
-                    "total": total_tools,
-                    "operational": available_tools,
-                    "maintenance": in_use_tools
+
+            def load():
+                raw_stats = self.get_stats_document()
+                employees = raw_stats.get('employees', {})
+                missions = raw_stats.get('missions', {})
+                vehicles = raw_stats.get('vehicles', {})
+                tools = raw_stats.get('tools', {})
+            
+                # Get employee stats
+                total_employees = employees.get('total', 0)
+                active_employees = employees.get('active', 0)
+            
+                # Get mission stats
+                total_missions = missions.get('total', 0)
+                active_missions = missions.get('PENDING', 0) + missions.get('IN_PROGRESS', 0)
+                completed_missions = missions.get('COMPLETED', 0)
+            
+                # Get tool stats
+                total_tools = tools.get('total_quantity', 0)
+                available_tools = tools.get('available_quantity', 0)
+                in_use_tools = total_tools - available_tools
+            
+                stats = {
+                    "employees": {
+                        "total": total_employees,
+                        "active": active_employees,
+                        "on_leave": total_employees - active_employees
+                    },
+                    "projects": {
+                        "total": total_missions,
+                        "active": active_missions,
+                        "completed": completed_missions
+                    },
+                    "vehicles": {
+                        "total": vehicles.get('total', 0),
+                        "available": vehicles.get('AVAILABLE', 0),
+                        "in_use": vehicles.get('IN_USE', 0)
+                    },
+                    "equipment": {
+                        "total": total_tools,
+                        "operational": available_tools,
+                        "maintenance": in_use_tools
+                    }
                 }
-            }
-            self._set_cached(cache_key, stats, 60) # Cache for 1 min
-            return stats
+                return stats
+
+            # Cache for 1 min
+            return self._get_or_load('dashboard_stats', load, 60)
         except Exception as e:
             print(f"Get dashboard stats error: {e}")
             return self._get_empty_stats()
@@ -735,31 +2107,82 @@ class DatabaseManager:
         }
     
     # ========== DEPARTMENTS ==========
+
+    def _get_reference_version(self, name: str) -> int:
+        """Get the current version of a reference data set from the metadata document"""
+        meta_doc = self.db.collection(self.METADATA_COLLECTION).document(self.REFERENCE_DATA_DOCUMENT).get()
+        if meta_doc.exists:
+            return (meta_doc.to_dict() or {}).get(f'{name}_version', 0)
+        return 0
+
+    def _bump_reference_version(self, name: str):
+        """Mark a reference data set as changed so other clients reload it"""
+        self.db.collection(self.METADATA_COLLECTION).document(self.REFERENCE_DATA_DOCUMENT).set({
+            f'{name}_version': firestore.Increment(1),
+            'updated_at': datetime.now().isoformat()
+        }, merge=True)
+        self.invalidate_reference_data(name)
+
+    def invalidate_reference_data(self, name: str = None):
+        """Drop cached reference data (all sets when name is None)"""
+        with self._reference_lock:
+            names = [name] if name else list(self._reference_data.keys())
+            for key in names:
+                self._reference_data.pop(key, None)
+                self._reference_versions.pop(key, None)
+                self._reference_checked_at.pop(key, None)
+
+    def get_department_map(self, force_refresh: bool = False) -> Dict[str, Dict]:
+        """Get all departments as an ID -> department map, loaded once and version checked"""
+        name = 'departments'
+        with self._reference_lock:
+            try:
+                if not self.db:
+                    return {}
+
+                now = datetime.now()
+                cached = self._reference_data.get(name)
+                checked_at = self._reference_checked_at.get(name)
+                if (cached is not None and not force_refresh and checked_at
+                        and now - checked_at < timedelta(seconds=self.REFERENCE_CHECK_INTERVAL)):
+                    return cached
+
+                # Only reload the departments when their version has changed
+                version = self._get_reference_version(name)
+                if cached is not None and not force_refresh and version == self._reference_versions.get(name):
+                    self._reference_checked_at[name] = now
+                    return cached
+
+                # Seeds the default departments on the first load
+                self.ensure_default_data()
+                departments = {}
+                for doc in self.db.collection(self.DEPARTMENTS_COLLECTION).stream():
+                    dept_data = self.to_dict(doc)
+                    if dept_data:
+                        departments[str(dept_data['id'])] = dept_data
+
+                self._reference_data[name] = departments
+                self._reference_versions[name] = version
+                self._reference_checked_at[name] = now
+                return departments
+            except Exception as e:
+                print(f"Get department map error: {e}")
+                return self._reference_data.get(name, {})
+
+    def get_department_name(self, department_id, department_map: Dict[str, Dict] = None, default: str = 'Unknown') -> str:
+        """Resolve a department ID to its name using the department map"""
+        if department_id in (None, ''):
+            return default
+        if department_map is None:
+            department_map = self.get_department_map()
+        department = department_map.get(str(department_id))
+        if department:
+            return department.get('name', default)
+        return default
     
     def get_all_departments(self) -> List[Dict]:
         """Get all departments"""
-        cache_key = 'departments_all'
-        cached = self._get_cached(cache_key)
-        if cached is not None:
-            return cached
-
-        try:
-            if not self.db:
-                return []
-                
-            departments = []
-            departments_ref = self.db.collection(self.DEPARTMENTS_COLLECTION)
-            
-            for doc in departments_ref.stream():
-                dept_data = self.to_dict(doc)
-                if dept_data:
-                    departments.append(dept_data)
-            
-            self._set_cached(cache_key, departments)
-            return departments
-        except Exception as e:
-            print(f"Get departments error: {e}")
-            return []
+        return list(self.get_department_map().values())
     
     def delete_vehicle(self, vehicle_id: str) -> bool:
         """Delete vehicle if status is AVAILABLE"""
@@ -768,18 +2191,29 @@ class DatabaseManager:
                 return False
 
             doc_ref = self.db.collection(self.VEHICLES_COLLECTION).document(vehicle_id)
-            doc = doc_ref.get()
 
-            if not doc.exists:
-                return False
+            def delete(transaction):
+                doc = doc_ref.get(transaction=transaction)
+                if not doc.exists:
+                    return False
+
+                vehicle_data = doc.to_dict() or {}
+                if vehicle_data.get('status') != 'AVAILABLE':
+                    print(f"Vehicle {vehicle_id} is not AVAILABLE, cannot delete.")
+                    return False
+
+                transaction.delete(doc_ref)
+                self._stage_tombstone(transaction, self.VEHICLES_COLLECTION, doc_ref.id)
+                self._stage_stats(transaction, {
+                    'vehicles.total': -1,
+                    **self._status_deltas('vehicles', self.VEHICLE_STATUSES, old_status='AVAILABLE')
+                })
+                return True
 
-            vehicle_data = doc.to_dict()
-            if vehicle_data.get('status') != 'AVAILABLE':
-                print(f"Vehicle {vehicle_id} is not AVAILABLE, cannot delete.")
+            if not self._run_transaction(delete):
                 return False
 
-            doc_ref.delete()
-            self._invalidate_cache('vehicles')
+            self._invalidate_cache('vehicles', 'dashboard')
             return True
         except Exception as e:
             print(f"Delete vehicle error: {e}")
@@ -792,21 +2226,32 @@ class DatabaseManager:
                 return False
 
             doc_ref = self.db.collection(self.TOOLS_COLLECTION).document(tool_id)
-            doc = doc_ref.get()
 
-            if not doc.exists:
-                return False
+            def delete(transaction):
+                doc = doc_ref.get(transaction=transaction)
+                if not doc.exists:
+                    return False
 
-            tool_data = doc.to_dict()
-            total = tool_data.get('total_quantity', 0)
-            available = tool_data.get('available_quantity', 0)
+                tool_data = doc.to_dict() or {}
+                total = tool_data.get('total_quantity', 0)
+                available = tool_data.get('available_quantity', 0)
+
+                if available < total:
+                    print(f"Tool {tool_id} is in use, cannot delete.")
+                    return False
+
+                transaction.delete(doc_ref)
+                self._stage_tombstone(transaction, self.TOOLS_COLLECTION, doc_ref.id)
+                self._stage_stats(transaction, {
+                    'tools.total_quantity': -total,
+                    'tools.available_quantity': -available
+                })
+                return True
 
-            if available < total:
-                print(f"Tool {tool_id} is in use, cannot delete.")
+            if not self._run_transaction(delete):
                 return False
 
-            doc_ref.delete()
-            self._invalidate_cache('tools')
+            self._invalidate_cache('tools', 'dashboard')
             return True
         except Exception as e:
             print(f"Delete tool error: {e}")
@@ -820,9 +2265,36 @@ class DatabaseManager:
 
             # Check if user is in mission?
             # For now just delete as requested.
-            self.db.collection(self.USERS_COLLECTION).document(employee_id).delete()
+            doc_ref = self.db.collection(self.USERS_COLLECTION).document(employee_id)
+
+            def delete(transaction):
+                doc = doc_ref.get(transaction=transaction)
+                if not doc.exists:
+                    return False
+                user_data = doc.to_dict() or {}
+
+                # Free the username, unless the index gave it to someone else
+                username = user_data.get('username')
+                index_ref = self._username_ref(username) if username else None
+                index_doc = index_ref.get(transaction=transaction) if index_ref else None
+
+                transaction.delete(doc_ref)
+                if index_doc is not None and index_doc.exists and \
+                        (index_doc.to_dict() or {}).get('user_id') == employee_id:
+                    transaction.delete(index_ref)
+                self._stage_tombstone(transaction, self.USERS_COLLECTION, doc_ref.id)
+                self._stage_stats(transaction, {
+                    'employees.total': -1,
+                    'employees.active': -1 if user_data.get('active') else 0
+                })
+                return True
+
+            if not self._run_transaction(delete):
+                return False
 
-            self._invalidate_cache('employees')
+            self._invalidate_cache('employees', 'dashboard')
+            if self._mission_index_built_at is not None:
+                self.mission_index.set_name(employee_id, None)
             return True
         except Exception as e:
             print(f"Delete employee error: {e}")
@@ -853,30 +2325,49 @@ class DatabaseManager:
                         'created_at': datetime.now().isoformat(),
                         'updated_at': datetime.now().isoformat()
                     })
+
+                self._bump_reference_version('departments')
                 
                 print("Default departments created successfully")
             
+            self._default_data_ready = True
             return True
         except Exception as e:
             print(f"Initialize default data error: {e}")
             return False
 
-# Initialize database manager
-db = DatabaseManager()
+    def ensure_default_data(self) -> bool:
+        """Run initialize_default_data once, on first need instead of at startup"""
+        if self._default_data_ready:
+            return True
+        return self.initialize_default_data()
 
-# Initialize default data on startup
-db.initialize_default_data()
+# Initialize database manager; the client is created and the default data
+# seeded on first use, not at import
+db = DatabaseManager()
 
 # Convenience functions for backward compatibility
 def login(username: str, password: str) -> Optional[Dict]:
     return db.login(username, password)
 
+def get_session_user(user_id: str):
+    return db.get_session_user(user_id)
+
+def backfill_username_index() -> Optional[int]:
+    return db.backfill_username_index()
+
+def prefetch_dashboard():
+    return db.prefetch_dashboard()
+
 def create_user(username: str, full_name: str, password: str, role: str, department_id: int, active: bool = True) -> bool:
     return db.create_user(username, full_name, password, role, department_id, active)
 
 def get_dashboard_stats() -> Dict:
     return db.get_dashboard_stats()
 
+def rebuild_stats() -> Optional[Dict[str, Dict]]:
+    return db.rebuild_stats()
+
 def get_all_employees() -> List[Dict]:
     return db.get_all_employees()
 
@@ -893,7 +2384,46 @@ def update_employee(employee_id: str, update_data: Dict) -> bool:
     return db.update_employee(employee_id, update_data)
 
 def get_all_departments() -> List[Dict]:
-    return db.get_all_departments
+    return db.get_all_departments()
+
+def get_department_map() -> Dict[str, Dict]:
+    return db.get_department_map()
+
+def ensure_default_data() -> bool:
+    return db.ensure_default_data()
+
+def enable_mirror(timeout: float = 10) -> bool:
+    return db.enable_mirror(timeout)
+
+def disable_mirror():
+    db.disable_mirror()
+
+def enable_delta_sync() -> bool:
+    return db.enable_delta_sync()
+
+def sync_collections() -> bool:
+    return db.sync_collections()
+
+def get_cache_stats() -> Dict[str, int]:
+    return db.get_cache_stats()
+
+def enable_disk_cache(path: str = None) -> bool:
+    return db.enable_disk_cache(path)
+
+def enable_outbox(path: str = None) -> bool:
+    return db.enable_outbox(path)
+
+def flush_outbox() -> bool:
+    return db.flush_outbox()
+
+def get_outbox_status() -> Dict[str, Any]:
+    return db.get_outbox_status()
+
+def disable_disk_cache():
+    db.disable_disk_cache()
+
+def subscribe(key: str, callback):
+    return db.subscribe(key, callback)
 
 
 def create_mission(mission_data: Dict) -> bool:
@@ -902,6 +2432,9 @@ def create_mission(mission_data: Dict) -> bool:
 def get_recent_activities(limit: int = 10) -> List[Dict]:
     return db.get_recent_activities(limit)
 
+def flush_activity_log() -> bool:
+    return db.activity_logger.flush()
+
 def get_all_missions() -> List[Dict]:
     return db.get_all_missions()
 
@@ -967,79 +2500,138 @@ def get_mission_by_id(mission_id: str) -> Optional[Dict]:
         print(f"Get mission by ID error: {e}")
         return None
 
+def _attach_mission_details(missions: List[Dict]) -> List[Dict]:
+    """Resolve team, leader, vehicle and tool references for a list of missions.
+
+    All referenced IDs are gathered first and fetched in bulk, so the number of
+    reads depends on the distinct entities referenced, not on the missions.
+    """
+    user_ids = []
+    vehicle_ids = []
+    tool_ids = []
+    for mission_data in missions:
+        user_ids.extend(mission_data.get('assigned_team') or [])
+        if mission_data.get('team_leader_id'):
+            user_ids.append(mission_data['team_leader_id'])
+        if mission_data.get('vehicle_id'):
+            vehicle_ids.append(mission_data['vehicle_id'])
+        tool_ids.extend(mission_data.get('required_tools') or [])
+
+    users = db.get_documents_by_ids(db.USERS_COLLECTION, user_ids)
+    vehicles = db.get_documents_by_ids(db.VEHICLES_COLLECTION, vehicle_ids)
+    tools = db.get_documents_by_ids(db.TOOLS_COLLECTION, tool_ids)
+
+    for mission_data in missions:
+        # Get assigned team info
+        if mission_data.get('assigned_team'):
+            mission_data['team_members'] = []
+            for user_id in mission_data['assigned_team']:
+                user_data = users.get(str(user_id))
+                if user_data:
+                    mission_data['team_members'].append({
+                        'name': user_data.get('full_name'),
+                        'role': user_data.get('role', 'Team Member'),
+                        'phone': user_data.get('phone'),
+                        'status': 'Assigned'
+                    })
+
+        # Get team leader info
+        if mission_data.get('team_leader_id'):
+            leader_data = users.get(str(mission_data['team_leader_id']))
+            if leader_data:
+                mission_data['team_leader'] = {
+                    'name': leader_data.get('full_name'),
+                    'role': 'Team Leader',
+                    'phone': leader_data.get('phone'),
+                    'status': 'Leading'
+                }
+
+        # Get vehicle info
+        if mission_data.get('vehicle_id'):
+            vehicle_data = vehicles.get(str(mission_data['vehicle_id']))
+            if vehicle_data:
+                mission_data['vehicle'] = {
+                    'model': vehicle_data.get('model'),
+                    'plate_number': vehicle_data.get('plate_number')
+                }
+
+        # Get tools info
+        if mission_data.get('required_tools'):
+            mission_data['tools'] = []
+            for tool_id in mission_data['required_tools']:
+                tool_data = tools.get(str(tool_id))
+                if tool_data:
+                    mission_data['tools'].append({
+                        'name': tool_data.get('name'),
+                        'type': tool_data.get('category'),
+                        'condition': tool_data.get('condition'),
+                    })
+
+    return missions
+
 def get_all_missions_with_details() -> List[Dict]:
     """Get all missions with complete details"""
     # Caching this might be heavy as it pulls a lot of related data
     # For now, let's cache it but with short TTL or rely on individual object caching if implemented
     cache_key = 'missions_with_details'
-    cached = db._get_cached(cache_key)
-    if cached is not None:
-        return cached
 
     try:
         if not db.db:
             return []
-            
-        missions = []
-        missions_ref = db.db.collection(db.MISSIONS_COLLECTION).order_by('created_at', direction=firestore.Query.DESCENDING)
-        for doc in missions_ref.stream():
-            mission_data = db.to_dict(doc)
-            if mission_data:
-                # Get assigned team info (replace the assigned_user section)
-                if mission_data.get('assigned_team'):
-                    mission_data['team_members'] = []
-                    for user_id in mission_data['assigned_team']:
-                        user_doc = db.db.collection(db.USERS_COLLECTION).document(user_id).get()
-                        if user_doc.exists:
-                            user_data = user_doc.to_dict()
-                            mission_data['team_members'].append({
-                                'name': user_data.get('full_name'),
-                                'role': user_data.get('role', 'Team Member'),
-                                'phone': user_data.get('phone'),
-                                'status': 'Assigned'
-                            })
-
-                # Keep team leader section as is
-                if mission_data.get('team_leader_id'):
-                    leader_doc = db.db.collection(db.USERS_COLLECTION).document(mission_data['team_leader_id']).get()
-                    if leader_doc.exists:
-                        leader_data = leader_doc.to_dict()
-                        mission_data['team_leader'] = {
-                            'name': leader_data.get('full_name'),
-                            'role': 'Team Leader',
-                            'phone': leader_data.get('phone'),
-                            'status': 'Leading'
-                        }
-                
-                # Get vehicle info
-                if mission_data.get('vehicle_id'):
-                    vehicle_doc = db.db.collection(db.VEHICLES_COLLECTION).document(mission_data['vehicle_id']).get()
-                    if vehicle_doc.exists:
-                        vehicle_data = vehicle_doc.to_dict()
-                        mission_data['vehicle'] = {
-                            'model': vehicle_data.get('model'),
-                            'plate_number': vehicle_data.get('plate_number')
-                        }
-                if mission_data.get('required_tools'):
-                    mission_data['tools'] = []
-                    for tool_id in mission_data['required_tools']:
-                        tool_doc = db.db.collection(db.TOOLS_COLLECTION).document(tool_id).get()
-                        if tool_doc.exists:
-                            tool_data = tool_doc.to_dict()
-                            mission_data['tools'].append({
-                                'name': tool_data.get('name'),
-                                'type': tool_data.get('category'),
-                                'condition': tool_data.get('condition'),
-                            })
-                
-                missions.append(mission_data)
-        
-        db._set_cached(cache_key, missions, 60) # Cache for 60 seconds
-        return missions
+
+        def load():
+            mirrored = db._mirror_documents(db.MISSIONS_COLLECTION)
+            if mirrored is not None:
+                missions = sorted(mirrored.values(), key=lambda m: str(m.get('created_at') or ''), reverse=True)
+            else:
+                missions = []
+                missions_ref = db.db.collection(db.MISSIONS_COLLECTION).order_by('created_at', direction=firestore.Query.DESCENDING)
+                for doc in missions_ref.stream():
+                    mission_data = db.to_dict(doc)
+                    if mission_data:
+                        missions.append(mission_data)
+
+            # Resolve all references in bulk once the result set is known
+            _attach_mission_details(missions)
+            return missions
+
+        # Cache for 60 seconds; the details come from the other collections
+        return db._get_or_load(cache_key, load, 60, tags=['missions', 'employees', 'vehicles', 'tools'], stale=True)
     except Exception as e:
         print(f"Get all missions error: {e}")
         return []
 
+def get_missions_page(page_size: int = 20, start_after=None, status: str = None) -> Tuple[List[Dict], Any]:
+    """Get one page of missions with details, newest first.
+
+    start_after is the cursor returned with the previous page; the returned
+    cursor is None once there are no more pages. Filtering by status needs a
+    composite index on (status, created_at desc) in Firestore.
+    """
+    try:
+        if not db.db:
+            return [], None
+
+        query = db.db.collection(db.MISSIONS_COLLECTION)
+        if status:
+            query = query.where('status', '==', status)
+        query = query.order_by('created_at', direction=firestore.Query.DESCENDING)
+        if start_after is not None:
+            query = query.start_after(start_after)
+
+        # One extra document tells whether another page follows
+        docs = list(query.limit(page_size + 1).stream())
+        has_more = len(docs) > page_size
+        docs = docs[:page_size]
+
+        missions = [mission for mission in (db.to_dict(doc) for doc in docs) if mission]
+        _attach_mission_details(missions)
+
+        return missions, (docs[-1] if has_more else None)
+    except Exception as e:
+        print(f"Get missions page error: {e}")
+        return [], None
+
 def get_mission_tools(mission_id: str) -> List[Dict]:
     """Get tools assigned to mission"""
     try:
@@ -1095,61 +2687,69 @@ def get_mission_activity_log(mission_id: str) -> List[Dict]:
 
 def get_missions_by_status(status: str) -> List[Dict]:
     """Get missions filtered by status"""
+    cache_key = f'missions_status_{status}'
+
     try:
         if not db.db:
             return []
-            
-        missions = []
-        missions_ref = db.db.collection(db.MISSIONS_COLLECTION).where('status', '==', status).order_by('created_at', direction=firestore.Query.DESCENDING)
-        
-        for doc in missions_ref.stream():
-            mission_data = db.to_dict(doc)
-            if mission_data:
-                # Get basic user info
-                if mission_data.get('assigned_person_id'):
-                    user_doc = db.db.collection(db.USERS_COLLECTION).document(mission_data['assigned_person_id']).get()
-                    if user_doc.exists:
-                        user_data = user_doc.to_dict()
-                        mission_data['assigned_user'] = {'full_name': user_data.get('full_name')}
-                
-                missions.append(mission_data)
-        
-        return missions
+
+        def load():
+            missions = []
+            missions_ref = db.db.collection(db.MISSIONS_COLLECTION).where('status', '==', status).order_by('created_at', direction=firestore.Query.DESCENDING)
+
+            for doc in missions_ref.stream():
+                mission_data = db.to_dict(doc)
+                if mission_data:
+                    # Get basic user info
+                    if mission_data.get('assigned_person_id'):
+                        user_doc = db.db.collection(db.USERS_COLLECTION).document(mission_data['assigned_person_id']).get()
+                        if user_doc.exists:
+                            user_data = user_doc.to_dict()
+                            mission_data['assigned_user'] = {'full_name': user_data.get('full_name')}
+
+                    missions.append(mission_data)
+            return missions
+
+        return db._get_or_load(cache_key, load, 60, tags=['missions', 'employees'])
     except Exception as e:
         print(f"Get missions by status error: {e}")
         return []
 
 def get_missions_by_user(user_id: str) -> List[Dict]:
     """Get missions assigned to specific user"""
+    cache_key = f'missions_user_{user_id}'
+
     try:
         if not db.db:
             return []
-            
-        missions = []
-        missions_ref = db.db.collection(db.MISSIONS_COLLECTION).where('assigned_person_id', '==', user_id).order_by('created_at', direction=firestore.Query.DESCENDING)
-        
-        for doc in missions_ref.stream():
-            mission_data = db.to_dict(doc)
-            if mission_data:
-                # Get user info
-                user_doc = db.db.collection(db.USERS_COLLECTION).document(user_id).get()
-                if user_doc.exists:
-                    user_data = user_doc.to_dict()
-                    mission_data['assigned_user'] = {'full_name': user_data.get('full_name')}
-                
-                # Get vehicle info if available
-                if mission_data.get('vehicle_id'):
-                    vehicle_doc = db.db.collection(db.VEHICLES_COLLECTION).document(mission_data['vehicle_id']).get()
-                    if vehicle_doc.exists:
-                        vehicle_data = vehicle_doc.to_dict()
-                        mission_data['vehicle'] = {
-                            'model': vehicle_data.get('model'),
-                            'plate_number': vehicle_data.get('plate_number')
-                        }
-                
-                missions.append(mission_data)
-        
-        return missions
+
+        def load():
+            missions = []
+            missions_ref = db.db.collection(db.MISSIONS_COLLECTION).where('assigned_person_id', '==', user_id).order_by('created_at', direction=firestore.Query.DESCENDING)
+
+            for doc in missions_ref.stream():
+                mission_data = db.to_dict(doc)
+                if mission_data:
+                    # Get user info
+                    user_doc = db.db.collection(db.USERS_COLLECTION).document(user_id).get()
+                    if user_doc.exists:
+                        user_data = user_doc.to_dict()
+                        mission_data['assigned_user'] = {'full_name': user_data.get('full_name')}
+
+                    # Get vehicle info if available
+                    if mission_data.get('vehicle_id'):
+                        vehicle_doc = db.db.collection(db.VEHICLES_COLLECTION).document(mission_data['vehicle_id']).get()
+                        if vehicle_doc.exists:
+                            vehicle_data = vehicle_doc.to_dict()
+                            mission_data['vehicle'] = {
+                                'model': vehicle_data.get('model'),
+                                'plate_number': vehicle_data.get('plate_number')
+                            }
+
+                    missions.append(mission_data)
+            return missions
+
+        return db._get_or_load(cache_key, load, 60, tags=['missions', 'employees', 'vehicles'])
     except Exception as e:
         print(f"Get user missions error: {e}")
         return []
@@ -1161,8 +2761,26 @@ def update_mission(mission_id: str, update_data: Dict) -> bool:
             return False
             
         update_data['updated_at'] = datetime.now().isoformat()
-        
-        db.db.collection(db.MISSIONS_COLLECTION).document(mission_id).update(update_data)
+
+        doc_ref = db.db.collection(db.MISSIONS_COLLECTION).document(mission_id)
+
+        def update(transaction):
+            # Read the old status in the transaction the deltas are written in
+            current = doc_ref.get(transaction=transaction)
+            if not current.exists:
+                return False
+
+            transaction.update(doc_ref, db._stamped(update_data))
+            if 'status' in update_data:
+                old_status = (current.to_dict() or {}).get('status')
+                db._stage_stats(transaction, db._status_deltas(
+                    'missions', db.MISSION_STATUSES, old_status, update_data['status']))
+            return True
+
+        if not db._run_transaction(update):
+            return False
+        if 'status' in update_data:
+            db._invalidate_cache('dashboard')
         
         # Log activity
         db.log_activity('mission_updated', {
@@ -1171,6 +2789,7 @@ def update_mission(mission_id: str, update_data: Dict) -> bool:
         })
         
         db._invalidate_cache('missions')
+        db._index_mission(mission_id, update_data)
         return True
     except Exception as e:
         print(f"Update mission error: {e}")
@@ -1182,113 +2801,96 @@ def delete_mission(mission_id: str) -> bool:
         if not db.db:
             return False
             
-        # Release resources first
-        db._release_mission_resources(mission_id)
+        doc_ref = db.db.collection(db.MISSIONS_COLLECTION).document(mission_id)
 
-        # Delete subcollections if needed (Firestore doesn't auto-delete subcollections)
-        # Assuming we might want to keep logs or delete them?
-        # For a clean hard delete, we should ideally delete subcollections too,
-        # but standardized method for that is recursive delete which is not just one call.
-        # For this scope, deleting the document is the primary request.
+        def delete(transaction):
+            doc = doc_ref.get(transaction=transaction)
+            if not doc.exists:
+                return False
+            mission_data = doc.to_dict() or {}
+            old_status = mission_data.get('status')
+
+            # Release resources first (completed missions already released theirs)
+            stats_deltas = {}
+            if old_status != 'COMPLETED':
+                stats_deltas = db._stage_mission_release(transaction, doc_ref, mission_data)
+
+            # Delete subcollections if needed (Firestore doesn't auto-delete subcollections)
+            # Assuming we might want to keep logs or delete them?
+            # For a clean hard delete, we should ideally delete subcollections too,
+            # but standardized method for that is recursive delete which is not just one call.
+            # For this scope, deleting the document is the primary request.
+
+            transaction.delete(doc_ref)
+            db._stage_tombstone(transaction, db.MISSIONS_COLLECTION, doc_ref.id)
+            db._add_deltas(stats_deltas, {
+                'missions.total': -1,
+                **db._status_deltas('missions', db.MISSION_STATUSES, old_status=old_status)
+            })
 
-        db.db.collection(db.MISSIONS_COLLECTION).document(mission_id).delete()
-        
-        # Log activity
-        db.log_activity('mission_deleted', {
-            'mission_id': mission_id
-        })
+            # Log activity
+            db._stage_activity(transaction, 'mission_deleted', {
+                'mission_id': mission_id
+            })
+            db._stage_stats(transaction, stats_deltas)
+            return True
+
+        if not db._run_transaction(delete):
+            return False
         
-        db._invalidate_cache('missions')
+        db._invalidate_mission_resources()
+        db._index_mission(mission_id, removed=True)
         return True
     except Exception as e:
         print(f"Delete mission error: {e}")
         return False
 
 def get_mission_stats() -> Dict:
-    """Get mission statistics"""
+    """Get mission statistics, read from the statistics document"""
     try:
         if not db.db:
             return {}
             
-        missions = list(db.db.collection(db.MISSIONS_COLLECTION).stream())
-        
-        total = len(missions)
-        pending = len([m for m in missions if m.to_dict().get('status') == 'PENDING'])
-        in_progress = len([m for m in missions if m.to_dict().get('status') == 'IN_PROGRESS'])
-        completed = len([m for m in missions if m.to_dict().get('status') == 'COMPLETED'])
-        cancelled = len([m for m in missions if m.to_dict().get('status') == 'CANCELLED'])
-        
+        missions = db.get_stats_document().get('missions', {})
         return {
-            'total': total,
-            'pending': pending,
-            'in_progress': in_progress,
-            'completed': completed,
-            'cancelled': cancelled
+            'total': missions.get('total', 0),
+            **{status.lower(): missions.get(status, 0) for status in db.MISSION_STATUSES}
         }
     except Exception as e:
         print(f"Get mission stats error: {e}")
         return {}
 
-def search_missions(query: str) -> List[Dict]:
-    """Search missions by title, location, or description"""
+def search_missions(query: str, limit: int = None, status: str = None, with_details: bool = False) -> List[Dict]:
+    """Search missions by title, location, description, ID or assignee name.
+
+    Served from the in-memory index (see search_index.py): every query term
+    must match a word exactly, as a prefix or inside it, and the best
+    matches come first. Only building the index reads from Firestore, plus
+    the team, vehicle and tool lookups of the returned missions when
+    with_details is set.
+    """
     try:
         if not db.db or not query:
             return []
-            
-        missions = []
-        query_lower = query.lower()
-        
-        # Get all missions and filter in Python (Firestore has limited text search)
-        # Note: Optimization could be to cache this list if it's called often
-        missions_ref = db.db.collection(db.MISSIONS_COLLECTION)
-        
-        for doc in missions_ref.stream():
-            mission_data = db.to_dict(doc)
-            if mission_data:
-                # Check if query matches title, location, or description
-                title = mission_data.get('title', '').lower()
-                location = mission_data.get('location', '').lower()
-                description = mission_data.get('description', '').lower()
-                
-                if (query_lower in title or 
-                    query_lower in location or 
-                    query_lower in description):
-                    
-                    # Get assigned user info
-                    if mission_data.get('assigned_person_id'):
-                        user_doc = db.db.collection(db.USERS_COLLECTION).document(mission_data['assigned_person_id']).get()
-                        if user_doc.exists:
-                            user_data = user_doc.to_dict()
-                            mission_data['assigned_user'] = {'full_name': user_data.get('full_name')}
-                    
-                    missions.append(mission_data)
-        
+
+        index = db.get_mission_index()
+        if index is None:
+            return []
+        if status:
+            missions = [mission for mission in index.search(query) if mission.get('status') == status][:limit]
+        else:
+            missions = index.search(query, limit)
+        if with_details:
+            # The results are copies, so the index keeps its own records
+            _attach_mission_details(missions)
         return missions
     except Exception as e:
         print(f"Search missions error: {e}")
         return []
-    
+
 def add_mission_log(mission_id: str, action: str, user_name: str, notes: str = None) -> bool:
     """Add a log entry to a specific mission."""
-    try:
-        if not db.db:
-            return False
-
-        log_data = {
-            'action': action,
-            'user_name': user_name,
-            'created_at': datetime.now().isoformat()
-        }
-        if notes:
-            log_data['notes'] = notes
-
-        # Add the log to the 'mission_logs' subcollection of the mission
-        db.db.collection(db.MISSIONS_COLLECTION).document(mission_id).collection(db.MISSION_LOGS_COLLECTION).add(log_data)
-
-        return True
-    except Exception as e:
-        print(f"Add mission log error: {e}")
-        return False
+    return db.add_mission_log(mission_id, action, user_name, notes)
 
 def get_mission_logs(mission_id: str) -> List[Dict]:
     """Get all log entries for a specific mission."""
@@ -1296,7 +2898,8 @@ def get_mission_logs(mission_id: str) -> List[Dict]:
         if not db.db:
             return []
 
-        logs = []
+        # Entries still waiting in the outbox are the newest
+        logs = db.pending_mission_logs(mission_id)
         # Get logs from the 'mission_logs' subcollection, ordered by creation date
         logs_ref = db.db.collection(db.MISSIONS_COLLECTION).document(mission_id).collection(db.MISSION_LOGS_COLLECTION).order_by('created_at', direction=firestore.Query.DESCENDING)
 
@@ -1308,7 +2911,7 @@ def get_mission_logs(mission_id: str) -> List[Dict]:
         return logs
     except Exception as e:
         print(f"Get mission logs error: {e}")
-        return []
+        return db.pending_mission_logs(mission_id)
 # Add these functions to your db.py file
 
 def get_mission_personnel(mission_id: str) -> List[Dict]:
@@ -1473,16 +3076,18 @@ def assign_personnel_to_mission(mission_id: str, personnel_ids: List[str]) -> bo
             return False
             
         # Update mission with personnel_ids
-        db.db.collection(db.MISSIONS_COLLECTION).document(mission_id).update({
+        update_data = {
             'personnel_ids': personnel_ids,
             'updated_at': datetime.now().isoformat()
-        })
+        }
+        db.db.collection(db.MISSIONS_COLLECTION).document(mission_id).update(db._stamped(update_data))
+        db._index_mission(mission_id, update_data)
 
         # Update each person's status
         for person_id in personnel_ids:
-            db.db.collection(db.USERS_COLLECTION).document(person_id).update({
+            db.db.collection(db.USERS_COLLECTION).document(person_id).update(db._stamped({
                 'mission_status': 'IN_MISSION'
-            })
+            }))
         
         # Log activity
         db.log_activity('personnel_assigned', {
@@ -1497,24 +3102,34 @@ def assign_personnel_to_mission(mission_id: str, personnel_ids: List[str]) -> bo
 
 def assign_tool_to_mission(mission_id: str, tool_id: str, quantity: int = 1) -> bool:
     """Assign tool to mission"""
+    return assign_tools_to_mission(mission_id, {tool_id: quantity})
+
+def assign_tools_to_mission(mission_id: str, tool_quantities: Dict[str, int]) -> bool:
+    """Assign several tools to a mission, taking their stock in one transaction"""
     try:
         if not db.db:
             return False
-            
-        # Create tool assignment
-        assignment_data = {
-            'mission_id': mission_id,
-            'tool_id': tool_id,
-            'quantity': quantity,
-            'status': 'ASSIGNED',
-            'assigned_at': datetime.now().isoformat()
-        }
-        
-        db.db.collection(db.TOOL_ASSIGNMENTS_COLLECTION).add(assignment_data)
-        
-        # Update tool quantity
-        db.update_tool_quantity(tool_id, quantity, 'assign')
-        
+
+        assignments_ref = db.db.collection(db.TOOL_ASSIGNMENTS_COLLECTION)
+
+        def assign(transaction):
+            available_delta = db._stage_tool_adjustments(
+                transaction, {tool_id: -quantity for tool_id, quantity in tool_quantities.items()})
+
+            # Create tool assignments
+            for tool_id, quantity in tool_quantities.items():
+                transaction.set(assignments_ref.document(), {
+                    'mission_id': mission_id,
+                    'tool_id': tool_id,
+                    'quantity': quantity,
+                    'status': 'ASSIGNED',
+                    'assigned_at': datetime.now().isoformat()
+                })
+            db._stage_stats(transaction, {'tools.available_quantity': available_delta})
+
+        db._run_transaction(assign)
+
+        db._invalidate_cache('tools', 'dashboard')
         return True
     except Exception as e:
         print(f"Assign tool error: {e}")
@@ -1533,13 +3148,44 @@ def assign_vehicle_to_mission(mission_id: str, vehicle_id: str) -> bool:
             'status': 'ASSIGNED',
             'assigned_at': datetime.now().isoformat()
         }
-        
-        db.db.collection(db.VEHICLE_ASSIGNMENTS_COLLECTION).add(assignment_data)
-        
-        # Update vehicle status
-        db.update_vehicle_status(vehicle_id, 'IN_USE')
-        
+        vehicle_ref = db.db.collection(db.VEHICLES_COLLECTION).document(vehicle_id)
+
+        def assign(transaction):
+            vehicle_doc = vehicle_ref.get(transaction=transaction)
+            if not vehicle_doc.exists:
+                return False
+            old_status = (vehicle_doc.to_dict() or {}).get('status')
+
+            # The assignment, the vehicle status and its counters commit together
+            transaction.set(db.db.collection(db.VEHICLE_ASSIGNMENTS_COLLECTION).document(), assignment_data)
+            transaction.update(vehicle_ref, db._stamped(db._vehicle_status_fields('IN_USE')))
+            db._stage_stats(transaction, db._status_deltas('vehicles', db.VEHICLE_STATUSES, old_status, 'IN_USE'))
+            return True
+
+        if not db._run_transaction(assign):
+            return False
+
+        db._invalidate_cache('vehicles', 'dashboard')
         return True
     except Exception as e:
         print(f"Assign vehicle error: {e}")
-        return False    
\ No newline at end of file
+        return False
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="SmartConnect database maintenance")
+    parser.add_argument('command', choices=['rebuild-stats', 'backfill-usernames'], help="Maintenance command to run")
+    args = parser.parse_args()
+
+    if args.command == 'rebuild-stats':
+        result = rebuild_stats()
+        if result is None:
+            raise SystemExit("Statistics rebuild failed")
+        print(json.dumps(result, indent=2))
+    elif args.command == 'backfill-usernames':
+        added = backfill_username_index()
+        if added is None:
+            raise SystemExit("Username index backfill failed")
+        print(f"Indexed {added} usernames")
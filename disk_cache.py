@@ -0,0 +1,125 @@
+"""Persistent second cache tier.
+
+Keeps the last-known result of the big collection reads in a SQLite file in
+the app data directory, so that a fresh launch can render them straight
+away and revalidate in the background instead of waiting for Firestore.
+Rows carry the time they were stored and the format version of the app
+that wrote them; rows written by another version are ignored.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# Set by Flet to the app's private data directory on packaged builds
+APP_DATA_ENV_VAR = 'FLET_APP_STORAGE_DATA'
+DEFAULT_DIRECTORY = os.path.join('~', '.smartconnect')
+CACHE_FILE_NAME = 'cache.db'
+
+
+def app_data_path(file_name: str) -> str:
+    """Path of a file in the app's data directory"""
+    directory = os.getenv(APP_DATA_ENV_VAR) or os.path.expanduser(DEFAULT_DIRECTORY)
+    return os.path.join(directory, file_name)
+
+
+def default_cache_path() -> str:
+    return app_data_path(CACHE_FILE_NAME)
+
+
+def _encode(value: Any) -> Any:
+    """JSON fallback for the timestamps Firestore returns"""
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+
+def _decode(data: Dict) -> Any:
+    if len(data) == 1 and '__datetime__' in data:
+        return datetime.fromisoformat(data['__datetime__'])
+    return data
+
+
+class DiskCache:
+    """SQLite-backed store of cached results, with tag-based invalidation"""
+
+    def __init__(self, path: str, version: int = 1):
+        self.path = path
+        self.version = version
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                ' key TEXT PRIMARY KEY,'
+                ' value TEXT NOT NULL,'
+                ' stored_at REAL NOT NULL,'
+                ' version INTEGER NOT NULL'
+                ')'
+            )
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS entry_tags ('
+                ' tag TEXT NOT NULL,'
+                ' key TEXT NOT NULL,'
+                ' PRIMARY KEY (tag, key)'
+                ') WITHOUT ROWID'
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """(value, stored_at wall-clock time) for key, or None"""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT value, stored_at FROM entries WHERE key = ? AND version = ?',
+                (key, self.version)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0], object_hook=_decode), row[1]
+
+    def set(self, key: str, value: Any, tags: Iterable[str] = (), stored_at: float = None):
+        data = json.dumps(value, default=_encode)
+        stored_at = time.time() if stored_at is None else stored_at
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO entries (key, value, stored_at, version) VALUES (?, ?, ?, ?)',
+                (key, data, stored_at, self.version)
+            )
+            self._connection.execute('DELETE FROM entry_tags WHERE key = ?', (key,))
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO entry_tags (tag, key) VALUES (?, ?)',
+                [(tag, key) for tag in tags]
+            )
+
+    def delete(self, key: str):
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+            self._connection.execute('DELETE FROM entry_tags WHERE key = ?', (key,))
+
+    def invalidate(self, *tags: str):
+        """Delete every stored result carrying any of the tags"""
+        with self._lock, self._connection:
+            for tag in tags:
+                keys = [row[0] for row in self._connection.execute(
+                    'SELECT key FROM entry_tags WHERE tag = ?', (tag,))]
+                for key in keys:
+                    self._connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+                    self._connection.execute('DELETE FROM entry_tags WHERE key = ?', (key,))
+
+    def clear(self):
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM entries')
+            self._connection.execute('DELETE FROM entry_tags')
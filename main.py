@@ -3,22 +3,29 @@ from datetime import datetime
 import time  
 import os
 
+# For the startup-to-first-screen timing, printed by the router when
+# SMARTCONNECT_STARTUP_TIMING is set
+STARTED_AT = time.perf_counter()
+
 # Updated imports to use the new database
 from db import db
+from sessions import SESSION_STORAGE_KEY, SessionSigner, load_session_key
+
+# Views are imported on first navigation to their route (see views/registry.py)
+from views.registry import ViewRegistry
+
+# Routes usually visited next from a route, imported while it is shown
+LIKELY_NEXT_ROUTES = {
+    "/login": ["/dashboard"],
+    "/dashboard": ["/missions", "/employees", "/tools", "/cars", "/settings"],
+    "/employees": ["/view_employee", "/edit_employee", "/adduser"],
+    "/tools": ["/add-tool"],
+    "/cars": ["/add-vehicle"],
+    "/missions": ["/add-mission"],
+}
 
-# Import views
-from views.dashboard_view import dashboard_view
-from views.employees_view import employees_view
-from views.tools_view import tools_view
-from views.settings_view import settings_view
-from views.add_mission_view import add_mission_view
-from views.add_user_view import add_user_view
-from views.login_view import login_view
-from views.vehicles_view import vehicles_view
-from views.add_tool_view import add_tool_view
-from views.add_vehicle_view import add_vehicle_view
-from views.missions_view import missions_view
-from views.employee_details_view import employee_details_view
+# Built views kept for navigating back to them without rebuilding
+KEPT_VIEWS = 6
 
 navigation_history = []
 
@@ -173,8 +180,10 @@ def dashboard_router(page: ft.Page):
             except Exception as le:
                 print(f"Error logging logout activity: {le}")
         
-        # Clear current user
+        # Clear current user, their saved session and the views built for them
         current_user = None
+        clear_session()
+        routes.discard_views()
         
         # Show logout message
         show_snackbar("Logged out successfully", ft.Colors.BLUE)
@@ -182,13 +191,73 @@ def dashboard_router(page: ft.Page):
         # Navigate to login
         go_to("/login")
         
-    def on_login_success(authenticated_user):
+    def on_login_success(authenticated_user, remember=False):
         """Handle successful login"""
         nonlocal current_user
         current_user = authenticated_user
+        # "Remember me" lets the next launch skip the login screen
+        if remember:
+            save_session(authenticated_user)
+        else:
+            clear_session()
+        routes.discard_views()
         show_snackbar(f"Welcome back, {authenticated_user.get('full_name', 'User')}!", ft.Colors.GREEN)
         go_to("/dashboard")
         
+    # ========== SAVED SESSION ==========
+
+    try:
+        session_signer = SessionSigner(load_session_key())
+    except Exception as se:
+        print(f"Saved sessions unavailable: {se}")
+        session_signer = None
+
+    def save_session(user):
+        """Keep a signed session token in the client storage"""
+        if not session_signer:
+            return
+        try:
+            page.client_storage.set(SESSION_STORAGE_KEY, session_signer.issue(user))
+        except Exception as se:
+            print(f"Error saving session: {se}")
+
+    def clear_session():
+        try:
+            page.client_storage.remove(SESSION_STORAGE_KEY)
+        except Exception as se:
+            print(f"Error clearing session: {se}")
+
+    def restore_session():
+        """The user of a valid saved session, checked without the database"""
+        if not session_signer:
+            return None
+        try:
+            token = page.client_storage.get(SESSION_STORAGE_KEY)
+        except Exception as se:
+            print(f"Error reading session: {se}")
+            return None
+        return session_signer.verify(token) if token else None
+
+    def revalidate_session(user_id):
+        """Check in the background that the resumed account is still active"""
+        nonlocal current_user
+        user = db.get_session_user(user_id)
+        # Unreachable database: keep the session until the next check
+        if user is None or not current_user or current_user.get('id') != user_id:
+            return
+
+        if user is False:
+            current_user = None
+            clear_session()
+            routes.discard_views()
+            show_snackbar("Your session has ended, please sign in again")
+            go_to("/login")
+            return
+
+        # Fresh profile, and a renewed token
+        current_user = user
+        save_session(user)
+
     def not_found_view():
         """404 view"""
         content = ft.Column([
@@ -214,7 +283,57 @@ def dashboard_router(page: ft.Page):
         )
 
     # ========== ROUTE HANDLING ==========
-    
+
+    # Route -> view module, and how to call its view function. The views of
+    # the bottom navigation tabs and the lists are kept alive, so switching
+    # back to them keeps their scroll position and filters
+    routes = ViewRegistry(max_views=KEPT_VIEWS)
+    routes.register("/login", "views.login_view", lambda view: view(page, on_login_success, show_snackbar))
+    routes.register("/dashboard", "views.dashboard_view",
+                    lambda view: view(page, logout_user, go_to, current_user, refresh_all_data, create_bottom_nav),
+                    keep_alive=True)
+    routes.register("/employees", "views.employees_view",
+                    lambda view: view(page, go_to, create_app_bar, create_bottom_nav, show_snackbar),
+                    keep_alive=True)
+    routes.register("/tools", "views.tools_view",
+                    lambda view: view(page, go_to, create_app_bar, create_bottom_nav, show_snackbar),
+                    keep_alive=True)
+    routes.register("/settings", "views.settings_view",
+                    lambda view: view(page, create_app_bar, create_bottom_nav, current_user, show_snackbar),
+                    keep_alive=True)
+    routes.register("/add-mission", "views.add_mission_view", lambda view: view(page, create_app_bar, current_user))
+    routes.register("/adduser", "views.add_user_view",
+                    lambda view: view(page, create_app_bar, current_user, show_snackbar))
+    routes.register("/cars", "views.vehicles_view", lambda view: view(page, create_app_bar, go_to, show_snackbar),
+                    keep_alive=True)
+    routes.register("/add-tool", "views.add_tool_view",
+                    lambda view: view(page, create_app_bar, current_user, show_snackbar))
+    routes.register("/add-vehicle", "views.add_vehicle_view",
+                    lambda view: view(page, create_app_bar, current_user, show_snackbar))
+    routes.register("/missions", "views.missions_view", lambda view: view(page, go_to, show_snackbar),
+                    keep_alive=True)
+    # Dynamic routes, followed by an employee ID
+    routes.register("/edit_employee", "views.employee_details_view",
+                    lambda view, employee_id=None: view(page, go_to, create_app_bar, show_snackbar,
+                                                        employee_id=employee_id))
+    routes.register("/view_employee", "views.employee_details_view",
+                    lambda view, employee_id: view(page, go_to, create_app_bar, show_snackbar,
+                                                   employee_id=employee_id, readonly=True))
+
+    first_screen_shown = False
+
+    def show_view(route, view):
+        """Show a view, then prewarm the routes likely to follow it"""
+        nonlocal first_screen_shown
+        page.views.append(view)
+        page.update()
+
+        if not first_screen_shown:
+            first_screen_shown = True
+            if os.getenv("SMARTCONNECT_STARTUP_TIMING", "").lower() in ("1", "true", "yes"):
+                print(f"Startup to first screen: {(time.perf_counter() - STARTED_AT) * 1000:.0f} ms")
+        routes.prewarm(LIKELY_NEXT_ROUTES.get(route, []))
+
     def route_change(e):
         """Handle route changes"""
         global navigation_history
@@ -236,8 +355,7 @@ def dashboard_router(page: ft.Page):
             page.route.startswith("/view_employee") or
             page.route in protected_routes) and not current_user:
             # Redirect to login if not authenticated
-            page.views.append(login_view(page, on_login_success, show_snackbar))
-            page.update()
+            show_view("/login", routes.build("/login"))
             return
         
         # Handle dynamic routes first
@@ -246,12 +364,11 @@ def dashboard_router(page: ft.Page):
             route_parts = page.route.split("/")
             if len(route_parts) >= 3:
                 employee_id = route_parts[2]
-                view = employee_details_view(page, go_to, create_app_bar, show_snackbar, employee_id=employee_id)
+                view = routes.build("/edit_employee", employee_id)
             else:
                 # No employee ID provided - create new employee
-                view = employee_details_view(page, go_to, create_app_bar, show_snackbar)
-            page.views.append(view)
-            page.update()
+                view = routes.build("/edit_employee")
+            show_view("/edit_employee", view)
             return
         
         if page.route.startswith("/view_employee"):
@@ -259,56 +376,71 @@ def dashboard_router(page: ft.Page):
             route_parts = page.route.split("/")
             if len(route_parts) >= 3:
                 employee_id = route_parts[2]
-                view = employee_details_view(page, go_to, create_app_bar, show_snackbar, employee_id=employee_id, readonly=True)
-                page.views.append(view)
-                page.update()
+                show_view("/view_employee", routes.build("/view_employee", employee_id))
                 return
             else:
                 # No employee ID provided - redirect to employees list
                 page.route = "/employees"
-                page.views.append(employees_view(page, go_to, create_app_bar, create_bottom_nav, show_snackbar))
-                page.update()
+                show_view("/employees", routes.build("/employees"))
                 return
         
-        # Define static routes
-        routes = {
-            "/": lambda: dashboard_view(page, logout_user, go_to, current_user, refresh_all_data, create_bottom_nav) if current_user else login_view(page, on_login_success, show_snackbar),
-            "/dashboard": lambda: dashboard_view(page, logout_user, go_to, current_user, refresh_all_data, create_bottom_nav),
-            "/employees": lambda: employees_view(page, go_to, create_app_bar, create_bottom_nav, show_snackbar),
-            "/tools": lambda: tools_view(page, go_to, create_app_bar, create_bottom_nav, show_snackbar),
-            "/settings": lambda: settings_view(page, create_app_bar, create_bottom_nav, current_user, show_snackbar),
-            "/add-mission": lambda: add_mission_view(page, create_app_bar, current_user),
-            "/adduser": lambda: add_user_view(page, create_app_bar, current_user, show_snackbar),
-            "/login": lambda: login_view(page, on_login_success, show_snackbar),
-            "/cars": lambda: vehicles_view(page, create_app_bar, go_to, show_snackbar),
-            "/add-tool": lambda: add_tool_view(page, create_app_bar, current_user, show_snackbar),
-            "/add-vehicle": lambda: add_vehicle_view(page, create_app_bar, current_user, show_snackbar),
-            "/missions": lambda: missions_view(page, go_to, show_snackbar),
-        }
-        
-        # Get the route handler
-        route_handler = routes.get(page.route, not_found_view)
-        
-        # Get the view
-        view = route_handler()
-        
-        # Add view to page
-        page.views.append(view)
-        page.update()
+        route = page.route
+        if route == "/":
+            route = "/dashboard" if current_user else "/login"
+
+        if route not in routes:
+            show_view(route, not_found_view())
+            return
+
+        # Show the view as it was left if it was kept, then bring it up to date
+        view = routes.kept_view(route)
+        if view is not None:
+            show_view(route, view)
+            routes.resume(view)
+        else:
+            show_view(route, routes.build(route))
 
     # IMPORTANT: Register the handlers BEFORE calling page.go()
     page.on_route_change = route_change
     page.on_view_pop = view_pop
     # page.on_login removed
 
-    # Navigate to login initially
-    page.go("/login")
+    # Resume a remembered session straight on the dashboard, or start at the login
+    resumed_user = restore_session()
+    if resumed_user:
+        current_user = resumed_user
+        page.go("/dashboard")
+        page.run_thread(revalidate_session, resumed_user['id'])
+    else:
+        page.go("/login")
 
 
 def main(page: ft.Page):
     """Main function to initialize the app"""
+    # Serve the last known collections from disk on startup and revalidate
+    # them in the background
+    if os.getenv("SMARTCONNECT_DISK_CACHE", "1").lower() not in ("0", "false", "no"):
+        db.enable_disk_cache()
+
+    # Opt-in real-time mirror of the core collections; reads fall back to
+    # Firestore until the initial sync has finished. SMARTCONNECT_DELTA_SYNC
+    # keeps it up to date by polling for changed documents instead
+    if os.getenv("SMARTCONNECT_MIRROR", "").lower() in ("1", "true", "yes"):
+        page.run_thread(db.enable_mirror)
+    elif os.getenv("SMARTCONNECT_DELTA_SYNC", "").lower() in ("1", "true", "yes"):
+        page.run_thread(db.enable_delta_sync)
+
+    # Queue writes made without network coverage and replay them once the
+    # database can be reached again
+    if os.getenv("SMARTCONNECT_OUTBOX", "1").lower() not in ("0", "false", "no"):
+        db.enable_outbox()
+
     dashboard_router(page)
 
+    # Connect and seed the default data once the first screen is up, off the
+    # UI thread (both would otherwise happen on first use)
+    page.run_thread(db.ensure_default_data)
+
 
 if __name__ == "__main__":
     ft.app(target=main)
@@ -0,0 +1,148 @@
+"""Durable queue of writes made while the database could not be reached.
+
+Each queued write records the operation to replay and its arguments, in the
+order the user made them. Writes that modify a document also record the
+version (its updated_at/last_updated value) the user's change was based on,
+so that the replay can tell when someone else changed the document in the
+meantime; such writes are set aside as conflicts instead of overwriting the
+other change.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List
+
+from disk_cache import app_data_path
+
+OUTBOX_FILE_NAME = 'outbox.db'
+
+
+def default_outbox_path() -> str:
+    return app_data_path(OUTBOX_FILE_NAME)
+
+
+class WriteConflict(Exception):
+    """A queued write is based on a version of the document that has since changed"""
+
+
+class Outbox:
+    """SQLite-backed FIFO of pending writes, plus the conflicts found on replay"""
+
+    def __init__(self, path: str = ':memory:'):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        with self._connection:
+            # `document` is the collection/id the write modifies (NULL for
+            # appends) and `base` the JSON version it expects to find there
+            # (NULL when it was not known)
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS operations ('
+                ' seq INTEGER PRIMARY KEY AUTOINCREMENT,'
+                ' operation TEXT NOT NULL,'
+                ' args TEXT NOT NULL,'
+                ' document TEXT,'
+                ' base TEXT,'
+                ' version TEXT'
+                ')'
+            )
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS conflicts ('
+                ' seq INTEGER PRIMARY KEY,'
+                ' operation TEXT NOT NULL,'
+                ' args TEXT NOT NULL,'
+                ' document TEXT,'
+                ' reason TEXT'
+                ')'
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM operations').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def put(self, operation: str, args: Dict, document: str = None, version: str = None,
+            base: Any = None) -> int:
+        """Queue a write; returns its sequence number.
+
+        `version` is the version the write gives the document. A write on a
+        document that already has writes queued is based on the version the
+        last of them will leave, whatever `base` says.
+        """
+        with self._lock, self._connection:
+            if document is not None:
+                row = self._connection.execute(
+                    'SELECT version FROM operations WHERE document = ? ORDER BY seq DESC LIMIT 1',
+                    (document,)
+                ).fetchone()
+                if row is not None:
+                    base = row['version']
+            cursor = self._connection.execute(
+                'INSERT INTO operations (operation, args, document, base, version) VALUES (?, ?, ?, ?, ?)',
+                (operation, json.dumps(args), document,
+                 None if base is None else json.dumps(base), version)
+            )
+            return cursor.lastrowid
+
+    def peek(self, limit: int = 100) -> List[Dict]:
+        """The oldest queued writes, in order"""
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT * FROM operations ORDER BY seq LIMIT ?', (limit,)
+            ).fetchall()
+        return [self._operation(row) for row in rows]
+
+    def pending(self, operation: str = None) -> List[Dict]:
+        """Every queued write (of one operation), in order"""
+        with self._lock:
+            if operation is None:
+                rows = self._connection.execute('SELECT * FROM operations ORDER BY seq').fetchall()
+            else:
+                rows = self._connection.execute(
+                    'SELECT * FROM operations WHERE operation = ? ORDER BY seq', (operation,)
+                ).fetchall()
+        return [self._operation(row) for row in rows]
+
+    def remove(self, seqs: Iterable[int]):
+        """Drop replayed writes"""
+        with self._lock, self._connection:
+            self._connection.executemany('DELETE FROM operations WHERE seq = ?', [(seq,) for seq in seqs])
+
+    def reject(self, entry: Dict, reason: str):
+        """Move a write that cannot be replayed to the conflicts"""
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM operations WHERE seq = ?', (entry['seq'],))
+            self._connection.execute(
+                'INSERT OR REPLACE INTO conflicts (seq, operation, args, document, reason) VALUES (?, ?, ?, ?, ?)',
+                (entry['seq'], entry['operation'], json.dumps(entry['args']), entry['document'], reason)
+            )
+
+    def conflicts(self) -> List[Dict]:
+        with self._lock:
+            rows = self._connection.execute('SELECT * FROM conflicts ORDER BY seq').fetchall()
+        return [{'seq': row['seq'], 'operation': row['operation'], 'args': json.loads(row['args']),
+                 'document': row['document'], 'reason': row['reason']} for row in rows]
+
+    def clear_conflicts(self):
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM conflicts')
+
+    def _operation(self, row) -> Dict:
+        return {
+            'seq': row['seq'],
+            'operation': row['operation'],
+            'args': json.loads(row['args']),
+            'document': row['document'],
+            'base': None if row['base'] is None else json.loads(row['base']),
+            'version': row['version']
+        }
@@ -0,0 +1,243 @@
+"""In-memory inverted index for mission search.
+
+Missions are tokenized on their title, location, description, ID and the
+name of the assigned person. Every token maps to the missions containing it
+(with the weight of the best field it appears in), and every trigram maps to
+the tokens containing it. A query token matches index tokens exactly, by
+prefix (binary search over the sorted vocabulary) or, for three characters
+or more, anywhere inside a token (trigram intersection). The cost of a
+search therefore depends on the matched tokens and missions, not on the
+number of missions indexed.
+"""
+
+import bisect
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Relative weight of a match in each indexed field
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'id': 2.5,
+    'assignee': 2.0,
+    'location': 1.5,
+    'description': 1.0
+}
+
+# How much an exact, prefix or infix token match is worth
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.75
+INFIX_MATCH = 0.5
+
+
+def tokenize(text) -> List[str]:
+    """Lowercase word tokens of a text"""
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+def trigrams(token: str) -> set:
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class MissionSearchIndex:
+    """Token and trigram index over missions, maintained incrementally"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._missions = {}
+        # token -> {mission_id: best field weight}
+        self._postings = defaultdict(dict)
+        # Sorted list of every indexed token, for prefix lookups
+        self._vocabulary = []
+        # trigram -> tokens containing it, for infix lookups
+        self._trigrams = defaultdict(set)
+        self._mission_tokens = {}
+        # Assignee names, and the missions assigned to each person
+        self._names = {}
+        self._assigned = defaultdict(set)
+
+    def __len__(self):
+        return len(self._missions)
+
+    def __contains__(self, mission_id):
+        return mission_id in self._missions
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def build(self, missions: Iterable[Dict], names: Dict[str, str]):
+        """Replace the index with the given missions and assignee names"""
+        with self._lock:
+            self.clear()
+            self._names = {str(user_id): name for user_id, name in names.items() if name}
+            for mission in missions:
+                self.add(mission)
+
+    # ========== MAINTENANCE ==========
+
+    def add(self, mission: Dict):
+        """Index a mission, replacing any previous version of it"""
+        mission_id = mission.get('id')
+        if not mission_id:
+            return
+        with self._lock:
+            self.remove(mission_id)
+            self._missions[mission_id] = dict(mission)
+
+            assignee_id = mission.get('assigned_person_id')
+            if assignee_id:
+                self._assigned[str(assignee_id)].add(mission_id)
+
+            weights = {}
+            for field, text in self._field_texts(mission).items():
+                for token in tokenize(text):
+                    weights[token] = max(weights.get(token, 0), FIELD_WEIGHTS[field])
+
+            for token, weight in weights.items():
+                postings = self._postings[token]
+                if not postings:
+                    bisect.insort(self._vocabulary, token)
+                    for trigram in trigrams(token):
+                        self._trigrams[trigram].add(token)
+                postings[mission_id] = weight
+            self._mission_tokens[mission_id] = set(weights)
+
+    def update(self, mission_id: str, fields: Dict):
+        """Apply a partial update to an indexed mission"""
+        with self._lock:
+            mission = self._missions.get(mission_id)
+            if mission is None:
+                return
+            self.add({**mission, **fields, 'id': mission_id})
+
+    def remove(self, mission_id: str):
+        with self._lock:
+            mission = self._missions.pop(mission_id, None)
+            if mission is None:
+                return
+            assignee_id = mission.get('assigned_person_id')
+            if assignee_id:
+                self._assigned[str(assignee_id)].discard(mission_id)
+
+            for token in self._mission_tokens.pop(mission_id, ()):
+                postings = self._postings.get(token)
+                if postings is None:
+                    continue
+                postings.pop(mission_id, None)
+                if not postings:
+                    # Last mission with this token: drop it from the vocabulary
+                    del self._postings[token]
+                    index = bisect.bisect_left(self._vocabulary, token)
+                    if index < len(self._vocabulary) and self._vocabulary[index] == token:
+                        del self._vocabulary[index]
+                    for trigram in trigrams(token):
+                        tokens = self._trigrams.get(trigram)
+                        if tokens is not None:
+                            tokens.discard(token)
+                            if not tokens:
+                                del self._trigrams[trigram]
+
+    def set_name(self, user_id: str, name: Optional[str]):
+        """Record a person's name and reindex the missions assigned to them"""
+        user_id = str(user_id)
+        with self._lock:
+            if self._names.get(user_id) == name:
+                return
+            if name:
+                self._names[user_id] = name
+            else:
+                self._names.pop(user_id, None)
+            for mission_id in list(self._assigned.get(user_id, ())):
+                self.add(self._missions[mission_id])
+
+    def _field_texts(self, mission: Dict) -> Dict[str, str]:
+        return {
+            'title': mission.get('title'),
+            'id': mission.get('id'),
+            'assignee': self._names.get(str(mission.get('assigned_person_id'))),
+            'location': mission.get('location'),
+            'description': mission.get('description')
+        }
+
+    # ========== QUERIES ==========
+
+    def _matching_tokens(self, term: str) -> Dict[str, float]:
+        """Index tokens matching a query term, with the strength of the match"""
+        matches = {}
+        if term in self._postings:
+            matches[term] = EXACT_MATCH
+
+        index = bisect.bisect_left(self._vocabulary, term)
+        while index < len(self._vocabulary) and self._vocabulary[index].startswith(term):
+            matches.setdefault(self._vocabulary[index], PREFIX_MATCH)
+            index += 1
+
+        term_trigrams = trigrams(term)
+        if term_trigrams:
+            candidates = None
+            for trigram in sorted(term_trigrams, key=lambda t: len(self._trigrams.get(t, ()))):
+                tokens = self._trigrams.get(trigram)
+                if not tokens:
+                    candidates = set()
+                    break
+                candidates = set(tokens) if candidates is None else candidates & tokens
+                if not candidates:
+                    break
+            for token in candidates or ():
+                if term in token:
+                    matches.setdefault(token, INFIX_MATCH)
+        return matches
+
+    def search(self, query: str, limit: int = None) -> List[Dict]:
+        """Missions matching every term of the query, best matches first.
+
+        Each returned mission is a copy carrying `assigned_user` when its
+        assignee's name is known.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        with self._lock:
+            scores = None
+            for term in terms:
+                term_scores = {}
+                for token, strength in self._matching_tokens(term).items():
+                    for mission_id, weight in self._postings[token].items():
+                        score = weight * strength
+                        if score > term_scores.get(mission_id, 0):
+                            term_scores[mission_id] = score
+                if scores is None:
+                    scores = term_scores
+                else:
+                    # Every term has to match
+                    scores = {mission_id: score + term_scores[mission_id]
+                              for mission_id, score in scores.items() if mission_id in term_scores}
+                if not scores:
+                    return []
+
+            ranked = sorted(
+                scores,
+                key=lambda mission_id: (scores[mission_id], str(self._missions[mission_id].get('created_at') or '')),
+                reverse=True
+            )
+            if limit is not None:
+                ranked = ranked[:limit]
+
+            results = []
+            for mission_id in ranked:
+                mission = dict(self._missions[mission_id])
+                name = self._names.get(str(mission.get('assigned_person_id')))
+                if name:
+                    mission['assigned_user'] = {'full_name': name}
+                results.append(mission)
+            return results
@@ -0,0 +1,96 @@
+"""Signed session tokens, so a remembered user skips the login screen.
+
+A token carries the user's profile and its expiry time, signed with an
+HMAC key kept in the app data directory. It is checked on the device
+alone, without a database round trip; the app revalidates the account
+in the background once the dashboard is shown.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from typing import Dict, Optional
+
+from disk_cache import app_data_path
+
+SESSION_KEY_FILE_NAME = 'session.key'
+# Key of the token in Flet's client storage
+SESSION_STORAGE_KEY = 'smartconnect.session'
+# Seconds a token is valid for; it is renewed whenever the account is revalidated
+SESSION_LIFETIME = 7 * 24 * 3600
+# Profile fields carried by the token (never the password hash)
+PROFILE_FIELDS = ('id', 'username', 'full_name', 'role', 'department_id', 'active', 'mission_status')
+
+
+def default_key_path() -> str:
+    return app_data_path(SESSION_KEY_FILE_NAME)
+
+
+def load_session_key(path: str = None) -> bytes:
+    """The signing key, created on first use"""
+    path = path or default_key_path()
+    try:
+        with open(path, 'rb') as key_file:
+            key = key_file.read()
+        if key:
+            return key
+    except FileNotFoundError:
+        pass
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    key = secrets.token_bytes(32)
+    # Readable by the app's user only
+    descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, 'wb') as key_file:
+        key_file.write(key)
+    return key
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+class SessionSigner:
+    """Issues and checks the `<payload>.<signature>` session tokens"""
+
+    def __init__(self, key: bytes, lifetime: float = SESSION_LIFETIME):
+        self.key = key
+        self.lifetime = lifetime
+
+    def issue(self, user: Dict, now: float = None) -> str:
+        """A token for a user, valid for `lifetime` seconds"""
+        now = time.time() if now is None else now
+        payload = {
+            'user': {field: user.get(field) for field in PROFILE_FIELDS if field in user},
+            'exp': now + self.lifetime
+        }
+        body = _b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+        return f"{body}.{self._sign(body)}"
+
+    def verify(self, token: str, now: float = None) -> Optional[Dict]:
+        """The user profile of a valid token, or None if it is forged, malformed or expired"""
+        try:
+            body, signature = token.split('.')
+            if not hmac.compare_digest(signature, self._sign(body)):
+                return None
+            payload = json.loads(_b64decode(body))
+        except Exception:
+            return None
+
+        now = time.time() if now is None else now
+        if payload.get('exp', 0) <= now:
+            return None
+        return payload.get('user') or None
+
+    def _sign(self, body: str) -> str:
+        return _b64encode(hmac.new(self.key, body.encode('ascii'), hashlib.sha256).digest())
@@ -0,0 +1,474 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+from firebase_admin import firestore
+from google.api_core import exceptions as google_exceptions
+from google.cloud.firestore_v1.base_query import FieldFilter
+import backends
+import db
+from db import DatabaseManager
+
+class BackendContract:
+    """Behaviour every local backend must share with Firestore"""
+
+    def make_client(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.client = self.make_client()
+        self.vehicles = self.client.collection('vehicles')
+        for doc_id, model, status, year in [('v1', 'Hilux', 'AVAILABLE', 2019),
+                                            ('v2', 'Ranger', 'IN_USE', 2021),
+                                            ('v3', 'Amarok', 'AVAILABLE', 2020)]:
+            self.vehicles.document(doc_id).set({'model': model, 'status': status, 'year': year,
+                                                'specs': {'seats': 5}})
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_document_round_trip(self):
+        doc = self.vehicles.document('v1').get()
+        self.assertTrue(doc.exists)
+        self.assertEqual(doc.id, 'v1')
+        self.assertEqual(doc.to_dict()['specs'], {'seats': 5})
+        self.assertFalse(self.vehicles.document('missing').get().exists)
+
+    def test_add_returns_reference(self):
+        _, doc_ref = self.client.collection('tools').add({'name': 'Drill'})
+        self.assertEqual(doc_ref.get().to_dict(), {'name': 'Drill'})
+
+    def test_where_order_by_limit(self):
+        query = (self.vehicles.where('status', '==', 'AVAILABLE')
+                 .order_by('year', direction=firestore.Query.DESCENDING).limit(5))
+        self.assertEqual([doc.id for doc in query.stream()], ['v3', 'v1'])
+        query = self.vehicles.where(filter=FieldFilter('year', '>', 2019))
+        self.assertEqual(sorted(doc.id for doc in query.stream()), ['v2', 'v3'])
+        self.assertEqual([doc.id for doc in self.vehicles.where('specs.seats', '==', 5).limit(1).stream()], ['v1'])
+
+    def test_start_after_pages_through_results(self):
+        query = self.vehicles.order_by('year').limit(2)
+        first_page = query.get()
+        second_page = query.start_after(first_page[-1]).get()
+        self.assertEqual([doc.id for doc in first_page], ['v1', 'v3'])
+        self.assertEqual([doc.id for doc in second_page], ['v2'])
+
+    def test_update_applies_field_paths_and_transforms(self):
+        doc_ref = self.vehicles.document('v1')
+        doc_ref.update({'specs.seats': firestore.Increment(2), 'status': 'IN_USE', 'year': firestore.DELETE_FIELD})
+        self.assertEqual(doc_ref.get().to_dict(), {'model': 'Hilux', 'status': 'IN_USE', 'specs': {'seats': 7}})
+        with self.assertRaises(google_exceptions.NotFound):
+            self.vehicles.document('missing').update({'status': 'IN_USE'})
+
+    def test_set_merge_merges_nested_maps(self):
+        stats_ref = self.client.collection('stats').document('dashboard')
+        stats_ref.set({'vehicles': {'total': firestore.Increment(1)}}, merge=True)
+        stats_ref.set({'vehicles': {'total': firestore.Increment(2), 'IN_USE': 1}}, merge=True)
+        self.assertEqual(stats_ref.get().to_dict(), {'vehicles': {'total': 3, 'IN_USE': 1}})
+
+    def test_batch_is_all_or_nothing(self):
+        batch = self.client.batch()
+        batch.delete(self.vehicles.document('v1'))
+        batch.update(self.vehicles.document('missing'), {'status': 'IN_USE'})
+        with self.assertRaises(google_exceptions.NotFound):
+            batch.commit()
+        self.assertTrue(self.vehicles.document('v1').get().exists)
+
+        batch = self.client.batch()
+        batch.delete(self.vehicles.document('v1'))
+        batch.set(self.vehicles.document('v4'), {'model': 'Navara'})
+        batch.commit()
+        self.assertEqual(sorted(doc.id for doc in self.vehicles.stream()), ['v2', 'v3', 'v4'])
+
+    def test_get_all_and_aggregation(self):
+        refs = [self.vehicles.document(doc_id) for doc_id in ['v1', 'missing', 'v2']]
+        self.assertEqual([doc.exists for doc in self.client.get_all(refs)], [True, False, True])
+        # Firestore rejects a batch get of no documents
+        with self.assertRaises(ValueError):
+            self.client.get_all([])
+
+        results = self.vehicles.where('status', '==', 'AVAILABLE').count(alias='count').sum('year', alias='years').get()
+        self.assertEqual({result.alias: result.value for result in results[0]}, {'count': 2, 'years': 4039})
+
+    def test_subcollections(self):
+        logs = self.client.collection('missions').document('m1').collection('logs')
+        logs.add({'action': 'created'})
+        self.assertEqual([doc.to_dict() for doc in logs.stream()], [{'action': 'created'}])
+        self.assertEqual(self.client.collection('missions').get(), [])
+
+    def test_on_snapshot_reports_changes(self):
+        received = []
+        watch = self.vehicles.where('status', '==', 'AVAILABLE').on_snapshot(
+            lambda docs, changes, read_time: received.append([(c.type.name, c.document.id) for c in changes]))
+        self.vehicles.document('v1').update({'status': 'IN_USE'})
+        self.vehicles.document('v2').update({'status': 'AVAILABLE'})
+        self.vehicles.document('v3').update({'year': 2022})
+        watch.unsubscribe()
+        self.vehicles.document('v3').delete()
+
+        self.assertEqual(received, [[('ADDED', 'v1'), ('ADDED', 'v3')], [('REMOVED', 'v1')],
+                                    [('ADDED', 'v2')], [('MODIFIED', 'v3')]])
+
+class TestMemoryBackend(BackendContract, unittest.TestCase):
+    def make_client(self):
+        return backends.MemoryClient()
+
+class TestSQLiteBackend(BackendContract, unittest.TestCase):
+    def make_client(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        return backends.SQLiteClient(os.path.join(self.temp_dir.name, 'smartconnect.db'))
+
+    def test_documents_persist_across_clients(self):
+        path = self.client.path
+        self.client.close()
+        self.client = backends.SQLiteClient(path)
+        self.assertEqual(self.client.collection('vehicles').document('v2').get().to_dict()['model'], 'Ranger')
+
+class TestDatabaseManagerOnMemoryBackend(unittest.TestCase):
+    def setUp(self):
+        self.manager = DatabaseManager(backends.MemoryClient())
+        self.manager.initialize_default_data()
+
+    def assert_stats_consistent(self):
+        stored, recomputed = self.manager.get_stats_document(), self.manager.compute_stats()
+        for section, counters in recomputed.items():
+            for name, value in counters.items():
+                self.assertEqual(stored.get(section, {}).get(name, 0), value, f"{section}.{name}")
+
+    def test_user_and_vehicle_lifecycle(self):
+        self.assertTrue(self.manager.create_user('jdoe', 'John Doe', 'secret1', 'technician', 1))
+        self.assertEqual(self.manager.login('jdoe', 'secret1')['full_name'], 'John Doe')
+        self.assertIsNone(self.manager.login('jdoe', 'wrong'))
+
+        self.assertTrue(self.manager.create_vehicle({'model': 'Hilux', 'plate_number': 'AB-1', 'status': 'AVAILABLE'}))
+        vehicle_id = self.manager.get_all_vehicles()[0]['id']
+        self.assertTrue(self.manager.update_vehicle_status(vehicle_id, 'IN_USE'))
+
+        stats = self.manager.get_dashboard_stats()
+        self.assertEqual(stats['employees']['total'], 1)
+        self.assertEqual(stats['vehicles'], {'total': 1, 'available': 0, 'in_use': 1})
+        # Incremental counters agree with a full recount
+        self.assert_stats_consistent()
+
+    def test_usernames_index_follows_create_rename_and_delete(self):
+        self.assertTrue(self.manager.create_user('jdoe', 'John Doe', 'secret1', 'technician', 1))
+        self.assertFalse(self.manager.create_user('jdoe', 'Other John', 'secret2', 'technician', 1))
+        user_id = self.manager.login('jdoe', 'secret1')['id']
+        usernames = self.manager.db.collection('usernames')
+        self.assertEqual(usernames.document('jdoe').get().to_dict(), {'user_id': user_id})
+
+        self.assertTrue(self.manager.create_user('asmith', 'Ann Smith', 'secret1', 'technician', 1))
+        self.assertFalse(self.manager.update_employee(user_id, {'username': 'asmith'}))
+        self.assertTrue(self.manager.update_employee(user_id, {'username': 'john.doe'}))
+        self.assertFalse(usernames.document('jdoe').get().exists)
+        self.assertIsNone(self.manager.login('jdoe', 'secret1'))
+        self.assertEqual(self.manager.login('john.doe', 'secret1')['id'], user_id)
+
+        self.assertTrue(self.manager.delete_employee(user_id))
+        self.assertIsNone(self.manager.login('john.doe', 'secret1'))
+        self.assertTrue(self.manager.create_user('john.doe', 'John Doe', 'secret1', 'technician', 1))
+        self.assert_stats_consistent()
+
+    def test_users_created_before_the_index_are_backfilled(self):
+        users = self.manager.db.collection('users')
+        users.document('u1').set({'username': 'legacy', 'password': self.manager.hash_password('secret1'),
+                                  'active': True})
+        users.document('u2').set({'username': 'older', 'active': True})
+        usernames = self.manager.db.collection('usernames')
+
+        # Without the index only the legacy lookup finds them, and it never writes to the index
+        self.assertIsNone(self.manager.login('legacy', 'secret1'))
+        self.manager.LEGACY_USERNAME_LOOKUP = True
+        self.assertEqual(self.manager.login('legacy', 'secret1')['id'], 'u1')
+        self.assertFalse(usernames.document('legacy').get().exists)
+
+        self.manager.LEGACY_USERNAME_LOOKUP = False
+        self.assertEqual(self.manager.backfill_username_index(), 2)
+        self.assertEqual(self.manager.backfill_username_index(), 0)
+        self.assertEqual(self.manager.login('legacy', 'secret1')['id'], 'u1')
+        self.assertFalse(self.manager.create_user('legacy', 'Legacy', 'secret1', 'technician', 1))
+        self.assertFalse(self.manager.create_user('older', 'Older', 'secret1', 'technician', 1))
+
+    def test_active_users_are_counted_by_truthiness(self):
+        users = self.manager.db.collection('users')
+        for doc_id, active in [('u1', True), ('u2', 1), ('u3', 'true'), ('u4', 0), ('u5', False), ('u6', None)]:
+            users.document(doc_id).set({'username': doc_id, 'active': active})
+        users.document('u7').set({'username': 'u7'})
+
+        self.assertEqual(self.manager.compute_stats()['employees'], {'total': 7, 'active': 3})
+
+        # The app writes a bool
+        self.assertTrue(self.manager.update_employee('u2', {'active': 0}))
+        self.assertIs(self.manager.get_employee_by_id('u2')['active'], False)
+        self.assertTrue(self.manager.create_user('jdoe', 'John Doe', 'secret1', 'technician', 1, active=1))
+        user_id = self.manager.db.collection('usernames').document('jdoe').get().to_dict()['user_id']
+        self.assertIs(users.document(user_id).get().to_dict()['active'], True)
+
+    def test_session_user_follows_the_active_flag(self):
+        self.assertTrue(self.manager.create_user('jdoe', 'John Doe', 'secret1', 'technician', 1))
+        user_id = self.manager.login('jdoe', 'secret1')['id']
+
+        self.assertEqual(self.manager.get_session_user(user_id)['username'], 'jdoe')
+        self.assertTrue(self.manager.update_employee(user_id, {'active': False}))
+        self.assertIs(self.manager.get_session_user(user_id), False)
+        self.assertIs(self.manager.get_session_user('missing'), False)
+        with self.offline():
+            self.assertIsNone(self.manager.get_session_user(user_id))
+        self.assertEqual(self.manager.get_all_employees()[0]['department'], 'logistics')
+
+    def create_tool(self, name, quantity):
+        self.assertTrue(self.manager.create_tool({'name': name, 'serial_number': name,
+                                                  'total_quantity': quantity, 'available_quantity': quantity}))
+        return next(tool['id'] for tool in self.manager.get_all_tools() if tool['name'] == name)
+
+    def test_tool_stock_never_goes_negative(self):
+        tool_id = self.create_tool('Drill', 5)
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.manager.update_tool_quantity(tool_id, 1)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(True), 5)
+        self.assertEqual(self.manager.get_all_tools()[0]['available_quantity'], 0)
+        self.assertEqual(self.manager.get_stats_document()['tools']['available_quantity'], 0)
+
+        # Returns are capped at the total quantity
+        self.assertTrue(self.manager.update_tool_quantity(tool_id, 9, 'return'))
+        self.assertEqual(self.manager.get_all_tools()[0]['available_quantity'], 5)
+
+    def test_adjust_tool_quantities_is_all_or_nothing(self):
+        drill_id = self.create_tool('Drill', 3)
+        saw_id = self.create_tool('Saw', 1)
+
+        self.assertFalse(self.manager.adjust_tool_quantities({drill_id: -2, saw_id: -2}))
+        self.assertEqual({t['name']: t['available_quantity'] for t in self.manager.get_all_tools()},
+                         {'Drill': 3, 'Saw': 1})
+
+        self.assertTrue(self.manager.adjust_tool_quantities({drill_id: -2, saw_id: -1}))
+        self.assertEqual({t['name']: t['available_quantity'] for t in self.manager.get_all_tools()},
+                         {'Drill': 1, 'Saw': 0})
+        self.assertEqual(self.manager.get_stats_document()['tools'], {'total_quantity': 4, 'available_quantity': 1})
+
+    def test_mission_lifecycle_is_atomic(self):
+        self.manager.create_user('lead', 'Team Lead', 'secret1', 'team_leader', 1)
+        leader_id = self.manager.get_all_employees()[0]['id']
+        self.manager.create_vehicle({'model': 'Hilux', 'plate_number': 'AB-1', 'status': 'AVAILABLE'})
+        vehicle_id = self.manager.get_all_vehicles()[0]['id']
+        drill_id = self.create_tool('Drill', 2)
+        saw_id = self.create_tool('Saw', 0)
+        mission = {'title': 'Fiber install', 'status': 'PENDING', 'team_leader_id': leader_id, 'vehicle_id': vehicle_id}
+
+        # Out-of-stock tool: nothing at all is written
+        self.assertFalse(self.manager.create_mission(dict(mission, required_tools=[drill_id, saw_id])))
+        self.assertEqual(self.manager.db.collection('missions').get(), [])
+        self.assertEqual(self.manager.get_all_vehicles()[0]['status'], 'AVAILABLE')
+        self.assertEqual({t['name']: t['available_quantity'] for t in self.manager.get_all_tools()}, {'Drill': 2, 'Saw': 0})
+
+        self.assertTrue(self.manager.create_mission(dict(mission, required_tools=[drill_id])))
+        mission_id = self.manager.db.collection('missions').get()[0].id
+        self.assertEqual(self.manager.get_all_vehicles()[0]['status'], 'IN_USE')
+        self.assertEqual(self.manager.get_all_employees()[0]['mission_status'], 'IN_MISSION')
+        self.assertEqual(self.manager.get_employee_by_id(leader_id)['mission_status'], 'IN_MISSION')
+        self.assert_stats_consistent()
+
+        self.assertTrue(self.manager.update_mission_status(mission_id, 'COMPLETED'))
+        self.assertEqual(self.manager.get_all_vehicles()[0]['status'], 'AVAILABLE')
+        self.assertEqual(self.manager.get_all_employees()[0]['mission_status'], 'AVAILABLE')
+        self.assertEqual({t['name']: t['available_quantity'] for t in self.manager.get_all_tools()}, {'Drill': 2, 'Saw': 0})
+        self.assert_stats_consistent()
+
+        # The vehicle now serves another mission; deleting the completed one must not free it
+        self.manager.update_vehicle_status(vehicle_id, 'IN_USE')
+        with patch.object(db, 'db', self.manager):
+            self.assertTrue(db.delete_mission(mission_id))
+        self.assertEqual(self.manager.get_all_vehicles()[0]['status'], 'IN_USE')
+        self.assertEqual({t['name']: t['available_quantity'] for t in self.manager.get_all_tools()}, {'Drill': 2, 'Saw': 0})
+        self.assert_stats_consistent()
+
+    def test_mission_without_vehicle_team_or_tools(self):
+        with patch.object(self.manager.db, 'get_all', wraps=self.manager.db.get_all) as get_all:
+            self.assertTrue(self.manager.create_mission({'title': 'Site survey', 'status': 'IN_PROGRESS'}))
+            mission_id = self.manager.db.collection('missions').get()[0].id
+            self.assertTrue(self.manager.update_mission_status(mission_id, 'COMPLETED'))
+
+        # Nothing to read, so the backend was never asked for an empty batch
+        get_all.assert_not_called()
+        self.assert_stats_consistent()
+
+    def test_concurrent_status_writes_keep_counters_consistent(self):
+        self.manager.create_vehicle({'model': 'Hilux', 'plate_number': 'AB-1', 'status': 'AVAILABLE'})
+        vehicle_id = self.manager.get_all_vehicles()[0]['id']
+        self.assertTrue(self.manager.create_mission({'title': 'Fiber install', 'status': 'PENDING'}))
+        mission_id = next(self.manager.db.collection('missions').stream()).id
+
+        def toggle(status):
+            for _ in range(20):
+                self.manager.update_vehicle_status(vehicle_id, status)
+
+        threads = [threading.Thread(target=toggle, args=(status,)) for status in ('IN_USE', 'MAINTENANCE') * 3]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assert_stats_consistent()
+
+        # The assignment and the status change commit together
+        self.manager.update_vehicle_status(vehicle_id, 'AVAILABLE')
+        with patch.object(db, 'db', self.manager):
+            self.assertFalse(db.assign_vehicle_to_mission(mission_id, 'missing'))
+            self.assertTrue(db.assign_vehicle_to_mission(mission_id, vehicle_id))
+        assignments = list(self.manager.db.collection('vehicle_assignments').stream())
+        self.assertEqual([doc.to_dict()['vehicle_id'] for doc in assignments], [vehicle_id])
+        self.assertEqual(self.manager.get_all_vehicles()[0]['status'], 'IN_USE')
+        self.assert_stats_consistent()
+
+    def test_missions_page_cursor(self):
+        missions_ref = self.manager.db.collection('missions')
+        for index in range(5):
+            missions_ref.document(f'm{index}').set({
+                'title': f'Mission {index}',
+                'status': 'PENDING' if index % 2 else 'COMPLETED',
+                'created_at': f'2024-01-0{index + 1}T08:00:00'
+            })
+
+        pages, cursor = [], None
+        with patch.object(db, 'db', self.manager):
+            while True:
+                missions, cursor = db.get_missions_page(2, start_after=cursor)
+                pages.append([mission['id'] for mission in missions])
+                if cursor is None:
+                    break
+            pending, pending_cursor = db.get_missions_page(5, status='PENDING')
+
+        self.assertEqual(pages, [['m4', 'm3'], ['m2', 'm1'], ['m0']])
+        self.assertEqual([mission['id'] for mission in pending], ['m3', 'm1'])
+        self.assertIsNone(pending_cursor)
+
+    def test_search_index_follows_writes_without_reads(self):
+        self.manager.create_user('amina', 'Amina Haddad', 'secret1', 'technician', 1)
+        user_id = self.manager.get_all_employees()[0]['id']
+        self.assertTrue(self.manager.create_mission({'title': 'Fiber install', 'location': 'Rabat',
+                                                     'status': 'PENDING', 'assigned_person_id': user_id}))
+
+        with patch.object(db, 'db', self.manager):
+            # The first search builds the index
+            fiber_id = db.search_missions('fib')[0]['id']
+
+            self.assertTrue(self.manager.create_mission({'title': 'Tower maintenance', 'location': 'Casablanca',
+                                                         'status': 'PENDING'}))
+            self.assertTrue(self.manager.update_mission_status(fiber_id, 'COMPLETED'))
+            self.assertTrue(self.manager.update_employee(user_id, {'full_name': 'Amina Benali'}))
+
+            def search(query):
+                return [(mission['title'], mission['status'], mission.get('assigned_user'))
+                        for mission in db.search_missions(query)]
+
+            # Once warm, searching does not touch the database at all
+            with patch.object(self.manager.db, '_read_collection', side_effect=AssertionError), \
+                    patch.object(self.manager.db, '_read_document', side_effect=AssertionError):
+                self.assertEqual(search('casa tow'), [('Tower maintenance', 'PENDING', None)])
+                self.assertEqual(search('benali'), [('Fiber install', 'COMPLETED', {'full_name': 'Amina Benali'})])
+                self.assertEqual(search('haddad'), [])
+                self.assertEqual(search('ber'), [('Fiber install', 'COMPLETED', {'full_name': 'Amina Benali'})])
+
+            tower_id = db.search_missions('tower')[0]['id']
+            self.assertTrue(db.delete_mission(tower_id))
+            self.assertEqual(db.search_missions('tower'), [])
+
+    def offline(self):
+        """Make every read and write of the backend fail as if the network were down"""
+        error = google_exceptions.ServiceUnavailable('offline')
+        return patch.multiple(self.manager.db, **{name: MagicMock(side_effect=error)
+                                                  for name in ('_read_document', '_read_collection', '_write_documents')})
+
+    def test_offline_writes_are_queued_and_replayed_in_order(self):
+        self.manager.enable_outbox(':memory:')
+        self.manager.create_vehicle({'model': 'Hilux', 'plate_number': 'AB-1', 'status': 'AVAILABLE'})
+        self.assertTrue(self.manager.create_mission({'title': 'Fiber install', 'status': 'PENDING'}))
+        vehicle_id = self.manager.get_all_vehicles()[0]['id']
+        mission_id = self.manager.db.collection('missions').get()[0].id
+
+        with self.offline(), patch.object(db, 'db', self.manager):
+            self.assertTrue(self.manager.update_vehicle_status(vehicle_id, 'MAINTENANCE'))
+            self.assertTrue(self.manager.update_vehicle_status(vehicle_id, 'AVAILABLE', 'Depot'))
+            self.assertTrue(self.manager.update_mission_status(mission_id, 'IN_PROGRESS'))
+            self.assertTrue(db.add_mission_log(mission_id, 'started', 'John Doe'))
+            self.assertTrue(db.add_mission_log(mission_id, 'on site', 'John Doe', 'Arrived'))
+
+            # Shown straight away, without touching the network
+            vehicle = self.manager.get_all_vehicles()[0]
+            self.assertEqual((vehicle['status'], vehicle['location']), ('AVAILABLE', 'Depot'))
+            self.assertEqual([log['action'] for log in db.get_mission_logs(mission_id)], ['on site', 'started'])
+            self.assertFalse(self.manager.flush_outbox())
+            self.assertEqual(self.manager.get_outbox_status()['pending'], 5)
+
+        self.assertTrue(self.manager.flush_outbox())
+        self.assertEqual(self.manager.get_outbox_status(), {'pending': 0, 'conflicts': []})
+        stored = self.manager.db.collection('vehicles').document(vehicle_id).get().to_dict()
+        self.assertEqual((stored['status'], stored['location']), ('AVAILABLE', 'Depot'))
+        self.assertEqual(self.manager.db.collection('missions').document(mission_id).get().to_dict()['status'], 'IN_PROGRESS')
+        with patch.object(db, 'db', self.manager):
+            logs = db.get_mission_logs(mission_id)
+        self.assertEqual([(log['action'], log.get('pending')) for log in logs], [('on site', None), ('started', None)])
+        self.assert_stats_consistent()
+
+    def test_replay_sets_aside_writes_that_conflict(self):
+        self.manager.enable_outbox(':memory:')
+        self.manager.create_vehicle({'model': 'Hilux', 'plate_number': 'AB-1', 'status': 'AVAILABLE'})
+        vehicle_id = self.manager.get_all_vehicles()[0]['id']
+
+        with self.offline():
+            self.assertTrue(self.manager.update_vehicle_status(vehicle_id, 'IN_USE'))
+        # Someone else changes the vehicle before the write is replayed
+        self.manager.db.collection('vehicles').document(vehicle_id).update(
+            {'status': 'MAINTENANCE', 'last_updated': '2030-01-01T00:00:00'})
+
+        self.assertTrue(self.manager.flush_outbox())
+        conflicts = self.manager.get_outbox_status()['conflicts']
+        self.assertEqual([conflict['operation'] for conflict in conflicts], ['update_vehicle_status'])
+        self.assertEqual(self.manager.get_all_vehicles()[0]['status'], 'MAINTENANCE')
+
+    def test_delta_sync_pulls_only_changed_documents(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        cache_path = os.path.join(temp_dir.name, 'cache.db')
+        self.manager.enable_disk_cache(cache_path)
+        self.addCleanup(self.manager.disable_disk_cache)
+        for plate in ('AB-1', 'AB-2', 'AB-3'):
+            self.manager.create_vehicle({'model': 'Hilux', 'plate_number': plate, 'status': 'AVAILABLE'})
+        self.assertTrue(self.manager.enable_delta_sync())
+        self.addCleanup(self.manager.disable_mirror)
+        vehicles = {vehicle['plate_number']: vehicle['id'] for vehicle in self.manager.get_all_vehicles()}
+
+        # Another client updates one vehicle and deletes another
+        other = DatabaseManager(self.manager.db)
+        self.assertTrue(other.update_vehicle_status(vehicles['AB-2'], 'MAINTENANCE'))
+        self.assertTrue(other.delete_vehicle(vehicles['AB-3']))
+
+        with patch.object(self.manager, 'to_dict', wraps=self.manager.to_dict) as to_dict:
+            self.assertTrue(self.manager.sync_collection('vehicles'))
+        self.assertEqual(to_dict.call_count, 1)
+        expected = {'AB-1': 'AVAILABLE', 'AB-2': 'MAINTENANCE'}
+        self.assertEqual({v['plate_number']: v['status'] for v in self.manager.get_all_vehicles()}, expected)
+
+        # A restarted app starts from the saved mirror and pulls the delta only
+        self.manager._save_sync_state()
+        restarted = DatabaseManager(self.manager.db)
+        restarted.enable_disk_cache(cache_path)
+        self.addCleanup(restarted.disable_disk_cache)
+        restarted._mirror[restarted.VEHICLES_COLLECTION] = {}
+        restarted._mirror_ready[restarted.VEHICLES_COLLECTION] = threading.Event()
+        restarted._load_sync_state()
+        with patch.object(restarted, 'to_dict', wraps=restarted.to_dict) as to_dict:
+            self.assertTrue(restarted.sync_collection('vehicles'))
+        self.assertEqual(to_dict.call_count, 1)
+        self.assertEqual({v['plate_number']: v['status'] for v in restarted.get_all_vehicles()}, expected)
+
+if __name__ == '__main__':
+    unittest.main()
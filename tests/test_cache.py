@@ -0,0 +1,173 @@
+import gc
+import threading
+import unittest
+from cache import TTLCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class TestTTLCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = TTLCache(max_entries=3, max_weight=10, default_ttl=60, clock=self.clock)
+
+    def test_entries_expire_on_the_monotonic_clock(self):
+        self.cache.set('vehicles_all', [1, 2])
+        self.cache.set('dashboard_stats', {'a': 1}, ttl=5)
+
+        self.clock.now += 10
+        self.assertIsNone(self.cache.get('dashboard_stats'))
+        self.assertEqual(self.cache.get('vehicles_all'), [1, 2])
+
+        self.clock.now += 60
+        self.assertIsNone(self.cache.get('vehicles_all'))
+        self.assertEqual(self.cache.stats(), {'hits': 1, 'misses': 2, 'evictions': 0,
+                                              'expirations': 2, 'coalesced': 0, 'stale_hits': 0, 'refreshes': 0, 'disk_hits': 0,
+                                              'entries': 0, 'weight': 0})
+
+    def test_evicts_least_recently_used(self):
+        for key in ('a', 'b', 'c'):
+            self.cache.set(key, key)
+        self.cache.get('a')
+        self.cache.set('d', 'd')
+
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual([self.cache.get(key) for key in ('a', 'c', 'd')], ['a', 'c', 'd'])
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_weight_bound(self):
+        self.cache.set('small', [1, 2])
+        self.cache.set('large', list(range(9)))
+
+        self.assertIsNone(self.cache.get('small'))
+        self.assertEqual(self.cache.stats()['weight'], 9)
+
+    def test_invalidate_by_tag(self):
+        self.cache.set('missions_status_PENDING', ['m1'], tags=['missions', 'employees'])
+        self.cache.set('missions_user_u1', ['m1'], tags=['missions', 'vehicles'])
+        self.cache.set('vehicles_all', ['v1'], tags=['vehicles'])
+
+        self.assertEqual(self.cache.invalidate('employees'), 1)
+        self.assertIsNone(self.cache.get('missions_status_PENDING'))
+        self.assertEqual(self.cache.get('missions_user_u1'), ['m1'])
+
+        self.assertEqual(self.cache.invalidate('vehicles', 'missions'), 2)
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.invalidate('missions'), 0)
+
+    def load_concurrently(self, loader, threads=8, **kwargs):
+        results, errors = [], []
+
+        def worker():
+            try:
+                results.append(self.cache.get_or_load('employees_all', loader, **kwargs))
+            except Exception as e:
+                errors.append(e)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for worker_thread in workers:
+            worker_thread.start()
+        return workers, results, errors
+
+    def test_concurrent_misses_share_one_load(self):
+        release = threading.Event()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            release.wait(2)
+            return ['e1']
+
+        workers, results, errors = self.load_concurrently(loader, tags=['employees'])
+        # Every thread has either started the load or joined it
+        while self.cache.coalesced + len(calls) < len(workers):
+            threading.Event().wait(0.01)
+        release.set()
+        for worker_thread in workers:
+            worker_thread.join(2)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [['e1']] * 8)
+        self.assertEqual(errors, [])
+        self.assertEqual(self.cache.coalesced, 7)
+        self.assertEqual(self.cache.get('employees_all'), ['e1'])
+
+    def test_errors_are_not_cached(self):
+        def loader():
+            raise RuntimeError("backend down")
+
+        with self.assertRaises(RuntimeError):
+            self.cache.get_or_load('employees_all', loader)
+        self.assertIsNone(self.cache.get('employees_all'))
+        self.assertEqual(self.cache.get_or_load('employees_all', lambda: ['e1']), ['e1'])
+
+    def test_load_racing_an_invalidation_is_not_stored(self):
+        def loader():
+            # A write lands while the collection is being read
+            self.cache.invalidate('employees')
+            return ['stale']
+
+        self.assertEqual(self.cache.get_or_load('employees_all', loader, tags=['employees']), ['stale'])
+        self.assertIsNone(self.cache.get('employees_all'))
+        self.assertEqual(self.cache.get_or_load('employees_all', lambda: ['fresh'], tags=['employees']), ['fresh'])
+        self.assertEqual(self.cache.get('employees_all'), ['fresh'])
+
+    def test_stale_value_is_served_while_it_is_revalidated(self):
+        self.cache.get_or_load('tools_all', lambda: ['drill'], ttl=60, stale_ttl=600)
+        self.clock.now += 61
+
+        refreshed = threading.Event()
+        notifications = []
+
+        def on_refresh(key, value):
+            notifications.append((key, value))
+            refreshed.set()
+
+        unsubscribe = self.cache.subscribe('tools_all', on_refresh)
+        release = threading.Event()
+
+        def loader():
+            release.wait(2)
+            return ['drill', 'saw']
+
+        # Returns at once with the stale value, and only one reload starts
+        self.assertEqual(self.cache.get_or_load('tools_all', loader, ttl=60, stale_ttl=600), ['drill'])
+        self.assertEqual(self.cache.get_or_load('tools_all', loader, ttl=60, stale_ttl=600), ['drill'])
+        release.set()
+
+        self.assertTrue(refreshed.wait(2))
+        self.assertEqual(notifications, [('tools_all', ['drill', 'saw'])])
+        self.assertEqual(self.cache.get('tools_all'), ['drill', 'saw'])
+        self.assertEqual((self.cache.stale_hits, self.cache.refreshes), (2, 1))
+
+        # An unchanged reload does not notify, and past the stale window the caller waits
+        unsubscribe()
+        self.clock.now += 61
+        self.cache.get_or_load('tools_all', lambda: ['drill', 'saw'], ttl=60, stale_ttl=600)
+        while self.cache._flights:
+            threading.Event().wait(0.01)
+        self.clock.now += 700
+        self.assertEqual(self.cache.get_or_load('tools_all', lambda: ['hammer'], ttl=60, stale_ttl=600), ['hammer'])
+        self.assertEqual(len(notifications), 1)
+
+    def test_subscribers_are_weak(self):
+        calls = []
+
+        def on_refresh(key, value):
+            calls.append(value)
+
+        self.cache.subscribe('tools_all', on_refresh)
+        self.cache._notify('tools_all', ['drill'])
+        del on_refresh
+        gc.collect()
+        self.cache._notify('tools_all', ['saw'])
+
+        self.assertEqual(calls, [['drill']])
+        self.assertEqual(self.cache._subscribers['tools_all'], [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,23 +1,43 @@
+import threading
+import time
 import unittest
 from unittest.mock import MagicMock, patch
+from types import SimpleNamespace
 import db
 from datetime import datetime
 
+def make_doc(doc_id, data):
+    """Build a mock Firestore document snapshot"""
+    doc = MagicMock()
+    doc.id = doc_id
+    doc.exists = True
+    doc.to_dict.return_value = dict(data)
+    return doc
+
 class TestDatabaseManager(unittest.TestCase):
     def setUp(self):
         # Create a mock for the Firestore client
         self.mock_db_client = MagicMock()
 
-        # Patch the db.db object with our mock
-        self.original_db = db.db.db
-        db.db.db = self.mock_db_client
+        # Patch the db.db client with our mock; the patch sets the private
+        # attributes, so the lazy client property never creates a real client
+        client_patcher = patch.multiple(db.db, _client=self.mock_db_client, _client_created=True)
+        client_patcher.start()
+        self.addCleanup(client_patcher.stop)
 
         # Reset the mock for each test
         self.mock_db_client.reset_mock()
 
+        # Start every test with an empty cache
+        db.db.clear_cache()
+        db.db.invalidate_reference_data()
+
+        # Write activity logs and last logins before log_activity and login return
+        db.db.activity_logger.synchronous = True
+        db.db.last_login_writer.synchronous = True
+
     def tearDown(self):
-        # Restore the original db object
-        db.db.db = self.original_db
+        db.db.disable_mirror()
 
     def test_hash_password(self):
         password = "password123"
@@ -27,21 +47,15 @@ class TestDatabaseManager(unittest.TestCase):
         self.assertEqual(hashed, expected_hash)
 
     def test_login_success(self):
-        # Mock the query result
-        mock_stream = MagicMock()
-        mock_doc = MagicMock()
-        mock_doc.id = "user123"
-        mock_doc.to_dict.return_value = {
+        # The usernames index points at the user document
+        index_doc = make_doc("testuser", {"user_id": "user123"})
+        user_doc = make_doc("user123", {
             "username": "testuser",
             "password": db.db.hash_password("password"),
             "active": True,
             "full_name": "Test User"
-        }
-        mock_doc.exists = True
-        mock_stream.stream.return_value = [mock_doc]
-
-        # Configure the mock chain
-        self.mock_db_client.collection.return_value.where.return_value.where.return_value.where.return_value.limit.return_value = mock_stream
+        })
+        self.mock_db_client.collection.return_value.document.return_value.get.side_effect = [index_doc, user_doc]
 
         # Call the login function
         user = db.db.login("testuser", "password")
@@ -50,18 +64,58 @@ class TestDatabaseManager(unittest.TestCase):
         self.assertIsNotNone(user)
         self.assertEqual(user['username'], "testuser")
         self.assertEqual(user['id'], "user123")
+        # Two direct gets, no query
+        self.mock_db_client.collection.return_value.where.assert_not_called()
 
         # Verify last login update
         self.mock_db_client.collection.return_value.document.assert_called_with("user123")
         self.mock_db_client.collection.return_value.document.return_value.update.assert_called()
 
-    def test_login_failure_wrong_password(self):
-         # Mock the query result (empty for wrong credentials)
-        mock_stream = MagicMock()
-        mock_stream.stream.return_value = []
+    def test_login_does_not_wait_for_the_last_login_write(self):
+        index_doc = make_doc("testuser", {"user_id": "user123"})
+        user_doc = make_doc("user123", {
+            "username": "testuser", "password": db.db.hash_password("password"), "active": True
+        })
+        self.mock_db_client.collection.return_value.document.return_value.get.side_effect = [index_doc, user_doc]
+
+        # The write blocks until released
+        release = threading.Event()
+        written = threading.Event()
+        def update(data):
+            release.wait(5)
+            written.set()
+        self.mock_db_client.collection.return_value.document.return_value.update.side_effect = update
 
-        # Configure the mock chain
-        self.mock_db_client.collection.return_value.where.return_value.where.return_value.where.return_value.limit.return_value = mock_stream
+        writer = db.LastLoginWriter(db.db, batch_size=1, flush_interval=60)
+        with patch.object(db.db, 'last_login_writer', writer):
+            user = db.db.login("testuser", "password")
+
+        # Login returned while the write is still blocked
+        self.assertEqual(user['id'], "user123")
+        self.assertFalse(written.is_set())
+
+        release.set()
+        self.assertTrue(written.wait(5))
+        writer.close()
+        self.assertEqual(writer.pending_count, 0)
+        self.mock_db_client.collection.return_value.document.assert_called_with("user123")
+
+    def test_last_login_writer_skips_deleted_users(self):
+        writer = db.LastLoginWriter(db.db, synchronous=True)
+        update = self.mock_db_client.collection.return_value.document.return_value.update
+        update.side_effect = [db.google_exceptions.NotFound("deleted"), None]
+
+        self.assertTrue(writer.record('gone', {'last_login': 'a'}))
+        self.assertTrue(writer.record('user123', {'last_login': 'b'}))
+        self.assertEqual(writer.pending_count, 0)
+        update.assert_called_with({'last_login': 'b'})
+
+    def test_login_failure_wrong_password(self):
+        index_doc = make_doc("testuser", {"user_id": "user123"})
+        user_doc = make_doc("user123", {
+            "username": "testuser", "password": db.db.hash_password("password"), "active": True
+        })
+        self.mock_db_client.collection.return_value.document.return_value.get.side_effect = [index_doc, user_doc]
 
         # Call the login function
         user = db.db.login("testuser", "wrongpassword")
@@ -69,39 +123,65 @@ class TestDatabaseManager(unittest.TestCase):
         # Assertions
         self.assertIsNone(user)
 
-    def test_create_user_success(self):
-        # Mock that user doesn't exist
-        mock_stream = MagicMock()
-        mock_stream.stream.return_value = []
-        self.mock_db_client.collection.return_value.where.return_value.limit.return_value = mock_stream
+    def test_login_falls_back_to_query_for_unindexed_user(self):
+        missing = MagicMock()
+        missing.exists = False
+        self.mock_db_client.collection.return_value.document.return_value.get.return_value = missing
+        user_doc = make_doc("user123", {
+            "username": "olduser", "password": db.db.hash_password("password"), "active": True
+        })
+        self.mock_db_client.collection.return_value.where.return_value.limit.return_value.stream.return_value = [user_doc]
+
+        with patch.object(db.db, 'LEGACY_USERNAME_LOOKUP', True), \
+                patch.object(db.db, '_run_transaction') as run_transaction:
+            user = db.db.login("olduser", "password")
+
+        self.assertEqual(user['id'], "user123")
+        # Logging in never writes to the index; backfill_username_index() does
+        run_transaction.assert_not_called()
+        self.mock_db_client.collection.return_value.document.return_value.set.assert_not_called()
 
-        # Mock the add operation
-        mock_doc_ref = MagicMock()
-        self.mock_db_client.collection.return_value.add.return_value = mock_doc_ref
+    def test_create_user_success(self):
+        # Mock that the username is free
+        missing = MagicMock()
+        missing.exists = False
+        self.mock_db_client.collection.return_value.document.return_value.get.return_value = missing
+        self.mock_db_client.collection.return_value.where.return_value.limit.return_value.stream.return_value = []
 
         # Call create_user
-        result = db.db.create_user("newuser", "New User", "password", "admin", 1)
+        mock_transaction = MagicMock()
+        with patch.object(db.db, '_run_transaction', side_effect=lambda func, *args: func(mock_transaction, *args)):
+            result = db.db.create_user("newuser", "New User", "password", "admin", 1)
 
-        # Assertions
+        # Assertions: the user, its username and the stats counters are
+        # written in one transaction
         self.assertTrue(result)
-        self.mock_db_client.collection.return_value.add.assert_called()
-        args, _ = self.mock_db_client.collection.return_value.add.call_args
-        self.assertEqual(args[0]['username'], "newuser")
-        self.assertEqual(args[0]['role'], "admin")
+        self.mock_db_client.collection.assert_any_call('usernames')
+        self.mock_db_client.collection.return_value.document.assert_any_call('newuser')
+        user_args, _ = mock_transaction.set.call_args_list[0]
+        self.assertEqual(user_args[1]['username'], "newuser")
+        self.assertEqual(user_args[1]['role'], "admin")
+        index_args, _ = mock_transaction.set.call_args_list[1]
+        self.assertEqual(index_args[1], {'user_id': self.mock_db_client.collection.return_value.document.return_value.id})
+        stats_args, stats_kwargs = mock_transaction.set.call_args_list[2]
+        self.assertEqual(stats_args[1]['employees']['total'].value, 1)
+        self.assertEqual(stats_args[1]['employees']['active'].value, 1)
+        self.assertTrue(stats_kwargs['merge'])
+        self.mock_db_client.batch.return_value.commit.assert_not_called()
 
     def test_create_user_already_exists(self):
-        # Mock that user exists
-        mock_stream = MagicMock()
-        mock_doc = MagicMock()
-        mock_stream.stream.return_value = [mock_doc]
-        self.mock_db_client.collection.return_value.where.return_value.limit.return_value = mock_stream
+        # Mock that the username is taken
+        self.mock_db_client.collection.return_value.document.return_value.get.return_value = make_doc(
+            "existinguser", {"user_id": "u1"})
 
         # Call create_user
-        result = db.db.create_user("existinguser", "Existing User", "password", "admin", 1)
+        mock_transaction = MagicMock()
+        with patch.object(db.db, '_run_transaction', side_effect=lambda func, *args: func(mock_transaction, *args)):
+            result = db.db.create_user("existinguser", "Existing User", "password", "admin", 1)
 
         # Assertions
         self.assertFalse(result)
-        self.mock_db_client.collection.return_value.add.assert_not_called()
+        mock_transaction.set.assert_not_called()
 
     def test_get_all_employees(self):
         # Mock users
@@ -119,13 +199,12 @@ class TestDatabaseManager(unittest.TestCase):
         }
         mock_user2.exists = True
 
-        self.mock_db_client.collection.return_value.stream.return_value = [mock_user1, mock_user2]
-
-        # Mock departments
-        mock_dept_doc = MagicMock()
-        mock_dept_doc.exists = True
-        mock_dept_doc.to_dict.return_value = {"name": "IT"}
-        self.mock_db_client.collection.return_value.document.return_value.get.return_value = mock_dept_doc
+        # Mock departments and the reference data version document
+        collections = {'users': MagicMock(), 'departments': MagicMock(), 'metadata': MagicMock()}
+        collections['users'].stream.return_value = [mock_user1, mock_user2]
+        collections['departments'].stream.return_value = [make_doc("1", {"name": "IT"}), make_doc("2", {"name": "HR"})]
+        collections['metadata'].document.return_value.get.return_value = make_doc("reference_data", {"departments_version": 1})
+        self.mock_db_client.collection.side_effect = lambda name: collections[name]
 
         # Call function
         employees = db.db.get_all_employees()
@@ -134,8 +213,294 @@ class TestDatabaseManager(unittest.TestCase):
         self.assertEqual(len(employees), 2)
         self.assertEqual(employees[0]['name'], "User One")
         self.assertEqual(employees[0]['department'], "IT")
+        self.assertEqual(employees[1]['department'], "HR")
         self.assertEqual(employees[0]['status'], "ACTIVE")
         self.assertEqual(employees[1]['status'], "INACTIVE")
 
+        # Departments are streamed once instead of read per employee
+        collections['departments'].stream.assert_called_once()
+        collections['departments'].document.assert_not_called()
+
+    def test_department_map_reloads_on_version_change(self):
+        collections = {'departments': MagicMock(), 'metadata': MagicMock()}
+        collections['departments'].stream.return_value = [make_doc("1", {"name": "logistics"})]
+        meta_get = collections['metadata'].document.return_value.get
+        meta_get.return_value = make_doc("reference_data", {"departments_version": 1})
+        self.mock_db_client.collection.side_effect = lambda name: collections[name]
+
+        self.assertEqual(db.db.get_department_name("1"), "logistics")
+        # Within the check interval the map is served from memory
+        self.assertEqual(db.db.get_department_name(1), "logistics")
+        self.assertEqual(collections['departments'].stream.call_count, 1)
+        self.assertEqual(meta_get.call_count, 1)
+
+        # Unchanged version: only the metadata document is read
+        db.db._reference_checked_at['departments'] = None
+        db.db.get_department_map()
+        self.assertEqual(collections['departments'].stream.call_count, 1)
+
+        # New version: departments are reloaded
+        db.db._reference_checked_at['departments'] = None
+        meta_get.return_value = make_doc("reference_data", {"departments_version": 2})
+        collections['departments'].stream.return_value = [make_doc("1", {"name": "logistique"})]
+        self.assertEqual(db.db.get_department_name("1"), "logistique")
+        self.assertEqual(collections['departments'].stream.call_count, 2)
+
+    def test_get_all_missions_with_details_bulk_fetch(self):
+        records = {
+            'users': {
+                'u1': {'full_name': 'User One', 'role': 'technician', 'phone': '111'},
+                'u2': {'full_name': 'User Two', 'role': 'team_leader', 'phone': '222'},
+            },
+            'vehicles': {'v1': {'model': 'Hilux', 'plate_number': 'AB-123'}},
+            'tools': {'t1': {'name': 'Drill', 'category': 'Power', 'condition': 'Good'}},
+        }
+        missions = [
+            make_doc('m1', {'assigned_team': ['u1', 'u2'], 'team_leader_id': 'u2',
+                            'vehicle_id': 'v1', 'required_tools': ['t1', 'missing']}),
+            make_doc('m2', {'assigned_team': ['u1'], 'vehicle_id': 'v1', 'required_tools': ['t1']}),
+        ]
+
+        # Each collection hands out document references keyed by (collection, id)
+        collections = {}
+        document_refs = []
+        def document(name, doc_id):
+            doc_ref = MagicMock()
+            doc_ref.key = (name, doc_id)
+            document_refs.append(doc_ref)
+            return doc_ref
+        def collection(name):
+            if name not in collections:
+                collection_ref = MagicMock()
+                collection_ref.document.side_effect = lambda doc_id, name=name: document(name, doc_id)
+                collection_ref.order_by.return_value.stream.return_value = missions
+                collections[name] = collection_ref
+            return collections[name]
+        self.mock_db_client.collection.side_effect = collection
+
+        def get_all(refs):
+            return [make_doc(doc_id, records[name][doc_id])
+                    for name, doc_id in (ref.key for ref in refs) if doc_id in records[name]]
+        self.mock_db_client.get_all.side_effect = get_all
+
+        result = db.get_all_missions_with_details()
+
+        # One bulk read per referenced collection, each with distinct IDs only
+        self.assertEqual(self.mock_db_client.get_all.call_count, 3)
+        requested = [[ref.key for ref in call.args[0]] for call in self.mock_db_client.get_all.call_args_list]
+        self.assertIn([('users', 'u1'), ('users', 'u2')], requested)
+        self.assertIn([('vehicles', 'v1')], requested)
+        # No document was read on its own
+        self.assertTrue(document_refs)
+        for doc_ref in document_refs:
+            doc_ref.get.assert_not_called()
+
+        self.assertEqual([m['name'] for m in result[0]['team_members']], ['User One', 'User Two'])
+        self.assertEqual(result[0]['team_leader']['name'], 'User Two')
+        self.assertEqual(result[0]['team_leader']['status'], 'Leading')
+        self.assertEqual(result[1]['vehicle'], {'model': 'Hilux', 'plate_number': 'AB-123'})
+        self.assertEqual(result[0]['tools'], [{'name': 'Drill', 'type': 'Power', 'condition': 'Good'}])
+
+    def test_rebuild_stats_uses_aggregation(self):
+        def aggregation(**values):
+            aggregation_query = MagicMock()
+            aggregation_query.sum.return_value = aggregation_query
+            aggregation_query.get.return_value = [[MagicMock(alias=alias, value=value) for alias, value in values.items()]]
+            return aggregation_query
+
+        collections = {name: MagicMock() for name in ['users', 'missions', 'vehicles', 'tools', 'stats']}
+        collections['users'].count.return_value = aggregation(count=10)
+        collections['users'].where.return_value.count.return_value = aggregation(count=7)
+        # Users stored before `active` was always a bool
+        collections['users'].where.return_value.stream.return_value = [
+            make_doc('u8', {'active': 1}), make_doc('u9', {'active': 0})]
+        collections['missions'].count.return_value = aggregation(count=9)
+        collections['missions'].where.return_value.count.return_value = aggregation(count=2)
+        collections['vehicles'].count.return_value = aggregation(count=4)
+        collections['vehicles'].where.return_value.count.return_value = aggregation(count=1)
+        collections['tools'].count.return_value = aggregation(count=3, total_quantity=20, available_quantity=15)
+        self.mock_db_client.collection.side_effect = lambda name: collections[name]
+
+        stats = db.db.rebuild_stats()
+
+        self.assertEqual(stats['employees'], {'total': 10, 'active': 8})
+        self.assertEqual(stats['missions'], {'total': 9, 'PENDING': 2, 'IN_PROGRESS': 2, 'COMPLETED': 2, 'CANCELLED': 2})
+        self.assertEqual(stats['vehicles'], {'total': 4, 'AVAILABLE': 1, 'IN_USE': 1, 'MAINTENANCE': 1, 'OUT_OF_SERVICE': 1})
+        self.assertEqual(stats['tools'], {'total_quantity': 20, 'available_quantity': 15})
+        collections['stats'].document.return_value.set.assert_called_once_with(stats)
+        for collection_ref in collections.values():
+            collection_ref.stream.assert_not_called()
+
+    def test_get_dashboard_stats_reads_stats_document(self):
+        stats_doc = make_doc('dashboard', {
+            'employees': {'total': 10, 'active': 7},
+            'missions': {'total': 9, 'PENDING': 3, 'IN_PROGRESS': 1, 'COMPLETED': 4},
+            'vehicles': {'total': 4, 'AVAILABLE': 2, 'IN_USE': 1},
+            'tools': {'total_quantity': 20, 'available_quantity': 15}
+        })
+        self.mock_db_client.collection.return_value.document.return_value.get.return_value = stats_doc
+
+        stats = db.db.get_dashboard_stats()
+
+        self.assertEqual(stats['employees'], {'total': 10, 'active': 7, 'on_leave': 3})
+        self.assertEqual(stats['projects'], {'total': 9, 'active': 4, 'completed': 4})
+        self.assertEqual(stats['vehicles'], {'total': 4, 'available': 2, 'in_use': 1})
+        self.assertEqual(stats['equipment'], {'total': 20, 'operational': 15, 'maintenance': 5})
+        self.mock_db_client.collection.assert_called_once_with('stats')
+        self.mock_db_client.collection.return_value.count.assert_not_called()
+
+    def test_tool_adjustments_without_changes_read_nothing(self):
+        mock_transaction = MagicMock()
+        with patch.object(db.db, '_run_transaction', side_effect=lambda func, *args: func(mock_transaction, *args)):
+            self.assertTrue(db.db.adjust_tool_quantities({'t1': 0}))
+
+        # No batch get of zero documents, and nothing written but the stats
+        mock_transaction.get_all.assert_not_called()
+        mock_transaction.update.assert_not_called()
+
+    def test_update_vehicle_status_moves_stats_counters(self):
+        vehicle_doc = make_doc('v1', {'status': 'AVAILABLE'})
+        self.mock_db_client.collection.return_value.document.return_value.get.return_value = vehicle_doc
+
+        mock_transaction = MagicMock()
+        with patch.object(db.db, '_run_transaction', side_effect=lambda func, *args: func(mock_transaction, *args)):
+            result = db.db.update_vehicle_status('v1', 'IN_USE')
+
+        self.assertTrue(result)
+        # The status is read in the transaction the counters are moved in
+        self.mock_db_client.collection.return_value.document.return_value.get.assert_called_with(
+            transaction=mock_transaction)
+        stats_args, _ = mock_transaction.set.call_args
+        self.assertEqual(stats_args[1]['vehicles']['AVAILABLE'].value, -1)
+        self.assertEqual(stats_args[1]['vehicles']['IN_USE'].value, 1)
+        self.assertNotIn('total', stats_args[1]['vehicles'])
+        self.mock_db_client.batch.return_value.commit.assert_not_called()
+
+    def test_mission_status_counts_fall_back_without_aggregation(self):
+        missions = [make_doc(f"m{i}", {'status': status}) for i, status in
+                    enumerate(['PENDING', 'PENDING', 'IN_PROGRESS', 'COMPLETED', 'CANCELLED'])]
+        missions_ref = MagicMock()
+        missions_ref.count.side_effect = AttributeError("count")
+        missions_ref.stream.return_value = missions
+        missions_ref.where.side_effect = lambda field, op, value: MagicMock(
+            count=MagicMock(side_effect=AttributeError("count")),
+            stream=MagicMock(return_value=[m for m in missions if m.to_dict()['status'] == value]))
+        self.mock_db_client.collection.return_value = missions_ref
+
+        stats = db.db.get_mission_status_counts()
+
+        self.assertEqual(stats, {'total': 5, 'pending': 2, 'in_progress': 1, 'completed': 1, 'cancelled': 1})
+
+    def test_mirror_serves_reads_from_snapshot_changes(self):
+        listeners = {}
+        def collection(name):
+            collection_ref = MagicMock()
+            collection_ref.on_snapshot.side_effect = lambda callback: listeners.setdefault(name, callback)
+            return collection_ref
+        self.mock_db_client.collection.side_effect = collection
+
+        def change(change_type, doc_id, data):
+            return SimpleNamespace(type=SimpleNamespace(name=change_type), document=make_doc(doc_id, data))
+
+        # Nothing is served from the mirror before the initial sync
+        self.assertFalse(db.db.enable_mirror(timeout=0))
+        self.assertIsNone(db.db._mirror_documents('vehicles'))
+
+        for name, callback in listeners.items():
+            callback([], [], None)
+        listeners['vehicles']([], [change('ADDED', 'v1', {'model': 'Hilux'}),
+                                   change('ADDED', 'v2', {'model': 'Ranger'})], None)
+        db.db._set_cached('vehicles_all', [{'id': 'stale'}])
+        listeners['vehicles']([], [change('MODIFIED', 'v1', {'model': 'Hilux 2'}),
+                                   change('REMOVED', 'v2', {})], None)
+
+        vehicles = db.db.get_all_vehicles()
+
+        self.assertEqual(vehicles, [{'model': 'Hilux 2', 'id': 'v1'}])
+        self.assertTrue(db.db.enable_mirror(timeout=0))
+        self.assertEqual(set(listeners), {'users', 'vehicles', 'tools', 'missions'})
+        self.assertEqual(self.mock_db_client.collection.call_count, 4)
+
+    def test_activity_logger_batches_entries(self):
+        logger = db.ActivityLogger(db.db, batch_size=3, flush_interval=60)
+        mock_batch = self.mock_db_client.batch.return_value
+
+        # Below the batch size nothing is written until a flush
+        logger.log({'activity_type': 'a'})
+        logger.log({'activity_type': 'b'})
+        self.mock_db_client.batch.assert_not_called()
+        self.assertEqual(logger.pending_count, 2)
+
+        # Reaching the batch size wakes the background writer
+        logger.log({'activity_type': 'c'})
+        deadline = time.monotonic() + 2
+        while mock_batch.commit.call_count == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        mock_batch.commit.assert_called_once()
+        self.assertEqual([call.args[1]['activity_type'] for call in mock_batch.set.call_args_list], ['a', 'b', 'c'])
+
+        # Shutdown writes whatever is left
+        logger.log({'activity_type': 'd'})
+        logger.close()
+        self.assertEqual(mock_batch.commit.call_count, 2)
+        self.assertEqual(logger.pending_count, 0)
+
+    def test_activity_logger_keeps_entries_when_write_fails(self):
+        logger = db.ActivityLogger(db.db, synchronous=True)
+        self.mock_db_client.batch.return_value.commit.side_effect = Exception("unavailable")
+
+        self.assertFalse(logger.log({'activity_type': 'a'}))
+        self.assertEqual(logger.pending_count, 1)
+
+        self.mock_db_client.batch.return_value.commit.side_effect = None
+        self.assertTrue(logger.flush())
+        self.assertEqual(logger.pending_count, 0)
+
+    def test_log_activity_is_queued(self):
+        db.db.activity_logger.synchronous = False
+        with patch.object(db.db.activity_logger, '_ensure_worker'):
+            self.assertTrue(db.db.log_activity('tool_created', {'tool_name': 'Drill'}, 'u1'))
+        self.mock_db_client.collection.return_value.add.assert_not_called()
+        self.assertEqual(db.db.activity_logger.pending_count, 1)
+
+        db.flush_activity_log()
+        record = self.mock_db_client.batch.return_value.set.call_args.args[1]
+        self.assertEqual((record['activity_type'], record['user_id']), ('tool_created', 'u1'))
+
+    def test_per_query_mission_results_are_cached_until_a_mission_write(self):
+        mock_doc = MagicMock()
+        mock_doc.id = "m1"
+        mock_doc.to_dict.return_value = {"title": "Fiber install", "status": "PENDING"}
+        query = self.mock_db_client.collection.return_value.where.return_value.order_by.return_value
+        query.stream.return_value = [mock_doc]
+
+        self.assertEqual(db.get_missions_by_status("PENDING")[0]['id'], "m1")
+        self.assertEqual(db.get_missions_by_status("PENDING")[0]['id'], "m1")
+        self.assertEqual(query.stream.call_count, 1)
+
+        # Unrelated writes leave the result cached, mission writes drop it
+        db.db._invalidate_cache('tools')
+        db.get_missions_by_status("PENDING")
+        self.assertEqual(query.stream.call_count, 1)
+
+        db.update_mission("m1", {"title": "Fiber install 2"})
+        db.get_missions_by_status("PENDING")
+        self.assertEqual(query.stream.call_count, 2)
+        self.assertGreaterEqual(db.get_cache_stats()['hits'], 2)
+
+    def test_client_and_default_data_are_created_on_first_use(self):
+        client = MagicMock()
+        client.collection.return_value.limit.return_value.stream.return_value = []
+        with patch.object(db, 'create_client', return_value=client) as create_client:
+            manager = db.DatabaseManager()
+            create_client.assert_not_called()
+            client.collection.assert_not_called()
+
+            manager.get_department_map()
+            manager.get_department_map(force_refresh=True)
+            create_client.assert_called_once()
+            # The default departments were seeded once, by the first load
+            self.assertEqual(client.collection.return_value.limit.call_count, 1)
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import ANY, MagicMock, patch
 import db
 
 class TestDeleteFunctions(unittest.TestCase):
@@ -7,16 +7,19 @@ class TestDeleteFunctions(unittest.TestCase):
         # Create a mock for the Firestore client
         self.mock_db_client = MagicMock()
 
-        # Patch the db.db object with our mock
-        self.original_db = db.db.db
-        db.db.db = self.mock_db_client
+        # Patch the db.db client with our mock; the patch sets the private
+        # attributes, so the lazy client property never creates a real client
+        client_patcher = patch.multiple(db.db, _client=self.mock_db_client, _client_created=True)
+        client_patcher.start()
+        self.addCleanup(client_patcher.stop)
 
         # Reset the mock for each test
         self.mock_db_client.reset_mock()
 
-    def tearDown(self):
-        # Restore the original db object
-        db.db.db = self.original_db
+    def mock_transaction(self):
+        """Run db transactions against a mock transaction; returns (patcher, transaction)"""
+        transaction = MagicMock()
+        return patch.object(db.db, '_run_transaction', side_effect=lambda func, *args: func(transaction, *args)), transaction
 
     def test_delete_vehicle_available(self):
         # Mock vehicle doc
@@ -26,10 +29,15 @@ class TestDeleteFunctions(unittest.TestCase):
 
         self.mock_db_client.collection.return_value.document.return_value.get.return_value = mock_doc
 
-        result = db.delete_vehicle("v1")
+        patcher, transaction = self.mock_transaction()
+        with patcher:
+            result = db.delete_vehicle("v1")
 
         self.assertTrue(result)
-        self.mock_db_client.collection.return_value.document.return_value.delete.assert_called()
+        # Read and deleted in one transaction, with the stats update
+        self.mock_db_client.collection.return_value.document.return_value.get.assert_called_with(transaction=transaction)
+        transaction.delete.assert_called_with(self.mock_db_client.collection.return_value.document.return_value)
+        self.mock_db_client.batch.return_value.commit.assert_not_called()
 
     def test_delete_vehicle_in_use(self):
         # Mock vehicle doc
@@ -39,10 +47,12 @@ class TestDeleteFunctions(unittest.TestCase):
 
         self.mock_db_client.collection.return_value.document.return_value.get.return_value = mock_doc
 
-        result = db.delete_vehicle("v1")
+        patcher, transaction = self.mock_transaction()
+        with patcher:
+            result = db.delete_vehicle("v1")
 
         self.assertFalse(result)
-        self.mock_db_client.collection.return_value.document.return_value.delete.assert_not_called()
+        transaction.delete.assert_not_called()
 
     def test_delete_tool_unused(self):
         # Mock tool doc
@@ -52,10 +62,15 @@ class TestDeleteFunctions(unittest.TestCase):
 
         self.mock_db_client.collection.return_value.document.return_value.get.return_value = mock_doc
 
-        result = db.delete_tool("t1")
+        patcher, transaction = self.mock_transaction()
+        with patcher:
+            result = db.delete_tool("t1")
 
         self.assertTrue(result)
-        self.mock_db_client.collection.return_value.document.return_value.delete.assert_called()
+        # Read and deleted in one transaction, with the stats update
+        self.mock_db_client.collection.return_value.document.return_value.get.assert_called_with(transaction=transaction)
+        transaction.delete.assert_called_with(self.mock_db_client.collection.return_value.document.return_value)
+        self.mock_db_client.batch.return_value.commit.assert_not_called()
 
     def test_delete_tool_in_use(self):
         # Mock tool doc
@@ -65,39 +80,62 @@ class TestDeleteFunctions(unittest.TestCase):
 
         self.mock_db_client.collection.return_value.document.return_value.get.return_value = mock_doc
 
-        result = db.delete_tool("t1")
+        patcher, transaction = self.mock_transaction()
+        with patcher:
+            result = db.delete_tool("t1")
 
         self.assertFalse(result)
-        self.mock_db_client.collection.return_value.document.return_value.delete.assert_not_called()
+        transaction.delete.assert_not_called()
 
     def test_delete_employee(self):
-        result = db.delete_employee("u1")
+        # The same mock document serves as the user and its username entry
+        mock_doc = MagicMock()
+        mock_doc.exists = True
+        mock_doc.to_dict.return_value = {"username": "jdoe", "active": True, "user_id": "u1"}
+        self.mock_db_client.collection.return_value.document.return_value.get.return_value = mock_doc
+
+        mock_transaction = MagicMock()
+        with patch.object(db.db, '_run_transaction', side_effect=lambda func, *args: func(mock_transaction, *args)):
+            result = db.delete_employee("u1")
 
         self.assertTrue(result)
-        self.mock_db_client.collection.return_value.document.assert_called_with("u1")
-        # Should now call delete instead of update
-        self.mock_db_client.collection.return_value.document.return_value.delete.assert_called()
+        self.mock_db_client.collection.return_value.document.assert_any_call("u1")
+        self.mock_db_client.collection.return_value.document.assert_any_call("jdoe")
+        # Should now call delete instead of update, for the user and its
+        # username, in one transaction with the stats update
+        doc_ref = self.mock_db_client.collection.return_value.document.return_value
+        self.assertEqual(mock_transaction.delete.call_args_list, [((doc_ref,),), ((doc_ref,),)])
+        self.mock_db_client.batch.return_value.commit.assert_not_called()
 
     def test_delete_mission(self):
-        # Mock mission resources release logic - complex to test thoroughly without mocking sub-calls,
-        # but we can verify delete is called on the document
-
-        # We need to mock _release_mission_resources or its internal calls if we want to isolate it,
-        # but here we mainly care that db.collection(...).document(...).delete() is called.
+        # Run the lifecycle transaction against a mock transaction so we can
+        # verify the delete happens inside it, together with the release
 
-        # Mock get for release resources
         mock_doc = MagicMock()
         mock_doc.exists = True
-        mock_doc.to_dict.return_value = {"vehicle_id": "v1"}
+        mock_doc.to_dict.return_value = {"vehicle_id": "v1", "status": "IN_PROGRESS"}
         self.mock_db_client.collection.return_value.document.return_value.get.return_value = mock_doc
 
-        result = db.delete_mission("m1")
+        mock_transaction = MagicMock()
+        mock_transaction.get.return_value = []
+        mock_transaction.get_all.return_value = [mock_doc]
+        with patch.object(db.db, '_run_transaction', side_effect=lambda func, *args: func(mock_transaction, *args)):
+            result = db.delete_mission("m1")
 
         self.assertTrue(result)
-        # Verify delete was called on the mission document
-        # Note: Depending on how mocks are reused, we might need specific assert.
-        # Since _release_mission_resources does other calls, we just want to ensure delete() happened eventually.
-        self.mock_db_client.collection.return_value.document.return_value.delete.assert_called()
+        mission_ref = self.mock_db_client.collection.return_value.document.return_value
+        mission_ref.get.assert_called_with(transaction=mock_transaction)
+        mock_transaction.delete.assert_called_once_with(mission_ref)
+        # The vehicle was released in the same transaction
+        mock_transaction.update.assert_any_call(mock_doc.reference, {'status': 'AVAILABLE', 'last_updated': ANY,
+                                                                     'sync_at': db.firestore.SERVER_TIMESTAMP})
+        # and its deletion recorded for delta sync
+        mock_transaction.set.assert_any_call(
+            self.mock_db_client.collection.return_value.document.return_value,
+            {'collection': 'missions', 'doc_id': ANY, 'sync_at': db.firestore.SERVER_TIMESTAMP, 'expire_at': ANY})
+        # Nothing was written outside of it
+        mission_ref.delete.assert_not_called()
+        self.mock_db_client.batch.return_value.commit.assert_not_called()
 
 if __name__ == '__main__':
     unittest.main()
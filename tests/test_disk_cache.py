@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock
+from cache import TTLCache
+from disk_cache import DiskCache
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.db')
+        self.disk = DiskCache(self.path, version=1)
+
+    def tearDown(self):
+        self.disk.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_round_trip_and_tag_invalidation(self):
+        created = datetime(2024, 5, 1, 8, 30)
+        self.disk.set('tools_all', [{'name': 'Drill', 'created_at': created}], ['tools'])
+        self.disk.set('employees_all', [{'full_name': 'Ana'}], ['employees'])
+
+        value, stored_at = self.disk.get('tools_all')
+        self.assertEqual(value, [{'name': 'Drill', 'created_at': created}])
+        self.assertAlmostEqual(stored_at, time.time(), delta=5)
+
+        self.disk.invalidate('tools')
+        self.assertIsNone(self.disk.get('tools_all'))
+        self.assertIsNotNone(self.disk.get('employees_all'))
+
+    def test_ignores_entries_written_by_another_version(self):
+        self.disk.set('tools_all', [{'name': 'Drill'}], ['tools'])
+        newer = DiskCache(self.path, version=2)
+        try:
+            self.assertIsNone(newer.get('tools_all'))
+        finally:
+            newer.close()
+
+    def test_new_cache_serves_from_disk_and_revalidates(self):
+        first = TTLCache(default_ttl=60)
+        first.backing = self.disk
+        self.assertEqual(first.get_or_load('tools_all', lambda: ['old'], tags=['tools'],
+                                           stale_ttl=3600, persist=True), ['old'])
+
+        # A restarted app: fresh memory tier, the same file, data stored long ago
+        self.disk.set('tools_all', ['old'], ['tools'], stored_at=time.time() - 120)
+        second = TTLCache(default_ttl=60)
+        second.backing = self.disk
+        refreshed = []
+        callback = lambda key, value: refreshed.append(value)
+        second.subscribe('tools_all', callback)
+
+        value = second.get_or_load('tools_all', lambda: ['new'], tags=['tools'], stale_ttl=3600, persist=True)
+        self.assertEqual(value, ['old'])
+        # The refresh writes the file before it notifies subscribers
+        deadline = time.time() + 2
+        while not refreshed and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(refreshed, [['new']])
+        self.assertEqual(second.stats()['disk_hits'], 1)
+        self.assertEqual(self.disk.get('tools_all')[0], ['new'])
+
+        second.invalidate('tools')
+        # Not read back while the invalidation waits for the background thread
+        self.assertEqual(second.get_or_load('tools_all', lambda: None, tags=['tools'], persist=True), None)
+        self.assertTrue(second.flush_backing())
+        self.assertIsNone(self.disk.get('tools_all'))
+
+    def test_invalidate_leaves_the_disk_to_the_background_thread(self):
+        cache = TTLCache(default_ttl=60)
+        cache.backing = MagicMock()
+        invalidated = threading.Event()
+        callers = []
+        def invalidate(*tags):
+            callers.append((threading.current_thread(), tags))
+            invalidated.set()
+        cache.backing.invalidate.side_effect = invalidate
+
+        cache.invalidate('tools', 'dashboard')
+
+        self.assertTrue(invalidated.wait(2))
+        thread, tags = callers[0]
+        self.assertIsNot(thread, threading.current_thread())
+        self.assertEqual(set(tags), {'tools', 'dashboard'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import threading
+import unittest
+
+from views.mission_pages import MissionPages
+
+
+class TestMissionPages(unittest.TestCase):
+    def setUp(self):
+        # Missions m0..m4 of every status; the cursor is the next index
+        self.fetches = []
+        self.release = None
+        self.pages = MissionPages(self.fetch_page, page_size=2)
+
+    def fetch_page(self, page_size, start_after, status):
+        self.fetches.append((start_after, status))
+        if self.release is not None and start_after is not None:
+            self.fetch_started.set()
+            self.release.wait(5)
+        start = start_after or 0
+        missions = [{'id': f'{status or "all"}-{index}', 'status': status}
+                    for index in range(start, min(start + page_size, 5))]
+        cursor = start + page_size if start + page_size < 5 else None
+        return missions, cursor
+
+    def ids(self):
+        return [mission['id'] for mission in self.pages.missions]
+
+    def test_pages_are_appended_until_the_last(self):
+        self.pages.reload()
+        self.assertTrue(self.pages.load_next())
+        self.assertTrue(self.pages.load_next())
+
+        self.assertEqual(self.ids(), ['all-0', 'all-1', 'all-2', 'all-3', 'all-4'])
+        self.assertFalse(self.pages.has_more)
+        self.assertFalse(self.pages.load_next())
+
+    def test_reload_during_a_fetch_drops_the_old_page(self):
+        self.pages.reload()
+        self.release, self.fetch_started = threading.Event(), threading.Event()
+        results = []
+        loader = threading.Thread(target=lambda: results.append(self.pages.load_next()))
+        loader.start()
+        self.assertTrue(self.fetch_started.wait(5))
+
+        # The filter changes while the next "all" page is in flight
+        self.assertTrue(self.pages.reload('PENDING'))
+        self.release.set()
+        loader.join(5)
+
+        self.assertEqual(results, [False])
+        self.assertEqual(self.ids(), ['PENDING-0', 'PENDING-1'])
+        self.assertEqual(self.pages.cursor, 2)
+        self.assertFalse(self.pages.loading)
+
+    def test_patch_keeps_the_loaded_pages(self):
+        self.pages.reload('PENDING')
+        self.pages.load_next()
+        cursor = self.pages.cursor
+
+        self.assertTrue(self.pages.patch('PENDING-1', {'title': 'Renamed'}))
+        self.assertEqual(self.pages.missions[1], {'id': 'PENDING-1', 'status': 'PENDING', 'title': 'Renamed'})
+        # Left the filter, or deleted: dropped in place
+        self.assertTrue(self.pages.patch('PENDING-0', {'status': 'COMPLETED'}))
+        self.assertTrue(self.pages.patch('PENDING-3', None))
+
+        self.assertEqual(self.ids(), ['PENDING-1', 'PENDING-2'])
+        self.assertEqual(self.pages.cursor, cursor)
+        self.assertEqual(self.fetches, [(None, 'PENDING'), (2, 'PENDING')])
+        self.assertFalse(self.pages.patch('missing', {'status': 'COMPLETED'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
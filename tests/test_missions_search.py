@@ -0,0 +1,57 @@
+import unittest
+from unittest.mock import patch
+
+import backends
+import db
+from db import DatabaseManager
+from views.missions_view import find_missions
+
+
+class TestFindMissions(unittest.TestCase):
+    def setUp(self):
+        self.manager = DatabaseManager(backends.MemoryClient())
+        missions_ref = self.manager.db.collection('missions')
+        for index in range(25):
+            missions_ref.document(f'm{index:02d}').set({
+                'title': f'Survey {index:02d}' if index else 'Fiber install',
+                'status': 'PENDING' if index % 2 else 'COMPLETED',
+                'created_at': f'2024-01-01T08:{index:02d}:00'
+            })
+        self.patcher = patch.object(db, 'db', self.manager)
+        self.patcher.start()
+        self.first_page, _ = db.get_missions_page(20)
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def ids(self, missions):
+        return [mission['id'] for mission in missions]
+
+    def test_query_finds_missions_beyond_the_loaded_pages(self):
+        # The oldest mission is not on the first page
+        self.assertNotIn('m00', self.ids(self.first_page))
+
+        self.assertEqual(self.ids(find_missions(self.first_page, "All", "fiber")), ['m00'])
+        self.assertEqual(self.ids(find_missions(self.first_page, "All", "m00")), ['m00'])
+        self.assertEqual(find_missions(self.first_page, "Pending", "fiber"), [])
+
+    def test_results_are_ranked_limited_and_carry_details(self):
+        self.manager.db.collection('vehicles').document('v1').set({'model': 'Hilux', 'plate_number': 'AB-1'})
+        self.manager.db.collection('missions').document('m00').update({'vehicle_id': 'v1'})
+
+        with patch('views.missions_view.SEARCH_RESULT_LIMIT', 3):
+            surveys = find_missions(self.first_page, "Pending", "survey")
+        self.assertEqual(len(surveys), 3)
+        self.assertTrue(all(mission['status'] == 'PENDING' for mission in surveys))
+
+        fiber = find_missions(self.first_page, "All", "fiber")[0]
+        self.assertEqual(fiber['vehicle']['model'], 'Hilux')
+
+    def test_empty_query_filters_the_loaded_pages(self):
+        self.assertEqual(find_missions(self.first_page, "All", "  "), self.first_page)
+        self.assertTrue(all(mission['status'] == 'PENDING'
+                            for mission in find_missions(self.first_page, "Pending", "")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import threading
+import unittest
+from views.search_controller import SearchController
+
+class TestSearchController(unittest.TestCase):
+    def test_debounces_to_latest_query(self):
+        computed = []
+        applied = []
+        done = threading.Event()
+
+        def compute(text):
+            computed.append(text)
+            return text.upper()
+
+        def apply(result):
+            applied.append(result)
+            done.set()
+
+        search = SearchController(compute, apply, delay=0.05)
+        for text in ("p", "pu", "pum", "pump"):
+            search.submit(text)
+
+        self.assertTrue(done.wait(2))
+        self.assertEqual(computed, ["pump"])
+        self.assertEqual(applied, ["PUMP"])
+
+    def test_drops_result_superseded_while_computing(self):
+        applied = []
+        started = threading.Event()
+        release = threading.Event()
+        done = threading.Event()
+
+        def compute(text):
+            if text == "slow":
+                started.set()
+                release.wait(2)
+            return text
+
+        def apply(result):
+            applied.append(result)
+            done.set()
+
+        search = SearchController(compute, apply, delay=0)
+        search.submit("slow")
+        self.assertTrue(started.wait(2))
+        search.submit("fast")
+        self.assertTrue(done.wait(2))
+        release.set()
+
+        # Give the slow query a chance to finish; its result must be dropped
+        search._timer and search._timer.join(1)
+        threading.Event().wait(0.1)
+        self.assertEqual(applied, ["fast"])
+
+    def test_cancel_drops_pending_query(self):
+        applied = []
+        search = SearchController(lambda text: text, applied.append, delay=0.05)
+        search.submit("drill")
+        search.cancel()
+
+        threading.Event().wait(0.15)
+        self.assertEqual(applied, [])
+
+    def test_run_now_replaces_pending_query(self):
+        applied = []
+        search = SearchController(lambda text: text, applied.append, delay=0.05)
+        search.submit("drill")
+        search.run_now("saw")
+        self.assertEqual(applied, ["saw"])
+
+        threading.Event().wait(0.15)
+        self.assertEqual(applied, ["saw"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+from search_index import MissionSearchIndex
+
+class TestMissionSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = MissionSearchIndex()
+        self.index.build([
+            {'id': 'm1', 'title': 'Fiber install', 'location': 'Rabat', 'description': 'Pull cable to tower',
+             'assigned_person_id': 'u1', 'created_at': '2024-01-01'},
+            {'id': 'm2', 'title': 'Tower maintenance', 'location': 'Casablanca', 'description': 'Replace fiber splice',
+             'created_at': '2024-01-02'},
+            {'id': 'm3', 'title': 'Router swap', 'location': 'Fes', 'created_at': '2024-01-03'}
+        ], {'u1': 'Amina Haddad'})
+
+    def ids(self, query, limit=None):
+        return [mission['id'] for mission in self.index.search(query, limit)]
+
+    def test_ranks_title_matches_first(self):
+        self.assertEqual(self.ids('fiber'), ['m1', 'm2'])
+        self.assertEqual(self.ids('tower'), ['m2', 'm1'])
+        self.assertEqual(self.ids('tower', limit=1), ['m2'])
+
+    def test_prefix_infix_and_all_terms(self):
+        self.assertEqual(self.ids('cas'), ['m2'])
+        self.assertEqual(self.ids('blanca'), ['m2'])
+        self.assertEqual(self.ids('fib rab'), ['m1'])
+        self.assertEqual(self.ids('fiber fes'), [])
+        self.assertEqual(self.ids('M3'), ['m3'])
+        self.assertEqual(self.ids('  '), [])
+
+    def test_incremental_updates(self):
+        self.assertEqual(self.index.search('haddad')[0]['assigned_user'], {'full_name': 'Amina Haddad'})
+
+        self.index.set_name('u1', 'Amina Benali')
+        self.assertEqual(self.ids('haddad'), [])
+        self.assertEqual(self.ids('benali'), ['m1'])
+
+        self.index.update('m3', {'title': 'Antenna alignment'})
+        self.assertEqual(self.ids('router'), [])
+        self.assertEqual(self.ids('ante'), ['m3'])
+
+        self.index.remove('m2')
+        self.assertEqual(self.ids('tower'), ['m1'])
+        self.assertEqual(self.ids('casablanca'), [])
+        self.assertNotIn('casablanca', self.index._vocabulary)
+        self.assertEqual(len(self.index), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import os
+import tempfile
+import unittest
+
+from sessions import SessionSigner, load_session_key
+
+
+class TestSessionSigner(unittest.TestCase):
+    def setUp(self):
+        self.signer = SessionSigner(b'k' * 32, lifetime=60)
+        self.user = {'id': 'u1', 'username': 'jdoe', 'full_name': 'John Doe', 'active': True,
+                     'password': 'hash', 'created_at': '2024-01-01'}
+
+    def test_round_trip_keeps_the_profile_only(self):
+        token = self.signer.issue(self.user, now=1000)
+
+        self.assertEqual(self.signer.verify(token, now=1030),
+                         {'id': 'u1', 'username': 'jdoe', 'full_name': 'John Doe', 'active': True})
+
+    def test_rejects_expired_forged_and_malformed_tokens(self):
+        token = self.signer.issue(self.user, now=1000)
+        body, signature = token.split('.')
+
+        self.assertIsNone(self.signer.verify(token, now=1060))
+        self.assertIsNone(SessionSigner(b'x' * 32).verify(token, now=1030))
+        forged = SessionSigner(b'x' * 32, lifetime=60).issue(dict(self.user, role='Administrator'), now=1000)
+        self.assertIsNone(self.signer.verify(f"{forged.split('.')[0]}.{signature}", now=1030))
+        self.assertIsNone(self.signer.verify('garbage', now=1030))
+        self.assertIsNone(self.signer.verify(None, now=1030))
+
+    def test_key_is_created_once(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'data', 'session.key')
+            key = load_session_key(path)
+
+            self.assertEqual(len(key), 32)
+            self.assertEqual(load_session_key(path), key)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import gc
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from cache import TTLCache
+from views.registry import ViewRegistry, list_view_hooks
+
+
+class TestViewRegistry(unittest.TestCase):
+    def setUp(self):
+        sys.modules.pop('json.tool', None)
+        self.routes = ViewRegistry(prewarm_delay=0)
+        # Any importable module works; json.tool is not imported by the app
+        self.routes.register('/tool', 'json.tool', lambda view, *args: (view, args), function_name='main')
+
+    def test_module_is_imported_on_first_build(self):
+        self.assertFalse(self.routes.is_loaded('/tool'))
+        self.assertNotIn('json.tool', sys.modules)
+
+        view, args = self.routes.build('/tool', 'employee-1')
+
+        self.assertIs(view, sys.modules['json.tool'].main)
+        self.assertEqual(args, ('employee-1',))
+        self.assertTrue(self.routes.is_loaded('/tool'))
+        self.assertIn('json.tool', self.routes.import_times)
+
+    def test_prewarm_imports_in_the_background(self):
+        thread = self.routes.prewarm(['/tool', '/unknown'])
+        thread.join(5)
+
+        self.assertTrue(self.routes.is_loaded('/tool'))
+        # Nothing left to prewarm
+        self.assertIsNone(self.routes.prewarm(['/tool']))
+
+    def test_keeps_the_most_recently_shown_views(self):
+        routes = ViewRegistry(max_views=2)
+        for route in ('/a', '/b', '/c'):
+            routes.register(route, 'json', lambda view, route=route: SimpleNamespace(route=route, data=None),
+                            function_name='loads', keep_alive=True)
+        routes.register('/form', 'json', lambda view: SimpleNamespace(route='/form', data=None),
+                        function_name='loads')
+
+        a = routes.build('/a')
+        routes.build('/b')
+        self.assertIs(routes.kept_view('/a'), a)
+        # /b is now the least recently shown one
+        routes.build('/c')
+        routes.build('/form')
+
+        self.assertIs(routes.kept_view('/a'), a)
+        self.assertIsNone(routes.kept_view('/b'))
+        self.assertIsNotNone(routes.kept_view('/c'))
+        self.assertIsNone(routes.kept_view('/form'))
+
+        routes.discard_views()
+        self.assertIsNone(routes.kept_view('/a'))
+
+    def test_resume_restores_scroll_and_revalidates(self):
+        hooks = {'restore_scroll': MagicMock(), 'revalidate': MagicMock()}
+        view = SimpleNamespace(route='/a', data=hooks)
+
+        self.routes.resume(view).join(5)
+
+        hooks['restore_scroll'].assert_called_once_with()
+        hooks['revalidate'].assert_called_once_with()
+        self.assertIsNone(self.routes.resume(SimpleNamespace(route='/b', data=None)))
+
+    def test_list_view_hooks_hold_the_subscription_while_the_view_exists(self):
+        cache = TTLCache()
+        refreshed = []
+        view = SimpleNamespace(route='/tools', data=None)
+        view.data = list_view_hooks(cache.subscribe, 'tools_all', lambda key, value: refreshed.append(key),
+                                    MagicMock())
+
+        gc.collect()
+        cache._notify('tools_all', [])
+        view.data['revalidate']()
+        self.assertEqual(refreshed, ['tools_all', 'tools_all'])
+
+        # Discarding the view ends the subscription
+        view = None
+        gc.collect()
+        cache._notify('tools_all', [])
+        self.assertEqual(refreshed, ['tools_all', 'tools_all'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+import flet as ft
+from views.virtual_list import VirtualList
+
+class TestVirtualList(unittest.TestCase):
+    def setUp(self):
+        self.builder = MagicMock(side_effect=lambda item: ft.Text(str(item)))
+        self.list = VirtualList(self.builder, 100, buffer=2)
+        self.list._viewport = 500
+
+    def scroll(self, pixels, max_scroll_extent=None):
+        self.list._on_scroll(SimpleNamespace(
+            pixels=pixels, viewport_dimension=500, max_scroll_extent=max_scroll_extent
+        ))
+
+    def total_height(self):
+        return sum(control.height for control in self.list.control.controls)
+
+    def test_only_builds_the_visible_window(self):
+        self.list.set_items(range(1000))
+
+        # Six visible rows plus the buffer below them
+        self.assertEqual(self.list.window, (0, 8))
+        self.assertEqual(self.builder.call_count, 8)
+        # The spacer keeps the full scroll extent
+        self.assertEqual(self.total_height(), 1000 * 100)
+
+    def test_scroll_moves_window_and_reuses_cards(self):
+        self.list.set_items(range(1000))
+        self.builder.reset_mock()
+
+        self.scroll(300)
+
+        self.assertEqual(self.list.window, (1, 11))
+        # Rows 1-7 were already built, only the new ones are created
+        self.assertEqual([c.args[0] for c in self.builder.call_args_list], [8, 9, 10])
+        self.assertEqual(self.total_height(), 1000 * 100)
+
+        self.scroll(50000)
+        self.assertEqual(self.list.window, (498, 508))
+        self.assertEqual(len(self.list.control.controls), 12)
+        self.assertEqual(self.total_height(), 1000 * 100)
+
+    def test_end_reached_and_empty_state(self):
+        on_end_reached = MagicMock()
+        empty = ft.Text("empty")
+        virtual_list = VirtualList(self.builder, 100, on_end_reached=on_end_reached,
+                                   end_threshold=400, empty_builder=lambda: empty)
+
+        virtual_list.set_items([])
+        self.assertEqual(virtual_list.control.controls, [empty])
+
+        virtual_list.set_items(range(50))
+        virtual_list._on_scroll(SimpleNamespace(pixels=1000, viewport_dimension=500, max_scroll_extent=4500))
+        on_end_reached.assert_not_called()
+        virtual_list._on_scroll(SimpleNamespace(pixels=4200, viewport_dimension=500, max_scroll_extent=4500))
+        on_end_reached.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
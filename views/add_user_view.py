@@ -16,16 +16,23 @@ def add_user_view(page: ft.Page, create_app_bar, current_user, show_snackbar):
 
     # Get departments from database
     departments = {
-        1: "logistic",
-        2: "administration",
-        3: "Field_Operations",
-        4: "admin"
+        int(dept_id) if dept_id.isdigit() else dept_id: dept.get('name', 'Unknown')
+        for dept_id, dept in db.get_department_map().items()
     }
+    if not departments:
+        # Fallback when the database is not reachable
+        departments = {
+            1: "logistic",
+            2: "administration",
+            3: "Field_Operations",
+            4: "admin"
+        }
 
     def get_department_id_from_dict(dropdown_value, department_dict):
         if dropdown_value:
             try:
-                key = int(dropdown_value.split()[0])
+                key = dropdown_value.split()[0]
+                key = int(key) if key.isdigit() else key
                 return key if key in department_dict else None
             except:
                 return None
@@ -364,7 +364,7 @@ def dashboard_view(page: ft.Page, logout_user, go_to, current_user, refresh_all_
         recent_activities_widget
     ]
 
-    return ft.View(
+    view = ft.View(
         route="/dashboard",
         navigation_bar=create_bottom_nav(0),
         controls=[
@@ -380,3 +380,7 @@ def dashboard_view(page: ft.Page, logout_user, go_to, current_user, refresh_all_
             )
         ]
     )
+
+    # Called by the router when it shows the kept view again
+    view.data = {'revalidate': refresh_dashboard_data}
+    return view
@@ -378,13 +378,7 @@ def _view_employee_detail(page, go_to, create_app_bar, show_snackbar, employee_i
         return
 
     # Get department name
-    department_name = "Unknown"
-    if employee_data.get('department_id'):
-        departments = db.get_all_departments()
-        for dept in departments:
-            if str(dept.get('id')) == str(employee_data['department_id']):
-                department_name = dept['name'].title()
-                break
+    department_name = db.get_department_name(employee_data.get('department_id')).title()
 
     # Create read-only view
     content = ft.Column([
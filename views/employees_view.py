@@ -1,5 +1,8 @@
 import flet as ft
-from db import get_all_employees, delete_employee
+from db import get_all_employees, delete_employee, subscribe
+from views.virtual_list import VirtualList
+from views.search_controller import SearchController
+from views.registry import list_view_hooks
 
 def employees_view(page: ft.Page, go_to, create_app_bar, create_bottom_nav, show_snackbar):
     """Create and return the complete employee management content using real data"""
@@ -87,6 +90,8 @@ def employees_view(page: ft.Page, go_to, create_app_bar, create_bottom_nav, show
                             employee_data["name"],
                             size=16,
                             weight=ft.FontWeight.BOLD,
+                            max_lines=1,
+                            overflow=ft.TextOverflow.ELLIPSIS,
                             expand=True
                         ),
                         ft.Container(
@@ -126,7 +131,9 @@ def employees_view(page: ft.Page, go_to, create_app_bar, create_bottom_nav, show
                             ft.Text(
                                 employee_data["role"].replace('_', ' ').title(),
                                 size=14,
-                                weight=ft.FontWeight.W_500
+                                weight=ft.FontWeight.W_500,
+                                max_lines=1,
+                                overflow=ft.TextOverflow.ELLIPSIS
                             ),
                             ft.Text(
                                 employee_data["department"].title(),
@@ -234,7 +241,18 @@ def employees_view(page: ft.Page, go_to, create_app_bar, create_bottom_nav, show
         border_radius=12
     )
 
-    employee_list = ft.Column(spacing=0, scroll=ft.ScrollMode.AUTO)
+    def create_empty_state():
+        return ft.Container(
+            content=ft.Column([
+                ft.Icon(ft.Icons.SEARCH_OFF, size=64, color=ft.Colors.GREY_400),
+                ft.Text("No employees found", size=16, color=ft.Colors.GREY_600)
+            ], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
+            alignment=ft.alignment.center,
+            height=200
+        )
+
+    # Only the cards around the viewport are built
+    employee_list = VirtualList(create_employee_card, 184, empty_builder=create_empty_state)
     employee_count = ft.Container(
         content=ft.Text(
             f"Total: {len(filtered_employees)} employees",
@@ -245,31 +263,11 @@ def employees_view(page: ft.Page, go_to, create_app_bar, create_bottom_nav, show
     )
 
     # Update employee list function
-    def update_employee_list(page=None):
+    def render_employees(employees, page=None):
         nonlocal filtered_employees
-        filtered_employees = filter_employees(
-            employees_data,
-            search_field.value or "",
-            department_filter.value,
-            status_filter.value
-        )
+        filtered_employees = employees
 
-        employee_list.controls.clear()
-
-        if not filtered_employees:
-            employee_list.controls.append(
-                ft.Container(
-                    content=ft.Column([
-                        ft.Icon(ft.Icons.SEARCH_OFF, size=64, color=ft.Colors.GREY_400),
-                        ft.Text("No employees found", size=16, color=ft.Colors.GREY_600)
-                    ], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
-                    alignment=ft.alignment.center,
-                    height=200
-                )
-            )
-        else:
-            for employee in filtered_employees:
-                employee_list.controls.append(create_employee_card(employee))
+        employee_list.set_items(filtered_employees)
 
         employee_count.content.value = f"Total: {len(filtered_employees)} employees"
 
@@ -277,29 +275,42 @@ def employees_view(page: ft.Page, go_to, create_app_bar, create_bottom_nav, show
         if page:
             page.update()
 
+    search = SearchController(filter_employees, lambda employees: render_employees(employees, page))
+
+    def current_query():
+        return employees_data, search_field.value or "", department_filter.value, status_filter.value
+
+    def update_employee_list():
+        search.run_now(*current_query())
+
     # Add event handlers
     def on_search_change(e):
-        update_employee_list(page)
+        search.submit(*current_query())
 
     def on_department_change(e):
-        update_employee_list(page)
+        update_employee_list()
 
     def on_status_change(e):
-        update_employee_list(page)
+        update_employee_list()
 
     search_field.on_change = on_search_change
     department_filter.on_change = on_department_change
     status_filter.on_change = on_status_change
 
     # Initial load
-    update_employee_list()
+    render_employees(filter_employees(*current_query()))
 
     def refresh_employees_and_update():
             """Refresh employees data and update the view"""
             refresh_employees_data()
-            update_employee_list(page)
+            update_employee_list()
             show_snackbar("Updated data", ft.Colors.GREEN)
 
+    def on_employees_refreshed(key, employees):
+        """Re-render when a background reload brings changed employees"""
+        refresh_employees_data()
+        update_employee_list()
+
     # Return the complete content
     content = ft.Column([
         # Search
@@ -316,12 +327,12 @@ def employees_view(page: ft.Page, go_to, create_app_bar, create_bottom_nav, show
 
         # Employee list
         ft.Container(
-            content=employee_list,
+            content=employee_list.control,
             expand=True
         )
     ], spacing=12)
 
-    return ft.View(
+    view = ft.View(
         route="/employees",
         appbar=create_app_bar(
             "Employees",
@@ -348,3 +359,6 @@ def employees_view(page: ft.Page, go_to, create_app_bar, create_bottom_nav, show
             )
         ]
     )
+
+    view.data = list_view_hooks(subscribe, 'employees_all', on_employees_refreshed, employee_list.restore_scroll)
+    return view
@@ -1,6 +1,5 @@
 import flet as ft
-from db import login as db_login
-import time
+from db import login as db_login, prefetch_dashboard
 import os
 
 def login_view(page: ft.Page, on_login_success, show_snackbar):
@@ -14,9 +13,39 @@ def login_view(page: ft.Page, on_login_success, show_snackbar):
 
     is_loading = False
 
+    def reset_login_button():
+        nonlocal is_loading
+        is_loading = False
+        login_button.content = ft.Text("Sign In", color=WHITE, weight=ft.FontWeight.BOLD, size=16)
+        login_button.disabled = False
+
+    def authenticate(username, password):
+        """Check the credentials off the event thread"""
+        try:
+            # Authenticate with database
+            authenticated_user = db_login(username, password)
+
+            if authenticated_user:
+                on_login_success(authenticated_user, remember_me.value)
+            else:
+                # Show error message
+                reset_login_button()
+                show_snackbar("Invalid username or password", color=ft.Colors.RED)
+                page.update()
+
+        except Exception as ex:
+            # Handle any database errors
+            reset_login_button()
+            show_snackbar(f"Login error: {str(ex)}", color=ft.Colors.RED)
+            page.update()
+
     def on_login_click(e):
         nonlocal is_loading
 
+        # Ignore clicks while signing in
+        if is_loading:
+            return
+
         # Validate inputs
         if not username_field.value:
             show_snackbar("Please enter your username")
@@ -39,33 +68,9 @@ def login_view(page: ft.Page, on_login_success, show_snackbar):
         login_button.disabled = True
         page.update()
 
-        # Simulate login process delay
-        time.sleep(1)
-
-        try:
-            username = username_field.value.strip()
-            password = password_field.value.strip()
-
-            # Authenticate with database
-            authenticated_user = db_login(username, password)
-
-            if authenticated_user:
-                on_login_success(authenticated_user)
-            else:
-                # Show error message
-                is_loading = False
-                login_button.content = ft.Text("Sign In", color=WHITE, weight=ft.FontWeight.BOLD, size=16)
-                login_button.disabled = False
-                show_snackbar("Invalid username or password", color=ft.Colors.RED)
-                page.update()
-
-        except Exception as ex:
-            # Handle any database errors
-            is_loading = False
-            login_button.content = ft.Text("Sign In", color=WHITE, weight=ft.FontWeight.BOLD, size=16)
-            login_button.disabled = False
-            show_snackbar(f"Login error: {str(ex)}", color=ft.Colors.RED)
-            page.update()
+        # The dashboard statistics load while the credentials are checked
+        page.run_thread(prefetch_dashboard)
+        page.run_thread(authenticate, username_field.value.strip(), password_field.value.strip())
 
     def on_forgot_password(e):
         show_snackbar("Password reset feature coming soon", ft.Colors.BLUE)
@@ -0,0 +1,87 @@
+import threading
+
+
+class MissionPages:
+    """The pages of missions loaded so far by the mission list.
+
+    load_next() runs on a background thread while reload() runs on the
+    event thread. Every reload starts a new generation, and a page fetched
+    for an older one is dropped: the generation check and the update of
+    the loaded missions happen under one lock, so a reload that lands while
+    a page is loading always wins.
+    """
+
+    def __init__(self, fetch_page, page_size=20):
+        # fetch_page(page_size, start_after, status) -> (missions, cursor)
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.missions = []
+        # None once the last page is loaded
+        self.cursor = None
+        self.status = None
+        self.generation = 0
+        self.loading = False
+        self._lock = threading.Lock()
+
+    @property
+    def has_more(self):
+        return self.cursor is not None
+
+    def reload(self, status=None, limit=None):
+        """Load the first `limit` missions (one page by default) with a status filter"""
+        with self._lock:
+            self.generation += 1
+            generation = self.generation
+            self.status = status
+
+        missions, cursor = self.fetch_page(limit or self.page_size, None, status)
+
+        with self._lock:
+            # A newer reload finished first
+            if generation != self.generation:
+                return False
+            self.missions, self.cursor = list(missions), cursor
+        return True
+
+    def patch(self, mission_id, changes=None):
+        """Apply changes to a loaded mission without reloading the pages.
+
+        The mission is dropped when changes is None (it was deleted) or when
+        it no longer matches the status filter. Returns False if it is not
+        loaded.
+        """
+        with self._lock:
+            for index, mission in enumerate(self.missions):
+                if mission.get('id') == mission_id:
+                    break
+            else:
+                return False
+            missions = list(self.missions)
+            mission = None if changes is None else {**mission, **changes}
+            if mission is None or (self.status and mission.get('status') != self.status):
+                del missions[index]
+            else:
+                missions[index] = mission
+            self.missions = missions
+        return True
+
+    def load_next(self):
+        """Append the next page; returns False if nothing was added"""
+        with self._lock:
+            if self.loading or self.cursor is None:
+                return False
+            self.loading = True
+            generation, cursor, status = self.generation, self.cursor, self.status
+
+        try:
+            missions, next_cursor = self.fetch_page(self.page_size, cursor, status)
+            with self._lock:
+                # The list was reloaded while the page was loading
+                if generation != self.generation:
+                    return False
+                self.missions = self.missions + list(missions)
+                self.cursor = next_cursor
+            return True
+        finally:
+            with self._lock:
+                self.loading = False
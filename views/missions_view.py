@@ -1,6 +1,40 @@
 import flet as ft
 from datetime import datetime
-from db import get_all_missions_with_details, get_mission_stats, update_mission_status, add_mission_log, delete_mission
+from db import get_missions_page, get_mission_stats, update_mission_status, add_mission_log, delete_mission, search_missions
+from views.virtual_list import VirtualList
+from views.search_controller import SearchController
+from views.mission_pages import MissionPages
+
+# Status filter buttons -> mission status
+STATUS_FILTERS = {
+    "Pending": "PENDING",
+    "In Progress": "IN_PROGRESS",
+    "Completed": "COMPLETED",
+    "Cancelled": "CANCELLED"
+}
+
+
+# Best matches listed for a search query
+SEARCH_RESULT_LIMIT = 50
+
+
+def find_missions(loaded_missions, filter_status, search_text):
+    """Missions to list for a status filter and a search query.
+
+    A query is looked up in the search index, so it finds every mission and
+    not only the pages loaded so far, best matches first; only the listed
+    results have their details fetched. Without a query the loaded pages
+    are shown.
+    """
+    status = STATUS_FILTERS.get(filter_status, filter_status) if filter_status != "All" else None
+    if search_text and search_text.strip():
+        return search_missions(search_text, SEARCH_RESULT_LIMIT, status=status, with_details=True)
+
+    missions = list(loaded_missions)
+    if status:
+        missions = [mission for mission in missions if mission.get("status") == status]
+    return missions
+
 
 def missions_view(page: ft.Page, go_to, show_snackbar):
     """Mission management page using real database data"""
@@ -52,7 +86,7 @@ def missions_view(page: ft.Page, go_to, show_snackbar):
                     success = update_mission_status(mission['id'], new_status)
                     if success:
                         show_snackbar(f"Mission status updated to {new_status}", GREEN)
-                        refresh_missions_and_update()
+                        show_status_change(mission['id'], new_status)
                     else:
                         show_snackbar("Failed to update mission status", RED)
                 except Exception as ex:
@@ -108,7 +142,9 @@ def missions_view(page: ft.Page, go_to, show_snackbar):
                     mission.get("title", "Untitled Mission"),
                     size=18,
                     color=BLACK,
-                    weight=ft.FontWeight.BOLD
+                    weight=ft.FontWeight.BOLD,
+                    max_lines=1,
+                    overflow=ft.TextOverflow.ELLIPSIS
                 ),
 
                 ft.Row([
@@ -116,7 +152,10 @@ def missions_view(page: ft.Page, go_to, show_snackbar):
                     ft.Text(
                         mission.get("location", "No location"),
                         size=14,
-                        color=ft.Colors.GREY_700
+                        color=ft.Colors.GREY_700,
+                        max_lines=1,
+                        overflow=ft.TextOverflow.ELLIPSIS,
+                        expand=True
                     )
                 ], spacing=5),
 
@@ -167,7 +206,7 @@ def missions_view(page: ft.Page, go_to, show_snackbar):
                         # Add log entry
                         add_mission_log(mission["id"], f"Status changed to {new_status}", "System")
                         show_snackbar(f"Mission status updated to {new_status}", GREEN)
-                        refresh_missions_and_update()
+                        show_status_change(mission["id"], new_status)
                         close_dialog(e)
                     else:
                         show_snackbar("Failed to update mission status", RED)
@@ -184,7 +223,7 @@ def missions_view(page: ft.Page, go_to, show_snackbar):
                     success = delete_mission(mission["id"])
                     if success:
                         show_snackbar("Mission cancelled/deleted successfully", GREEN)
-                        refresh_missions_and_update()
+                        show_status_change(mission["id"], None)
                         confirm_dialog.open = False
                         close_dialog(e)
                     else:
@@ -597,46 +636,54 @@ def missions_view(page: ft.Page, go_to, show_snackbar):
     # State variables for filtering and searching
     current_filter = "All"
     search_query = ""
-    missions_data = []
 
-    def refresh_missions_data():
-        """Refresh missions data from database"""
-        nonlocal missions_data
+    # Missions are loaded a page at a time
+    PAGE_SIZE = 20
+    # Start loading the next page this many pixels before the end of the list
+    LOAD_MORE_THRESHOLD = 400
+    # Fixed height of a mission card row in the virtualized list
+    MISSION_CARD_EXTENT = 216
+    # Pages are appended from a background thread; see MissionPages
+    pages = MissionPages(
+        lambda page_size, start_after, status: get_missions_page(page_size, start_after=start_after, status=status),
+        PAGE_SIZE
+    )
+
+    def refresh_missions_data(limit=PAGE_SIZE):
+        """Reload the first `limit` missions for the current filter"""
         try:
-            missions_data = get_all_missions_with_details()
+            pages.reload(STATUS_FILTERS.get(current_filter), limit)
             return True
         except Exception as e:
             print(f"Error loading missions: {e}")
             show_snackbar(f"Error loading missions: {str(e)}", RED)
             return False
 
-    def filter_missions(missions, filter_status, search_text):
-        """Filter missions based on status and search query"""
-        filtered_missions = missions.copy()
-
-        # Filter by status
-        if filter_status != "All":
-            status_map = {
-                "Pending": "PENDING",
-                "In Progress": "IN_PROGRESS",
-                "Completed": "COMPLETED",
-                "Cancelled": "CANCELLED"
-            }
-            filtered_missions = [mission for mission in filtered_missions if mission.get("status") == status_map.get(filter_status, filter_status)]
-
-        # Filter by search query
-        if search_text:
-            search_lower = search_text.lower()
-            filtered_missions = [
-                mission for mission in filtered_missions
-                if (search_lower in mission.get("title", "").lower() or
-                    search_lower in mission.get("location", "").lower() or
-                    search_lower in mission.get("description", "").lower() or
-                    search_lower in str(mission.get("id", "")).lower() or
-                    search_lower in mission.get('assigned_user', {}).get('full_name', '').lower())
-            ]
+    def load_next_page():
+        """Fetch the next page in the background and append its cards"""
+        try:
+            # False when the list was reloaded while the page was loading
+            if pages.load_next():
+                update_mission_list()
+        except Exception as e:
+            print(f"Error loading missions: {e}")
+
+    def searching():
+        return bool(search_query and search_query.strip())
 
-        return filtered_missions
+    def request_next_page():
+        # Search results are complete; only the unfiltered list has pages
+        if pages.loading or not pages.has_more or searching():
+            return
+        page.run_thread(load_next_page)
+
+    def create_load_more_footer():
+        """Footer shown while more pages are available"""
+        return ft.Container(
+            content=ft.TextButton("Load more missions", on_click=lambda e: request_next_page()),
+            alignment=ft.alignment.center,
+            padding=8
+        )
 
     def create_filter_button(text, is_active=False, on_click=None):
         """Create a filter button with active/inactive states"""
@@ -655,30 +702,46 @@ def missions_view(page: ft.Page, go_to, show_snackbar):
 
     # Form field references
     search_field = ft.Ref[ft.TextField]()
-    mission_list_ref = ft.Ref[ft.Column]()
     filter_buttons_ref = ft.Ref[ft.Row]()
 
-    def update_mission_list():
-        """Update the mission list based on current filter and search"""
-        filtered_missions = filter_missions(missions_data, current_filter, search_query)
+    def create_empty_state():
+        return ft.Container(
+            content=ft.Column([
+                ft.Icon(ft.Icons.ASSIGNMENT, color=GRAY, size=64),
+                ft.Text("No missions found", color=GRAY, size=16),
+                ft.Text("Try adjusting your filters or search query",
+                    color=GRAY, size=12, text_align=ft.TextAlign.CENTER)
+            ], alignment=ft.MainAxisAlignment.CENTER, horizontal_alignment=ft.CrossAxisAlignment.CENTER),
+            alignment=ft.alignment.center,
+            height=200
+        )
 
-        if not filtered_missions:
-            mission_list_ref.current.controls = [
-                ft.Container(
-                    content=ft.Column([
-                        ft.Icon(ft.Icons.ASSIGNMENT, color=GRAY, size=64),
-                        ft.Text("No missions found", color=GRAY, size=16),
-                        ft.Text("Try adjusting your filters or search query",
-                            color=GRAY, size=12, text_align=ft.TextAlign.CENTER)
-                    ], alignment=ft.MainAxisAlignment.CENTER, horizontal_alignment=ft.CrossAxisAlignment.CENTER),
-                    alignment=ft.alignment.center,
-                    height=200
-                )
-            ]
-        else:
-            mission_list_ref.current.controls = [create_mission_card(mission) for mission in filtered_missions]
+    # Only the cards around the viewport are built; the next page is
+    # requested as the user nears the end of the list
+    mission_list = VirtualList(
+        create_mission_card,
+        MISSION_CARD_EXTENT,
+        empty_builder=create_empty_state,
+        on_end_reached=request_next_page,
+        end_threshold=LOAD_MORE_THRESHOLD
+    )
 
-        mission_list_ref.current.update()
+    def render_missions(filtered_missions):
+        mission_list.set_items(
+            filtered_missions,
+            footer=create_load_more_footer() if pages.has_more and not searching() else None
+        )
+        mission_list.update()
+
+    search = SearchController(find_missions, render_missions)
+
+    def update_mission_list():
+        """Update the mission list based on current filter and search"""
+        if searching():
+            # The search index is queried off the event thread as well
+            search.submit(pages.missions, current_filter, search_query)
+            return
+        search.run_now(pages.missions, current_filter, search_query)
 
     def on_filter_click(filter_name):
         """Handle filter button clicks"""
@@ -695,23 +758,38 @@ def missions_view(page: ft.Page, go_to, show_snackbar):
         ]
         filter_buttons_ref.current.update()
 
+        # The status filter is applied by the query, so start again from page one
+        refresh_missions_data()
         update_mission_list()
 
     def on_search_change(e):
         """Handle search input changes"""
         nonlocal search_query
         search_query = e.control.value
-        update_mission_list()
+        search.submit(pages.missions, current_filter, search_query)
 
     def refresh_missions_and_update():
-        """Refresh mission data and update the view"""
-        if refresh_missions_data():
+        """Refresh the loaded missions and update the view"""
+        if refresh_missions_data(max(PAGE_SIZE, len(pages.missions))):
             update_mission_list()
             show_snackbar("Missions refreshed", GREEN)
         else:
             show_snackbar("Failed to refresh missions", RED)
 
-    # Load initial data
+    def show_status_change(mission_id, status):
+        """Show a status change, or a deletion when status is None, in the loaded missions"""
+        # Patched in place: the loaded pages and the scroll position stay
+        if pages.patch(mission_id, {'status': status} if status else None):
+            update_mission_list()
+        else:
+            revalidate_missions()
+
+    def revalidate_missions():
+        """Reload as many missions as are loaded, so the scroll position stays valid"""
+        if refresh_missions_data(max(PAGE_SIZE, len(pages.missions))):
+            update_mission_list()
+
+    # Load the first page only; later pages load as the user scrolls
     refresh_missions_data()
 
     # Initialize form fields
@@ -735,14 +813,15 @@ def missions_view(page: ft.Page, go_to, show_snackbar):
         create_filter_button("Cancelled", False, lambda e: on_filter_click("Cancelled"))
     ], spacing=8, scroll=ft.ScrollMode.AUTO)
 
-    # Mission list (initially showing all missions)
-    mission_list_ref.current = ft.Column([
-        create_mission_card(mission) for mission in missions_data
-    ], spacing=0, scroll=ft.ScrollMode.AUTO, expand=True)
+    # Mission list (initially showing the first page)
+    mission_list.set_items(
+        pages.missions,
+        footer=create_load_more_footer() if pages.has_more else None
+    )
 
     # Statistics section for missions
     def create_mission_stats():
-        if not missions_data:
+        if not pages.missions:
             return ft.Container()
 
         try:
@@ -811,14 +890,14 @@ def missions_view(page: ft.Page, go_to, show_snackbar):
                 create_mission_stats(),
                 search_field.current,
                 filter_buttons_ref.current,
-                mission_list_ref.current
+                mission_list.control
             ], spacing=16),
             padding=16,
             expand=True
         )
     ], spacing=0, expand=True)
 
-    return ft.View(
+    view = ft.View(
         route="/missions",
         appbar=ft.AppBar(
             title=ft.Text("Mission Management", color=BLACK, size=20, weight=ft.FontWeight.BOLD),
@@ -852,3 +931,7 @@ def missions_view(page: ft.Page, go_to, show_snackbar):
             )
         ]
     )
+
+    # Called by the router when it shows the kept view again
+    view.data = {'revalidate': revalidate_missions, 'restore_scroll': mission_list.restore_scroll}
+    return view
@@ -0,0 +1,142 @@
+import importlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def list_view_hooks(subscribe, key, on_refreshed, restore_scroll):
+    """The `data` of a kept list view showing the cached collection `key`.
+
+    Subscribes on_refreshed(key, value) to background reloads of the key.
+    The cache keeps only a weak reference to it, so the returned dict, set
+    as the view's `data`, holds it for as long as the view exists and the
+    subscription ends when the view is discarded. 'revalidate' and
+    'restore_scroll' are called by ViewRegistry.resume().
+    """
+    subscribe(key, on_refreshed)
+    return {
+        'subscriptions': [on_refreshed],
+        'revalidate': lambda: on_refreshed(key, None),
+        'restore_scroll': restore_scroll
+    }
+
+
+class ViewRegistry:
+    """Routes of the app, with their view modules imported on first navigation.
+
+    Each route names the module holding its view function and a builder that
+    calls that function with the router's arguments. Only the modules of the
+    routes actually visited are imported, and prewarm() imports the likely
+    next ones on a background thread once the current screen is shown.
+
+    Views of keep-alive routes are kept once built (up to `max_views`, least
+    recently shown dropped first), so navigating back to them shows them as
+    they were left. A view can hook into that through its `data` dict:
+    'restore_scroll' is called once it is shown again and 'revalidate' on a
+    background thread to bring its data up to date.
+    """
+
+    def __init__(self, prewarm_delay=0.5, max_views=4):
+        # route -> (module name, function name, builder)
+        self._routes = {}
+        self._keep_alive = set()
+        # route -> kept view, least recently shown first
+        self._views = OrderedDict()
+        self.max_views = max_views
+        self._modules = {}
+        self._lock = threading.Lock()
+        # Seconds before a prewarm starts, so it does not compete with the
+        # rendering of the screen that triggered it
+        self.prewarm_delay = prewarm_delay
+        # module name -> seconds spent importing it
+        self.import_times = {}
+
+    def register(self, route, module_name, builder, function_name=None, keep_alive=False):
+        """Register a route; the view function defaults to the last part of the module name"""
+        self._routes[route] = (module_name, function_name or module_name.rsplit('.', 1)[-1], builder)
+        if keep_alive:
+            self._keep_alive.add(route)
+
+    def __contains__(self, route):
+        return route in self._routes
+
+    def is_loaded(self, route):
+        return route in self._routes and self._routes[route][0] in self._modules
+
+    def build(self, route, *args, **kwargs):
+        """Build the view of a route, importing its module if needed"""
+        module_name, function_name, builder = self._routes[route]
+        view_function = getattr(self._import(module_name), function_name)
+        view = builder(view_function, *args, **kwargs)
+
+        if route in self._keep_alive:
+            self._views[route] = view
+            self._views.move_to_end(route)
+            while len(self._views) > self.max_views:
+                self._views.popitem(last=False)
+        return view
+
+    def kept_view(self, route):
+        """The kept view of a route, or None if it has to be built"""
+        view = self._views.get(route)
+        if view is not None:
+            self._views.move_to_end(route)
+        return view
+
+    def resume(self, view):
+        """Restore a kept view once it is shown again and revalidate it in the background"""
+        hooks = view.data if isinstance(view.data, dict) else {}
+
+        restore_scroll = hooks.get('restore_scroll')
+        if restore_scroll:
+            restore_scroll()
+
+        revalidate = hooks.get('revalidate')
+        if not revalidate:
+            return None
+
+        def run():
+            try:
+                revalidate()
+            except Exception as e:
+                print(f"Revalidate error for {view.route}: {e}")
+
+        thread = threading.Thread(target=run, name='view-revalidate', daemon=True)
+        thread.start()
+        return thread
+
+    def discard_views(self):
+        """Drop the kept views, e.g. when the user they were built for logs out"""
+        self._views.clear()
+
+    def prewarm(self, routes):
+        """Import the modules of routes in the background"""
+        module_names = [self._routes[route][0] for route in routes
+                        if route in self._routes and not self.is_loaded(route)]
+        if not module_names:
+            return None
+
+        def run():
+            time.sleep(self.prewarm_delay)
+            for module_name in module_names:
+                try:
+                    self._import(module_name)
+                except Exception as e:
+                    print(f"Prewarm error for {module_name}: {e}")
+
+        thread = threading.Thread(target=run, name='view-prewarm', daemon=True)
+        thread.start()
+        return thread
+
+    def _import(self, module_name):
+        module = self._modules.get(module_name)
+        if module is not None:
+            return module
+        with self._lock:
+            module = self._modules.get(module_name)
+            if module is None:
+                started = time.perf_counter()
+                module = importlib.import_module(module_name)
+                self.import_times[module_name] = time.perf_counter() - started
+                self._modules[module_name] = module
+        return module
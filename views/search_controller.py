@@ -0,0 +1,70 @@
+import threading
+
+
+class SearchController:
+    """Debounced, off-thread filtering for the list views.
+
+    A view supplies `compute`, which matches its items against a query, and
+    `apply`, which renders the result. Typing goes through submit(), which
+    restarts a short timer on every keystroke. When the timer fires,
+    `compute` runs on the timer's worker thread with the arguments of the
+    latest submit, off the event thread, and its result is passed to `apply`
+    only if no newer query (or cancel) arrived in the meantime. Superseded
+    queries are dropped, so the UI only ever shows the result of the last
+    thing typed. Other changes to the list (a filter, a refresh) go through
+    run_now().
+    """
+
+    def __init__(self, compute, apply, delay=0.25):
+        self.compute = compute
+        self.apply = apply
+        self.delay = delay
+        self.generation = 0
+        self._timer = None
+        self._lock = threading.RLock()
+
+    def submit(self, *args):
+        """Schedule a query, replacing any that is still pending"""
+        with self._lock:
+            self.generation += 1
+            if self._timer:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay, self._run, args=(self.generation, args))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def cancel(self):
+        """Drop pending and running queries, e.g. before a synchronous refresh"""
+        with self._lock:
+            self.generation += 1
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+
+    def run_now(self, *args):
+        """Compute and apply a query on the calling thread.
+
+        A pending search is dropped first; it would otherwise overwrite the
+        result with older data.
+        """
+        self.cancel()
+        self.apply(self.compute(*args))
+
+    def is_current(self, generation):
+        return generation == self.generation
+
+    def _run(self, generation, args):
+        if not self.is_current(generation):
+            return
+        try:
+            result = self.compute(*args)
+        except Exception as e:
+            print(f"Search error: {e}")
+            return
+        # Applied under the lock so a cancel() that races with it either
+        # stops it or waits for it, never gets overwritten by it
+        with self._lock:
+            if not self.is_current(generation):
+                return
+            self._timer = None
+            self.apply(result)
@@ -1,4 +1,5 @@
 import flet as ft
+from db import rebuild_stats
 
 def settings_view(page: ft.Page, create_app_bar, create_bottom_nav, current_user, show_snackbar):
     """Create and return the complete settings page content"""
@@ -122,6 +123,12 @@ def settings_view(page: ft.Page, create_app_bar, create_bottom_nav, current_user
     def backup_data():
         show_snackbar("Backup started", ft.Colors.GREEN)
 
+    def rebuild_statistics():
+        if rebuild_stats() is not None:
+            show_snackbar("Statistics rebuilt", ft.Colors.GREEN)
+        else:
+            show_snackbar("Failed to rebuild statistics", ft.Colors.RED)
+
     def reset_app():
         dialog = ft.AlertDialog(
             title=ft.Text("Reset Application", color=ft.Colors.RED),
@@ -243,6 +250,12 @@ def settings_view(page: ft.Page, create_app_bar, create_bottom_nav, current_user
                     "Import data from file",
                     on_click=lambda e: import_data()
                 ),
+                create_setting_item(
+                    ft.Icons.QUERY_STATS,
+                    "Rebuild Statistics",
+                    "Recompute dashboard counters from scratch",
+                    on_click=lambda e: rebuild_statistics()
+                ),
 
                 # Support Section
                 create_section_header("Support & Information"),
@@ -1,5 +1,8 @@
 import flet as ft
-from db import get_all_tools, delete_tool
+from db import get_all_tools, delete_tool, subscribe
+from views.virtual_list import VirtualList
+from views.search_controller import SearchController
+from views.registry import list_view_hooks
 
 def tools_view(page: ft.Page, go_to, create_app_bar, create_bottom_nav, show_snackbar):
     """Create and return the complete tools management content using real data"""
@@ -10,7 +13,8 @@ def tools_view(page: ft.Page, go_to, create_app_bar, create_bottom_nav, show_sna
         """Refresh tools data from database"""
         nonlocal tools_data
         try:
-            tools_data = get_all_tools()
+            # Copies, so the cached records stay as the database returned them
+            tools_data = [dict(tool) for tool in get_all_tools()]
             # Transform database format to match UI expectations
             for tool in tools_data:
                 tool['quantity'] = tool.get('total_quantity', 0)
@@ -88,12 +92,15 @@ def tools_view(page: ft.Page, go_to, create_app_bar, create_bottom_nav, show_sna
                                 tool["name"],
                                 size=16,
                                 weight=ft.FontWeight.BOLD,
-                                expand=True
+                                max_lines=1,
+                                overflow=ft.TextOverflow.ELLIPSIS
                             ),
                             ft.Text(
                                 tool.get("model", "N/A"),
                                 size=12,
-                                color=ft.Colors.GREY_600
+                                color=ft.Colors.GREY_600,
+                                max_lines=1,
+                                overflow=ft.TextOverflow.ELLIPSIS
                             ),
                             ft.Text(
                                 availability_text,
@@ -112,7 +119,8 @@ def tools_view(page: ft.Page, go_to, create_app_bar, create_bottom_nav, show_sna
                         ft.Container(
                             content=ft.Row([
                                 ft.Icon(ft.Icons.LOCATION_ON, size=16, color=ft.Colors.GREY_600),
-                                ft.Text(tool.get("location", "Unknown"), size=12, color=ft.Colors.GREY_600)
+                                ft.Text(tool.get("location", "Unknown"), size=12, color=ft.Colors.GREY_600,
+                                        max_lines=1, overflow=ft.TextOverflow.ELLIPSIS, expand=True)
                             ]),
                             expand=True
                         ),
@@ -283,7 +291,18 @@ def tools_view(page: ft.Page, go_to, create_app_bar, create_bottom_nav, show_sna
         border_radius=12
     )
 
-    tools_list = ft.Column(spacing=0, scroll=ft.ScrollMode.AUTO)
+    def create_empty_state():
+        return ft.Container(
+            content=ft.Column([
+                ft.Icon(ft.Icons.SEARCH_OFF, size=64, color=ft.Colors.GREY_400),
+                ft.Text("No tools found", size=16, color=ft.Colors.GREY_600)
+            ], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
+            alignment=ft.alignment.center,
+            height=200
+        )
+
+    # Only the cards around the viewport are built
+    tools_list = VirtualList(create_tool_card, 190, empty_builder=create_empty_state)
 
     # Statistics cards
     def create_stats_cards():
@@ -339,12 +358,8 @@ def tools_view(page: ft.Page, go_to, create_app_bar, create_bottom_nav, show_sna
         ], spacing=8)
 
     # Filter tools
-    def filter_tools():
-        nonlocal filtered_tools
-        search_term = search_field.value.lower() if search_field.value else ""
-        status_filter_value = status_filter.value
-
-        filtered_tools = tools_data.copy()
+    def filter_tools_data(tools, search_term, status_filter_value):
+        filtered_tools = tools.copy()
 
         if search_term:
             filtered_tools = [tool for tool in filtered_tools if
@@ -360,32 +375,30 @@ def tools_view(page: ft.Page, go_to, create_app_bar, create_bottom_nav, show_sna
             elif status_filter_value == "Partially Available":
                 filtered_tools = [tool for tool in filtered_tools if 0 < tool['available'] < tool['quantity']]
 
+        return filtered_tools
+
+    def current_query():
+        search_term = search_field.value.lower() if search_field.value else ""
+        return tools_data, search_term, status_filter.value
+
+    def apply_filtered_tools(tools):
+        nonlocal filtered_tools
+        filtered_tools = tools
         update_tools_list()
 
+    search = SearchController(filter_tools_data, apply_filtered_tools)
+
+    def filter_tools():
+        search.run_now(*current_query())
+
     # Update tools list
     def update_tools_list():
-        tools_list.controls.clear()
-
-        if not filtered_tools:
-            tools_list.controls.append(
-                ft.Container(
-                    content=ft.Column([
-                        ft.Icon(ft.Icons.SEARCH_OFF, size=64, color=ft.Colors.GREY_400),
-                        ft.Text("No tools found", size=16, color=ft.Colors.GREY_600)
-                    ], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
-                    alignment=ft.alignment.center,
-                    height=200
-                )
-            )
-        else:
-            for tool in filtered_tools:
-                tools_list.controls.append(create_tool_card(tool))
-
+        tools_list.set_items(filtered_tools)
         page.update()
 
     # Event handlers
     def on_search_change(e):
-        filter_tools()
+        search.submit(*current_query())
 
     def on_status_filter_change(e):
         filter_tools()
@@ -400,6 +413,11 @@ def tools_view(page: ft.Page, go_to, create_app_bar, create_bottom_nav, show_sna
         filter_tools()
         show_snackbar("Tools refreshed", ft.Colors.GREEN)
 
+    def on_tools_refreshed(key, tools):
+        """Re-render when a background reload brings changed tools"""
+        refresh_tools_data()
+        filter_tools()
+
     # Set event handlers
     search_field.on_change = on_search_change
     status_filter.on_change = on_status_filter_change
@@ -421,14 +439,14 @@ def tools_view(page: ft.Page, go_to, create_app_bar, create_bottom_nav, show_sna
 
             # Tools list
             ft.Container(
-                content=tools_list,
+                content=tools_list.control,
                 expand=True,
                 margin=ft.margin.only(top=16)
             )
         ], spacing=12),
     ])
 
-    return ft.View(
+    view = ft.View(
         route="/tools",
         appbar=create_app_bar(
             "My Tools",
@@ -454,3 +472,6 @@ def tools_view(page: ft.Page, go_to, create_app_bar, create_bottom_nav, show_sna
             )
         ]
     )
+
+    view.data = list_view_hooks(subscribe, 'tools_all', on_tools_refreshed, tools_list.restore_scroll)
+    return view
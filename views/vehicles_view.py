@@ -1,5 +1,8 @@
 import flet as ft
-from db import get_all_vehicles, db, delete_vehicle
+from db import get_all_vehicles, db, delete_vehicle, subscribe
+from views.virtual_list import VirtualList
+from views.search_controller import SearchController
+from views.registry import list_view_hooks
 
 def vehicles_view(page: ft.Page, create_app_bar, go_to, show_snackbar):
     """Car management page using real database data"""
@@ -15,7 +18,8 @@ def vehicles_view(page: ft.Page, create_app_bar, go_to, show_snackbar):
         """Refresh vehicles data from database"""
         nonlocal vehicles_data
         try:
-            vehicles_data = get_all_vehicles()
+            # Copies, so the cached records stay as the database returned them
+            vehicles_data = [dict(vehicle) for vehicle in get_all_vehicles()]
             # Transform database format to match UI expectations
             for vehicle in vehicles_data:
                 vehicle['plate'] = vehicle.get('plate_number', 'Unknown')
@@ -65,7 +69,9 @@ def vehicles_view(page: ft.Page, create_app_bar, go_to, show_snackbar):
                     car.get("model", "Unknown Model"),
                     size=18,
                     color=BLACK,
-                    weight=ft.FontWeight.BOLD
+                    weight=ft.FontWeight.BOLD,
+                    max_lines=1,
+                    overflow=ft.TextOverflow.ELLIPSIS
                 ),
 
                 ft.Row([
@@ -82,7 +88,10 @@ def vehicles_view(page: ft.Page, create_app_bar, go_to, show_snackbar):
                     ft.Text(
                         car.get("location", "Unknown Location"),
                         size=14,
-                        color=ft.Colors.GREY_700
+                        color=ft.Colors.GREY_700,
+                        max_lines=1,
+                        overflow=ft.TextOverflow.ELLIPSIS,
+                        expand=True
                     )
                 ], spacing=5),
 
@@ -275,14 +284,17 @@ def vehicles_view(page: ft.Page, create_app_bar, go_to, show_snackbar):
 
     # Form field references
     search_field = ft.Ref[ft.TextField]()
-    car_list_ref = ft.Ref[ft.Column]()
     filter_buttons_ref = ft.Ref[ft.Row]()
 
+    def render_cars(filtered_cars):
+        car_list.set_items(filtered_cars)
+        car_list.update()
+
+    search = SearchController(filter_cars, render_cars)
+
     def update_car_list():
         """Update the car list based on current filter and search"""
-        filtered_cars = filter_cars(vehicles_data, current_filter, search_query)
-        car_list_ref.current.controls = [create_car_card(car) for car in filtered_cars]
-        car_list_ref.current.update()
+        search.run_now(vehicles_data, current_filter, search_query)
 
     def on_filter_click(filter_name):
         """Handle filter button clicks"""
@@ -304,6 +316,11 @@ def vehicles_view(page: ft.Page, create_app_bar, go_to, show_snackbar):
         """Handle search input changes"""
         nonlocal search_query
         search_query = e.control.value
+        search.submit(vehicles_data, current_filter, search_query)
+
+    def on_vehicles_refreshed(key, vehicles):
+        """Re-render when a background reload brings changed vehicles"""
+        refresh_vehicles_data()
         update_car_list()
 
     def refresh_cars_and_update():
@@ -332,10 +349,10 @@ def vehicles_view(page: ft.Page, create_app_bar, go_to, show_snackbar):
         create_filter_button("Maintenance", False, lambda e: on_filter_click("Maintenance"))
     ], spacing=8, scroll=ft.ScrollMode.AUTO)
 
-    # Car list (initially showing all cars)
-    car_list_ref.current = ft.Column([
-        create_car_card(car) for car in vehicles_data
-    ], spacing=0, scroll=ft.ScrollMode.AUTO, expand=True)
+    # Car list (initially showing all cars); only the cards around the
+    # viewport are built
+    car_list = VirtualList(create_car_card, 184)
+    car_list.set_items(vehicles_data)
 
     # Statistics section for vehicles
     def create_vehicle_stats():
@@ -400,14 +417,14 @@ def vehicles_view(page: ft.Page, create_app_bar, go_to, show_snackbar):
                 create_vehicle_stats(),
                 search_field.current,
                 filter_buttons_ref.current,
-                car_list_ref.current
+                car_list.control
             ], spacing=16),
             padding=16,
             expand=True
         )
     ], spacing=0, expand=True)
 
-    return ft.View(
+    view = ft.View(
         route="/cars",
         appbar=create_app_bar(
             "Vehicle",
@@ -432,3 +449,6 @@ def vehicles_view(page: ft.Page, create_app_bar, go_to, show_snackbar):
             )
         ]
     )
+
+    view.data = list_view_hooks(subscribe, 'vehicles_all', on_vehicles_refreshed, car_list.restore_scroll)
+    return view
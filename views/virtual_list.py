@@ -0,0 +1,114 @@
+import flet as ft
+
+
+class VirtualList:
+    """Scrolling list that only builds the cards near the viewport.
+
+    Every item occupies a fixed height (item_extent), so the scroll position
+    maps directly to an index range. The rows outside that range are
+    replaced by two spacers of the same total height, which keeps the
+    scrollbar and the scroll offset correct while only the visible cards plus
+    `buffer` rows on each side exist as controls.
+    """
+
+    # Viewport height assumed before the first scroll event reports the real one
+    DEFAULT_VIEWPORT = 900
+
+    def __init__(self, item_builder, item_extent, buffer=10, empty_builder=None,
+                 on_end_reached=None, end_threshold=400, **list_kwargs):
+        self.item_builder = item_builder
+        self.item_extent = item_extent
+        self.buffer = buffer
+        self.empty_builder = empty_builder
+        self.on_end_reached = on_end_reached
+        self.end_threshold = end_threshold
+
+        self.items = []
+        self.footer = None
+        self.window = (0, 0)
+        self._offset = 0
+        self._viewport = self.DEFAULT_VIEWPORT
+        # Built cards of the current window, keyed by item index
+        self._built = {}
+
+        list_kwargs.setdefault("expand", True)
+        list_kwargs.setdefault("spacing", 0)
+        list_kwargs.setdefault("on_scroll_interval", 50)
+        self.control = ft.ListView(on_scroll=self._on_scroll, **list_kwargs)
+
+    def set_items(self, items, footer=None):
+        """Replace the items and rebuild the visible window.
+
+        The caller is responsible for updating the page afterwards, just like
+        when it filled a Column itself.
+        """
+        self.items = list(items)
+        self.footer = footer
+        self._built = {}
+        self._render(self._compute_window())
+
+    def update(self):
+        if self.control.page:
+            self.control.update()
+
+    def restore_scroll(self):
+        """Scroll back to the last offset, after the list was shown again"""
+        if self._offset and self.control.page:
+            self.control.scroll_to(offset=self._offset, duration=0)
+
+    def _compute_window(self):
+        """Index range [start, end) of the items that should be built"""
+        if not self.items:
+            return (0, 0)
+        first = int(self._offset // self.item_extent)
+        last = int((self._offset + self._viewport) // self.item_extent) + 1
+        start = max(0, first - self.buffer)
+        end = min(len(self.items), last + self.buffer)
+        return (min(start, end), end)
+
+    def _build(self, index):
+        card = self._built.get(index)
+        if card is None:
+            card = ft.Container(
+                content=self.item_builder(self.items[index]),
+                height=self.item_extent,
+                clip_behavior=ft.ClipBehavior.HARD_EDGE
+            )
+        return card
+
+    def _render(self, window):
+        start, end = window
+        self.window = window
+
+        if not self.items:
+            self._built = {}
+            controls = []
+            if self.footer is None and self.empty_builder:
+                controls.append(self.empty_builder())
+        else:
+            built = {index: self._build(index) for index in range(start, end)}
+            self._built = built
+            controls = []
+            if start > 0:
+                controls.append(ft.Container(height=start * self.item_extent))
+            controls.extend(built[index] for index in range(start, end))
+            if end < len(self.items):
+                controls.append(ft.Container(height=(len(self.items) - end) * self.item_extent))
+
+        if self.footer is not None:
+            controls.append(self.footer)
+        self.control.controls = controls
+
+    def _on_scroll(self, e: ft.OnScrollEvent):
+        self._offset = max(0, e.pixels or 0)
+        if e.viewport_dimension:
+            self._viewport = e.viewport_dimension
+
+        window = self._compute_window()
+        if window != self.window:
+            self._render(window)
+            self.update()
+
+        if self.on_end_reached and e.max_scroll_extent is not None:
+            if e.max_scroll_extent - self._offset <= self.end_threshold:
+                self.on_end_reached()